@@ -0,0 +1,163 @@
+import argparse
+import gzip
+import json
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+from typing import Dict, Tuple, Union
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+'''
+A stand-in for the caen daemon histogram endpoints. It serves the histograms both in the text format and, when the
+client accepts it, as little endian uint32. This allows to test the histogram retrieval of waspy.drivers.caen without
+hardware. With etags, the histograms are versioned and can be fetched conditionally (If-None-Match) or as a delta
+(since=).
+
+Example usage:
+    server = CaenStandInServer({("33", 0): np.arange(24576)})
+    server.start()
+    caen = Caen(server.url)
+    server.set_histogram(("33", 0), np.arange(24576) * 2)
+    server.error_response = (502, "text/html", b"<html>502 Bad Gateway</html>")
+    server.stop()
+ '''
+
+
+class CaenStandInServer:
+    histograms: Dict[Tuple[str, int], np.ndarray]
+    binary: bool
+    compress: bool
+    query_urls: bool
+    etags: bool
+
+    def __init__(self, histograms: Dict[Tuple[str, int], np.ndarray], binary=True, compress=False, query_urls=True,
+                 etags=True, port=0):
+        """binary: serve uint32 when accepted. compress: gzip the body when accepted. query_urls: serve the
+        /histogram?board=&channel= url, otherwise only /histogram/{board}/{channel} is available. etags: version the
+        histograms"""
+        self.histograms = histograms
+        self.binary = binary
+        self.compress = compress
+        self.query_urls = query_urls
+        self.etags = etags
+        self.requests = []
+        self.error_response: Union[Tuple[int, str, bytes], None] = None
+        self._epoch = uuid.uuid4().hex[:8]
+        self._versions = {key: 1 for key in histograms}
+        self._changed_at = {key: np.ones(len(histogram), dtype=np.int64) for key, histogram in histograms.items()}
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(self))
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_port}/api/latest'
+
+    def start(self):
+        self._thread.start()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def set_histogram(self, key: Tuple[str, int], histogram: np.ndarray):
+        version = self._versions.get(key, 0) + 1
+        previous = self.histograms.get(key)
+        if previous is None or len(previous) != len(histogram):
+            changed_at = np.full(len(histogram), version, dtype=np.int64)
+        else:
+            changed_at = self._changed_at[key].copy()
+            changed_at[previous != histogram] = version
+        self.histograms[key] = histogram
+        self._changed_at[key] = changed_at
+        self._versions[key] = version
+
+    def get_etag(self, key: Tuple[str, int]) -> str:
+        return f'"{self._epoch}-{self._versions[key]}"'
+
+    def get_delta(self, key: Tuple[str, int], since: str) -> Union[Dict, None]:
+        """The bins changed since the given version. None when the version is unknown, or when the full histogram is
+        smaller"""
+        epoch, _, version = since.strip('"').partition("-")
+        if epoch != self._epoch or not version.isdigit() or int(version) > self._versions[key]:
+            return None
+        bins = np.flatnonzero(self._changed_at[key] > int(version))
+        if len(bins) > len(self.histograms[key]) // 4:
+            return None
+        return {"bins": bins.tolist(), "values": self.histograms[key][bins].tolist()}
+
+
+def _make_handler(stand_in: CaenStandInServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            stand_in.requests.append((self.path, dict(self.headers)))
+            if stand_in.error_response is not None:
+                self._respond(*stand_in.error_response)
+                return
+            key = self._get_histogram_key()
+            if key not in stand_in.histograms:
+                self._respond(404, "text/plain", b"Not found")
+                return
+            histogram = stand_in.histograms[key]
+            headers = {}
+            if stand_in.etags:
+                headers["ETag"] = stand_in.get_etag(key)
+                if self.headers.get("If-None-Match") == headers["ETag"]:
+                    self._respond(304, None, b"", headers)
+                    return
+                since = parse_qs(urlsplit(self.path).query).get("since")
+                delta = stand_in.get_delta(key, since[0]) if since else None
+                if delta is not None:
+                    self._respond(200, "application/json", json.dumps(delta).encode(), headers)
+                    return
+            if stand_in.binary and "application/octet-stream" in self.headers.get("Accept", ""):
+                self._respond(200, "application/octet-stream", histogram.astype("<u4").tobytes(), headers)
+            else:
+                text = "".join(f'"{value}";' for value in histogram)
+                self._respond(200, "text/plain", text.encode(), headers)
+
+        def _get_histogram_key(self):
+            url = urlsplit(self.path)
+            parts = url.path.split("/")
+            if url.path.endswith("/histogram") and stand_in.query_urls:
+                query = parse_qs(url.query)
+                return query.get("board", [""])[0], int(query.get("channel", ["-1"])[0])
+            if len(parts) >= 3 and parts[-3] == "histogram":
+                return parts[-2], int(parts[-1])
+            return None
+
+        def _respond(self, code, content_type, body: bytes, headers=None):
+            self.send_response(code)
+            if content_type:
+                self.send_header("Content-Type", content_type)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            if stand_in.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves random caen histograms for board 33, channels 0-7")
+    parser.add_argument("--port", type=int, default=20200)
+    parser.add_argument("--text-only", action="store_true")
+    parser.add_argument("--compress", action="store_true")
+    args = parser.parse_args()
+    random_histograms = {("33", channel): np.random.randint(0, 5000, 24576) for channel in range(8)}
+    server = CaenStandInServer(random_histograms, binary=not args.text_only, compress=args.compress, port=args.port)
+    print(f'Serving histograms on {server.url}')
+    server.serve_forever()
@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+
+import waspy.drivers.aio.aml_smd2
+import waspy.drivers.aio.http_helper
+from caen_stand_in_server import CaenStandInServer
+from waspy.drivers.aio.aml_smd2 import AmlSmd2
+from waspy.drivers.aio.caen import Caen
+from waspy.drivers.caen import HistogramCache
+from waspy.drivers.driver_error import DriverError
+
+
+class TestAioAmlSmd2(unittest.TestCase):
+    def setUp(self):
+        self.aml = AmlSmd2("http://localhost:22100")
+        waspy.drivers.aio.aml_smd2.post_request = AsyncMock()
+        waspy.drivers.aio.aml_smd2.generate_request_id = MagicMock(return_value="some_request")
+
+    def test_move_first(self):
+        asyncio.run(self.aml.move_first(5))
+        waspy.drivers.aio.aml_smd2.post_request.assert_awaited_once_with(
+            "http://localhost:22100", {"request_id": "some_request", "set_m1_target_position": 5}, True)
+
+    def test_get_status(self):
+        waspy.drivers.aio.aml_smd2.get_json = AsyncMock(return_value={"dummy": "value"})
+        status = asyncio.run(self.aml.get_status())
+        self.assertEqual(status, {"dummy": "value"})
+
+
+class TestAioHttpHelper(unittest.TestCase):
+    def setUp(self):
+        self.get_json = waspy.drivers.aio.http_helper.get_json
+
+    def tearDown(self):
+        waspy.drivers.aio.http_helper.get_json = self.get_json
+
+    def test_wait_for_request_done(self):
+        waspy.drivers.aio.http_helper.get_json = AsyncMock(side_effect=[
+            {"error": "Success", "request_finished": False, "request_id": "1"},
+            {"error": "Success", "request_finished": True, "request_id": "1"},
+        ])
+        asyncio.run(waspy.drivers.aio.http_helper.wait_for_request_done("url", {"request_id": "1"}))
+        self.assertEqual(waspy.drivers.aio.http_helper.get_json.await_count, 2)
+
+    def test_wait_for_request_error(self):
+        waspy.drivers.aio.http_helper.get_json = AsyncMock(return_value={"error": "Motor stalled"})
+        with self.assertRaises(DriverError):
+            asyncio.run(waspy.drivers.aio.http_helper.wait_for_request_done("url", {"request_id": "1"}))
+
+
+class TestAioCaen(unittest.TestCase):
+    def test_conditional_histogram(self):
+        histogram = np.arange(1024)
+        server = CaenStandInServer({("33", 0): histogram})
+        server.start()
+        caen = Caen(server.url, histogram_cache=HistogramCache())
+
+        async def fetch_twice():
+            try:
+                first = await caen.get_raw_histogram_array("33", 0)
+                server.set_histogram(("33", 0), histogram + (np.arange(1024) == 3))
+                return first, await caen.get_raw_histogram_array("33", 0)
+            finally:
+                await waspy.drivers.aio.http_helper.close_client()
+
+        try:
+            first, second = asyncio.run(fetch_twice())
+        finally:
+            server.stop()
+        np.testing.assert_array_equal(first, histogram)
+        self.assertEqual(second[3], 4)
+        self.assertIn("since=", server.requests[-1][0])
+
+    def test_error_response(self):
+        server = CaenStandInServer({("33", 0): np.arange(1024)})
+        server.error_response = (502, "text/html", b"<html>502 Bad Gateway</html>")
+        server.start()
+        caen = Caen(server.url)
+
+        async def fetch():
+            try:
+                await caen.get_raw_histogram_array("33", 0)
+            finally:
+                await waspy.drivers.aio.http_helper.close_client()
+
+        try:
+            with self.assertRaises(DriverError):
+                asyncio.run(fetch())
+        finally:
+            server.stop()
@@ -0,0 +1,128 @@
+import unittest
+import warnings
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from caen_stand_in_server import CaenStandInServer
+from waspy.drivers.caen import Caen, DetectorMetadata, HistogramCache, _parse_histogram, _pack
+from waspy.drivers.driver_error import DriverError
+
+
+class TestCaen(unittest.TestCase):
+    def setUp(self):
+        self.caen = Caen("http://localhost:22100")
+
+    def test_parse_histogram(self):
+        self.assertEqual(_parse_histogram('"1";"2";"30";').tolist(), [1, 2, 30])
+        self.assertEqual(_parse_histogram('').tolist(), [])
+        self.assertEqual(_parse_histogram('"1";"2";"3').tolist(), [1, 2])
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            self.assertEqual(_parse_histogram('"4";').dtype, np.int64)
+
+    def test_pack(self):
+        data = list(range(10))
+        self.assertEqual(_pack(data, 0, 10, 5).tolist(), [1, 5, 9, 13, 17])
+        self.assertEqual(_pack(data, 1, 10, 2).tolist(), [10, 26])
+        self.assertEqual(_pack(data, 0, 10, 10).tolist(), data)
+
+    def test_get_histogram(self):
+        self.caen.get_raw_histogram_array = MagicMock(return_value=np.array([1, 2, 3, 4, 5, 6]))
+        detector = DetectorMetadata(board="33", channel=0, bins_min=0, bins_max=6, bins_width=3)
+        histogram = self.caen.get_histogram(detector)
+        self.assertEqual(histogram, [3, 7, 11])
+        self.assertIsInstance(histogram[0], int)
+        self.caen.get_raw_histogram_array.assert_called_once_with("33", 0)
+
+
+class TestCaenHistogramTransfer(unittest.TestCase):
+    def setUp(self):
+        self.histogram = np.random.randint(0, 2 ** 32 - 1, 24576, dtype=np.int64)
+        self.server = None
+
+    def tearDown(self):
+        self.server.stop()
+
+    def start_server(self, histogram_cache=None, **kwargs) -> Caen:
+        self.server = CaenStandInServer({("33", 2): self.histogram}, **kwargs)
+        self.server.start()
+        return Caen(self.server.url, histogram_cache=histogram_cache)
+
+    def test_binary(self):
+        caen = self.start_server()
+        np.testing.assert_array_equal(caen.get_raw_histogram_array("33", 2), self.histogram)
+        path, headers = self.server.requests[-1]
+        self.assertEqual(path, "/api/latest/histogram?board=33&channel=2")
+
+    def test_binary_compressed(self):
+        caen = self.start_server(compress=True)
+        np.testing.assert_array_equal(caen.get_raw_histogram_array("33", 2), self.histogram)
+
+    def test_text_fallback(self):
+        caen = self.start_server(binary=False)
+        np.testing.assert_array_equal(caen.get_raw_histogram_array("33", 2), self.histogram)
+        self.assertTrue(caen.get_raw_histogram("33", 2).startswith(f'"{self.histogram[0]}";'))
+
+    def test_url_fallback(self):
+        caen = self.start_server(query_urls=False)
+        np.testing.assert_array_equal(caen.get_raw_histogram_array("33", 2), self.histogram)
+        self.assertEqual(self.server.requests[-1][0], "/api/latest/histogram/33/2")
+
+    def test_unknown_detector(self):
+        caen = self.start_server()
+        with self.assertRaises(DriverError):
+            caen.get_raw_histogram_array("33", 5)
+
+    def test_error_response(self):
+        caen = self.start_server()
+        self.server.error_response = (502, "text/html", b"<html>502 Bad Gateway</html>")
+        with self.assertRaises(DriverError):
+            caen.get_raw_histogram_array("33", 2)
+        with self.assertRaises(DriverError):
+            caen.get_raw_histogram("33", 2)
+
+    def test_error_response_with_cache(self):
+        caen = self.start_server(HistogramCache())
+        caen.get_raw_histogram_array("33", 2)
+        self.server.error_response = (500, "text/plain", b"Internal Server Error")
+        with self.assertRaises(DriverError):
+            caen.get_raw_histogram_array("33", 2)
+
+    def test_unexpected_content_type(self):
+        caen = self.start_server()
+        self.server.error_response = (200, "text/html", b"<html>Maintenance</html>")
+        with self.assertRaises(DriverError):
+            caen.get_raw_histogram_array("33", 2)
+
+    def test_conditional_unchanged(self):
+        caen = self.start_server(HistogramCache())
+        first = caen.get_raw_histogram_array("33", 2)
+        second = caen.get_raw_histogram_array("33", 2)
+        self.assertIs(second, first)
+        path, headers = self.server.requests[-1]
+        self.assertEqual(headers["If-None-Match"], self.server.get_etag(("33", 2)))
+
+    def test_conditional_delta(self):
+        caen = self.start_server(HistogramCache())
+        caen.get_raw_histogram_array("33", 2)
+        changed = self.histogram.copy()
+        changed[[0, 100, 24575]] += 1
+        self.server.set_histogram(("33", 2), changed)
+
+        np.testing.assert_array_equal(caen.get_raw_histogram_array("33", 2), changed)
+        path, headers = self.server.requests[-1]
+        self.assertIn("&since=", path)
+
+    def test_conditional_full_when_most_bins_changed(self):
+        caen = self.start_server(HistogramCache(), query_urls=False)
+        caen.get_raw_histogram_array("33", 2)
+        self.server.set_histogram(("33", 2), self.histogram // 2)
+        np.testing.assert_array_equal(caen.get_raw_histogram_array("33", 2), self.histogram // 2)
+        self.assertTrue(self.server.requests[-1][0].startswith("/api/latest/histogram/33/2?since="))
+
+    def test_conditional_without_etags(self):
+        histogram_cache = HistogramCache()
+        caen = self.start_server(histogram_cache, etags=False)
+        np.testing.assert_array_equal(caen.get_raw_histogram_array("33", 2), self.histogram)
+        self.assertIsNone(histogram_cache.get_etag("33", 2))
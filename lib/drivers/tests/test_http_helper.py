@@ -0,0 +1,125 @@
+import unittest
+from itertools import islice
+from unittest.mock import MagicMock, patch
+
+from waspy.drivers import http_helper
+from waspy.drivers.caen import Caen, COMMAND_POLLING
+from waspy.drivers.driver_error import DriverError
+from waspy.drivers.fastcom_mpa3 import FastcomMpa3
+from waspy.drivers.http_helper import PollStrategy
+from waspy.drivers.motrona_dx350 import MotronaDx350
+
+
+class TestHttpHelper(unittest.TestCase):
+    def tearDown(self):
+        http_helper.close_sessions()
+        http_helper._poll_hints.clear()
+        http_helper.set_timeout("http://localhost:22100", None)
+        http_helper.set_timeout("http://localhost:22100/api/latest", None)
+        http_helper.set_timeout("http://localhost:2210", None)
+
+    def test_session_is_shared_per_base_url(self):
+        session = http_helper.get_session("http://localhost:22100/api/latest")
+        self.assertIs(session, http_helper.get_session("http://localhost:22100/api/latest/histogram"))
+        self.assertIsNot(session, http_helper.get_session("http://localhost:22200/api/latest"))
+
+    def test_close_sessions(self):
+        session = http_helper.get_session("http://localhost:22100/api/latest")
+        http_helper.close_sessions()
+        self.assertIsNot(session, http_helper.get_session("http://localhost:22100/api/latest"))
+
+    def test_timeout_uses_longest_prefix(self):
+        http_helper.set_timeout("http://localhost:22100", 5)
+        http_helper.set_timeout("http://localhost:22100/api/latest", 2)
+        self.assertEqual(http_helper.get_timeout("http://localhost:22100/api/latest/caps"), 2)
+        self.assertEqual(http_helper.get_timeout("http://localhost:22100/other"), 5)
+        self.assertEqual(http_helper.get_timeout("http://localhost:22200/api/latest"), http_helper.DEFAULT_TIMEOUT)
+
+    def test_prefix_matches_whole_path_segments(self):
+        http_helper.set_timeout("http://localhost:2210", 5)
+        http_helper.register_poll_hints("http://localhost:2210/api", {"start": COMMAND_POLLING})
+        self.assertEqual(http_helper.get_timeout("http://localhost:2210/api/latest"), 5)
+        self.assertEqual(http_helper.get_timeout("http://localhost:22100/api/latest"), http_helper.DEFAULT_TIMEOUT)
+        self.assertIs(http_helper.get_poll_strategy("http://localhost:2210/api", {"start": True}), COMMAND_POLLING)
+        self.assertIs(http_helper.get_poll_strategy("http://localhost:2210/api_v2", {"start": True}),
+                      http_helper.DEFAULT_POLLING)
+
+    def test_driver_without_timeout_keeps_the_configured_timeout(self):
+        http_helper.set_timeout("http://localhost:22100/api/latest", 2)
+        MotronaDx350("http://localhost:22100/api/latest")
+        self.assertEqual(http_helper.get_timeout("http://localhost:22100/api/latest/status"), 2)
+
+    def test_poll_strategy_waits_indefinitely_by_default(self):
+        self.assertIsNone(http_helper.DEFAULT_POLLING.deadline)
+        self.assertFalse(http_helper.is_past_deadline(http_helper.DEFAULT_POLLING, 0))
+
+    def test_poll_intervals_back_off_to_cap(self):
+        strategy = PollStrategy(initial_interval=0.01, max_interval=0.05, backoff_factor=2)
+        self.assertEqual(list(islice(strategy.intervals(), 5)), [0.01, 0.02, 0.04, 0.05, 0.05])
+
+    def test_poll_hint_by_url_and_request_key(self):
+        strategy = PollStrategy(initial_interval=0.5)
+        http_helper.register_poll_hints("http://localhost:22100/api/latest", {"some_slow_request": strategy})
+        self.assertIs(http_helper.get_poll_strategy("http://localhost:22100/api/latest",
+                                                    {"request_id": "1", "some_slow_request": True}), strategy)
+        self.assertIs(http_helper.get_poll_strategy("http://localhost:22100/api/latest",
+                                                    {"request_id": "1", "other": True}), http_helper.DEFAULT_POLLING)
+        self.assertIs(http_helper.get_poll_strategy("http://localhost:22200/api/latest",
+                                                    {"request_id": "1", "some_slow_request": True}),
+                      http_helper.DEFAULT_POLLING)
+
+    def test_poll_hints_are_not_shared_between_drivers(self):
+        Caen("http://localhost:22100/api/latest")
+        FastcomMpa3("http://localhost:22200/api/latest")
+        start = {"request_id": "1", "start": True}
+        self.assertIs(http_helper.get_poll_strategy("http://localhost:22100/api/latest", start), COMMAND_POLLING)
+        self.assertIs(http_helper.get_poll_strategy("http://localhost:22200/api/latest", start),
+                      http_helper.DEFAULT_POLLING)
+
+    @patch("waspy.drivers.http_helper.time.sleep", MagicMock())
+    @patch("waspy.drivers.http_helper.get_json")
+    def test_wait_for_request_done(self, get_json):
+        get_json.side_effect = [
+            {"error": "Success", "request_finished": False, "request_id": "1"},
+            {"error": "No error", "request_finished": True, "request_id": "0"},
+            {"error": "Success", "request_finished": True, "request_id": "1"},
+        ]
+        http_helper.wait_for_request_done("url", {"request_id": "1"})
+        self.assertEqual(get_json.call_count, 3)
+
+    @patch("waspy.drivers.http_helper.time.sleep", MagicMock())
+    @patch("waspy.drivers.http_helper.get_json")
+    def test_wait_for_request_deadline(self, get_json):
+        get_json.return_value = {"error": "Success", "request_finished": False, "request_id": "1"}
+        with self.assertRaises(DriverError):
+            http_helper.wait_for_request_done("url", {"request_id": "1"}, PollStrategy(deadline=0))
+
+    @patch("waspy.drivers.http_helper.time.sleep", MagicMock())
+    @patch("waspy.drivers.http_helper.get_json")
+    def test_wait_for_requests(self, get_json):
+        responses = {
+            "url_1": iter([{"error": "Success", "request_finished": True, "request_id": "1"}]),
+            "url_2": iter([{"error": "Success", "request_finished": False, "request_id": "2"},
+                           {"error": "Success", "request_finished": True, "request_id": "2"}]),
+            "url_3": iter([{"error": "Motor stalled", "request_finished": True, "request_id": "3"}]),
+        }
+        get_json.side_effect = lambda url: next(responses[url])
+        pending = [http_helper.PendingRequest(f'url_{index}', {"request_id": str(index)}) for index in range(1, 4)]
+
+        with self.assertRaises(DriverError) as context:
+            http_helper.wait_for_requests(pending)
+        self.assertEqual(str(context.exception), "url_3: Motor stalled")
+        self.assertEqual([request.finished for request in pending], [True, True, True])
+        self.assertEqual(get_json.call_count, 4)
+
+    @patch("waspy.drivers.http_helper.time.sleep", MagicMock())
+    @patch("waspy.drivers.http_helper.post_dictionary")
+    @patch("waspy.drivers.http_helper.get_json")
+    def test_post_without_wait_does_not_wait_for_a_pending_request(self, get_json, post_dictionary):
+        first = http_helper.post_request("url", {"request_id": "1", "clear": True}, False)
+        second = http_helper.post_request("url", {"request_id": "2", "start": True}, False)
+
+        get_json.assert_not_called()
+        self.assertFalse(first.finished)
+        self.assertFalse(second.finished)
+        self.assertEqual(post_dictionary.call_count, 2)
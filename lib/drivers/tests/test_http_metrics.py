@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from waspy.drivers import http_helper, http_metrics
+from waspy.drivers.driver_error import DriverError
+from waspy.drivers.http_helper import PollStrategy
+
+
+class TestHttpMetrics(unittest.TestCase):
+    def setUp(self):
+        http_metrics.reset_metrics()
+
+    def tearDown(self):
+        http_metrics.reset_metrics()
+
+    def test_calls_are_grouped_per_endpoint_and_kind(self):
+        http_metrics.record_call("http://localhost:20200/api/latest/histogram?board=33&channel=0", "GET", 0.003)
+        http_metrics.record_call("http://localhost:20200/api/latest/histogram?board=33&channel=1", "GET", 0.02)
+        http_metrics.record_call("http://localhost:20200/api/latest", http_metrics.request_kind(
+            {"request_id": "1", "clear": True, "start": True}), 0.2)
+
+        calls = {(call.url, call.kind): call for call in http_metrics.get_metrics_snapshot().calls}
+        histogram = calls[("http://localhost:20200/api/latest/histogram", "GET")]
+        self.assertEqual(histogram.count, 2)
+        self.assertEqual(histogram.max_seconds, 0.02)
+        self.assertEqual(histogram.latency_buckets[2], 1)
+        self.assertEqual(histogram.latency_buckets[4], 1)
+        self.assertEqual(calls[("http://localhost:20200/api/latest", "POST clear,start")].count, 1)
+
+    def test_timed_counts_errors_and_timeouts(self):
+        for error in [requests.Timeout(), ValueError()]:
+            with self.assertRaises(type(error)):
+                with http_metrics.timed("http://localhost:20200/api/latest", "GET"):
+                    raise error
+        call = http_metrics.get_metrics_snapshot().calls[0]
+        self.assertEqual((call.count, call.timeouts, call.errors), (2, 1, 1))
+
+    @patch("waspy.drivers.http_helper.time.sleep", MagicMock())
+    @patch("waspy.drivers.http_helper.get_json")
+    def test_wait_records_polls(self, get_json):
+        get_json.side_effect = [
+            {"error": "Success", "request_finished": False, "request_id": "1"},
+            {"error": "Success", "request_finished": True, "request_id": "1"},
+        ]
+        http_helper.wait_for_request_done("http://localhost:20100/api/latest", {"request_id": "1", "start": True})
+        get_json.return_value = {"error": "Success", "request_finished": False, "request_id": "2"}
+        get_json.side_effect = None
+        with self.assertRaises(DriverError):
+            http_helper.wait_for_request_done("http://localhost:20100/api/latest", {"request_id": "2", "start": True},
+                                              PollStrategy(deadline=0))
+
+        wait = http_metrics.get_metrics_snapshot().waits[0]
+        self.assertEqual((wait.kind, wait.count, wait.polls, wait.max_polls, wait.timeouts), ("POST start", 2, 3, 2, 1))
+
+    def test_summary_is_logged(self):
+        http_metrics.record_call("http://localhost:20200/api/latest", "GET", 0.01)
+        http_metrics.record_wait("http://localhost:20200/api/latest", "POST start", 3, 0.05)
+        with self.assertLogs(level="INFO") as logs:
+            http_metrics.log_metrics_summary()
+        self.assertEqual(len(logs.output), 2)
@@ -0,0 +1,23 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from waspy.drivers.driver_error import DriverError
+from waspy.drivers.http_helper import PollStrategy
+from waspy.drivers.ims_mdrive import ImsMDrive
+
+
+@patch("waspy.drivers.ims_mdrive.time.sleep", MagicMock())
+@patch("waspy.drivers.ims_mdrive.post_request", MagicMock())
+class TestImsMDrive(unittest.TestCase):
+    @patch("waspy.drivers.ims_mdrive.get_json")
+    def test_move_waits_until_arrived(self, get_json):
+        get_json.side_effect = [{"moving_to_target": True}, {"moving_to_target": False}]
+        ImsMDrive("http://localhost:22100").move(5)
+        self.assertEqual(get_json.call_count, 2)
+
+    @patch("waspy.drivers.ims_mdrive.MOVE_POLLING", PollStrategy(deadline=0))
+    @patch("waspy.drivers.ims_mdrive.get_json", MagicMock(return_value={"moving_to_target": True}))
+    def test_move_deadline(self):
+        with self.assertRaises(DriverError) as context:
+            ImsMDrive("http://localhost:22100").move(5)
+        self.assertEqual(str(context.exception), "http://localhost:22100: move did not finish within 0.0 seconds")
@@ -39,6 +39,20 @@ class TestDbTables(unittest.TestCase):
                                                                                   {"request_id": "some_request",
                                                                                    "target_charge": 500})
 
+    def test_arm(self):
+        self.motrona_dx350.arm(500)
+        waspy.drivers.motrona_dx350.post_request.assert_called_once_with("http://localhost:22100",
+                                                                          {"request_id": "some_request",
+                                                                           "pause_counting": True,
+                                                                           "target_charge": 500})
+
+    def test_arm_and_start(self):
+        self.motrona_dx350.arm(500, start=True)
+        self.assertEqual([call.args for call in waspy.drivers.motrona_dx350.post_request.call_args_list],
+                         [("http://localhost:22100", {"request_id": "some_request", "pause_counting": True,
+                                                      "target_charge": 500}),
+                          ("http://localhost:22100", {"request_id": "some_request", "clear-start_counting": True})])
+
     def test_counting_done(self):
         waspy.drivers.motrona_dx350.get_json = MagicMock()
         waspy.drivers.motrona_dx350.sleep = MagicMock()
@@ -56,6 +70,35 @@ class TestDbTables(unittest.TestCase):
         self.assertEqual(status, {"dummy": "value"})
         waspy.drivers.motrona_dx350.get_json.assert_called_once()
 
+    def test_derived_getters_share_status(self):
+        waspy.drivers.motrona_dx350.get_json = MagicMock(
+            return_value={"status": "Counting", "charge(nC)": "12.5", "target_charge(nC)": "100"})
+        self.assertTrue(self.motrona_dx350.is_counting())
+        self.assertEqual(self.motrona_dx350.get_charge(), 12.5)
+        self.assertEqual(self.motrona_dx350.get_target_charge(), 100)
+        waspy.drivers.motrona_dx350.get_json.assert_called_once()
+
+    def test_post_invalidates_status(self):
+        waspy.drivers.motrona_dx350.get_json = MagicMock(return_value={"status": "Done"})
+        self.motrona_dx350.get_status()
+        self.motrona_dx350.start_count_from_zero()
+        self.motrona_dx350.get_status()
+        self.assertEqual(waspy.drivers.motrona_dx350.get_json.call_count, 2)
+
+    def test_invalidate(self):
+        waspy.drivers.motrona_dx350.get_json = MagicMock(return_value={"status": "Done"})
+        self.motrona_dx350.get_status()
+        self.motrona_dx350.invalidate()
+        self.motrona_dx350.get_status()
+        self.assertEqual(waspy.drivers.motrona_dx350.get_json.call_count, 2)
+
+    def test_status_expires(self):
+        motrona_dx350 = MotronaDx350("http://localhost:22100", status_ttl=0)
+        waspy.drivers.motrona_dx350.get_json = MagicMock(return_value={"status": "Done"})
+        motrona_dx350.get_status()
+        motrona_dx350.get_status()
+        self.assertEqual(waspy.drivers.motrona_dx350.get_json.call_count, 2)
+
 
 
 
@@ -0,0 +1,46 @@
+from typing import Union
+
+from waspy.drivers.aml_smd2 import POLL_HINTS
+from waspy.drivers.http_helper import generate_request_id, set_timeout, register_poll_hints
+from waspy.drivers.aio.http_helper import post_request, get_json
+
+
+class AmlSmd2:
+    """A Stepper motor driver, asyncio version of waspy.drivers.aml_smd2.AmlSmd2"""
+    _url: str
+
+    def __init__(self, url: str, timeout: Union[float, None] = None):
+        self._url = url
+        register_poll_hints(url, POLL_HINTS)
+        if timeout is not None:
+            set_timeout(url, timeout)
+
+    async def move_first(self, target_position, wait=True):
+        if target_position is None:
+            return
+        request = {"request_id": generate_request_id(), "set_m1_target_position": target_position}
+        await post_request(self._url, request, wait)
+
+    async def move_second(self, target_position, wait=True):
+        if target_position is None:
+            return
+        request = {"request_id": generate_request_id(), "set_m2_target_position": target_position}
+        await post_request(self._url, request, wait)
+
+    async def move_both(self, positions, wait=True):
+        await self.move_first(positions[0], wait)
+        await self.move_second(positions[1], wait)
+
+    async def move_both_simultaneously(self, positions: list, wait=True):
+        if None in positions:
+            return
+        request = {"request_id": generate_request_id(), "set_m1_target_position": positions[0],
+                   "set_m2_target_position": positions[1]}
+        await post_request(self._url, request, wait)
+
+    async def load(self, wait=True):
+        request = {"request_id": generate_request_id(), "m1_load": True, "m2_load": True}
+        await post_request(self._url, request, wait)
+
+    async def get_status(self):
+        return await get_json(self._url)
@@ -0,0 +1,109 @@
+from typing import List, Union
+
+import numpy as np
+
+from waspy.drivers.caen import DetectorMetadata, HISTOGRAM_TEXT_TYPE, HISTOGRAM_ACCEPT_BINARY, pack_histogram, \
+    HistogramCache, POLL_HINTS, HISTOGRAM_CONTENT_TYPES, HISTOGRAM_DELTA_TYPE, check_histogram_response, \
+    histogram_urls, decode_histogram
+from waspy.drivers.driver_error import DriverError
+from waspy.drivers.http_helper import generate_request_id, set_timeout, register_poll_hints
+from waspy.drivers.aio.http_helper import post_request, get_json, get_content_with_response_code, \
+    get_content_with_etag
+
+
+class Caen:
+    """A data acquisition system, asyncio version of waspy.drivers.caen.Caen"""
+    _url: str
+    _histogram_cache: Union[HistogramCache, None]
+
+    def __init__(self, url: str, timeout: Union[float, None] = None,
+                 histogram_cache: Union[HistogramCache, None] = None):
+        """With a histogram_cache, the raw histograms are fetched conditionally"""
+        self._url = url
+        self._histogram_cache = histogram_cache
+        register_poll_hints(url, POLL_HINTS)
+        if timeout is not None:
+            set_timeout(url, timeout)
+
+    async def clear(self):
+        await post_request(self._url, {'request_id': generate_request_id(), 'clear': True})
+
+    async def start(self):
+        await post_request(self._url, {'request_id': generate_request_id(), 'start': True})
+
+    async def stop(self):
+        await post_request(self._url, {'request_id': generate_request_id(), 'stop': True})
+
+    async def read_register(self, board_id: str, hex_register_address: str) -> str:
+        request = {
+            "request_id": generate_request_id(),
+            "read_register": {
+                "board_id": board_id,
+                "register_address": hex_register_address
+            }
+        }
+        await post_request(self._url, request)
+        response = await get_json(self._url)
+        return response["boards"][board_id]["register_value"]
+
+    async def do_detectors_exist(self, detectors: List[DetectorMetadata]):
+        boards = (await self.get_status())["boards"]
+        for detector in detectors:
+            board = boards.get(detector.board)
+            if board is None:
+                return False
+            nr_of_channels = len(board["channels"])
+            if not detector.channel < nr_of_channels:
+                return False
+        return True
+
+    async def set_registry(self, board_id: str, registry_filename: str):
+        await post_request(self._url, {'request_id': generate_request_id(), 'stop': True})
+        request = {
+            "request_id": generate_request_id(),
+            "upload_registry": {
+                "board_id": board_id,
+                "filename": registry_filename
+            }
+        }
+        await post_request(self._url, request)
+
+    async def get_raw_histogram(self, board, channel) -> str:
+        content_type, content = await self._get_histogram_content(board, channel, HISTOGRAM_TEXT_TYPE)
+        return content.decode()
+
+    async def get_raw_histogram_array(self, board, channel) -> np.ndarray:
+        if self._histogram_cache is not None:
+            return await self._get_cached_histogram(board, channel)
+        content_type, content = await self._get_histogram_content(board, channel, HISTOGRAM_ACCEPT_BINARY)
+        return decode_histogram(content_type, content)
+
+    async def _get_cached_histogram(self, board, channel) -> np.ndarray:
+        etag = self._histogram_cache.get_etag(board, channel)
+        for url in histogram_urls(self._url, board, channel, etag):
+            http_code, content_type, new_etag, content = await get_content_with_etag(url, HISTOGRAM_ACCEPT_BINARY,
+                                                                                      etag)
+            if http_code != 404:
+                if http_code != 304:
+                    check_histogram_response(url, http_code, content_type,
+                                             HISTOGRAM_CONTENT_TYPES + (HISTOGRAM_DELTA_TYPE,))
+                return self._histogram_cache.update(board, channel, http_code, content_type, new_etag, content)
+        raise DriverError(f'Could not retrieve histogram. Does this detector: ({board},{channel}) exist?')
+
+    async def _get_histogram_content(self, board, channel, accept: str):
+        for url in histogram_urls(self._url, board, channel):
+            http_code, content_type, content = await get_content_with_response_code(url, accept)
+            if http_code != 404:
+                check_histogram_response(url, http_code, content_type)
+                return content_type, content
+        raise DriverError(f'Could not retrieve histogram. Does this detector: ({board},{channel}) exist?')
+
+    async def get_histogram_array(self, meta_data: DetectorMetadata) -> np.ndarray:
+        data = await self.get_raw_histogram_array(meta_data.board, meta_data.channel)
+        return pack_histogram(data, meta_data)
+
+    async def get_histogram(self, meta_data: DetectorMetadata) -> List[int]:
+        return (await self.get_histogram_array(meta_data)).tolist()
+
+    async def get_status(self):
+        return await get_json(self._url)
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from typing import Union
+
+from waspy.drivers.fastcom_mpa3 import POLL_HINTS
+from waspy.drivers.http_helper import generate_request_id, set_timeout, register_poll_hints
+from waspy.drivers.aio.http_helper import post_request, get_json, get_text
+
+
+class FastcomMpa3:
+    """A data acquisition system, asyncio version of waspy.drivers.fastcom_mpa3.FastcomMpa3"""
+    _url: str
+
+    def __init__(self, url: str, timeout: Union[float, None] = None):
+        self._url = url
+        register_poll_hints(url, POLL_HINTS)
+        if timeout is not None:
+            set_timeout(url, timeout)
+
+    async def wait_acquisition_done(self):
+        while True:
+            await asyncio.sleep(1)
+            if not await self.acquiring():
+                logging.info("[WASPY.DRIVERS.AIO.FASTCOM_MPA3] Acquisition has completed")
+                break
+
+    async def wait_acquisition_started(self):
+        while True:
+            await asyncio.sleep(1)
+            if await self.acquiring():
+                logging.info("[WASPY.DRIVERS.AIO.FASTCOM_MPA3] Acquisition has started")
+                break
+
+    async def acquiring(self) -> bool:
+        response = await get_json(self._url)
+        return response["acquisition_status"]["acquiring"]
+
+    async def stop_and_clear(self):
+        request = {"request_id": generate_request_id(), "halt": True, "erase": True}
+        await post_request(self._url, request)
+
+    async def configure(self, measuring_time_sec: int, output_filename: str):
+        request = {"request_id": generate_request_id(),
+                   "run_time_enable": True,
+                   "set_run_time_setpoint": measuring_time_sec,
+                   "set_filename": output_filename
+                   }
+        await post_request(self._url, request)
+
+    async def reupload_mpa3_cnf(self):
+        """This re-uploads the cnf file from disk. refer to the fastcom mpa3 docs for more information"""
+        await post_request(self._url, {"request_id": generate_request_id(), "reupload_mpa3_cnf": True})
+
+    async def start(self):
+        await post_request(self._url, {"request_id": generate_request_id(), "start": True})
+
+    async def convert_data_to_ascii(self):
+        await post_request(self._url, {"request_id": generate_request_id(), "convert": True})
+
+    async def get_measurement_time(self):
+        return (await get_json(self._url))["acquisition_status"]["real_time"]
+
+    async def get_histogram(self):
+        return await get_text(self._url + "/histogram")
+
+    async def get_status(self):
+        return await get_json(self._url)
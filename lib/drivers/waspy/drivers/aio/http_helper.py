@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Union
+
+import httpx
+
+from waspy.drivers.driver_error import DriverError
+from waspy.drivers.http_helper import is_request_done, get_timeout, get_pool_size, get_poll_strategy, check_deadline, \
+    PollStrategy, DEFAULT_TIMEOUT, is_past_deadline
+from waspy.drivers.http_metrics import timed, record_wait, request_kind
+
+'''
+The asyncio counterpart of waspy.drivers.http_helper. All requests share a single httpx.AsyncClient, which keeps a pool
+of connections alive per daemon. Timeouts are shared with the blocking helpers, see
+waspy.drivers.http_helper.set_timeout. The calls are recorded in waspy.drivers.http_metrics as well
+
+Example usage:
+    async def main():
+        status = await get_json("http://localhost:22100/api/latest")
+        await close_client()
+ '''
+
+_client: Union[httpx.AsyncClient, None] = None
+_TIMEOUT_ERRORS = (httpx.TimeoutException,)
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=get_pool_size())
+        _client = httpx.AsyncClient(limits=limits)
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logging.info('[WASPY.DRIVERS.AIO.HTTP_HELPER] closed async http client')
+
+
+async def get_text_with_response_code(url):
+    response = await _get(url)
+    return response.status_code, response.text
+
+
+async def get_json_with_response_code(url):
+    response = await _get(url)
+    return response.status_code, response.json()
+
+
+async def get_content_with_response_code(url, accept: str):
+    """Returns the status code, the content type and the (decompressed) body of the response"""
+    with timed(url, "GET", _TIMEOUT_ERRORS):
+        response = await get_client().get(url, headers={"Accept": accept}, timeout=get_timeout(url))
+    return response.status_code, response.headers.get("Content-Type", ""), response.content
+
+
+async def get_content_with_etag(url, accept: str, etag: Union[str, None] = None):
+    """A conditional get, see waspy.drivers.http_helper.get_content_with_etag"""
+    headers = {"Accept": accept}
+    if etag:
+        headers["If-None-Match"] = etag
+    with timed(url, "GET", _TIMEOUT_ERRORS):
+        response = await get_client().get(url, headers=headers, timeout=get_timeout(url))
+    return response.status_code, response.headers.get("Content-Type", ""), response.headers.get("ETag"), \
+        response.content
+
+
+async def get_text(url):
+    response = await _get(url)
+    return response.text
+
+
+async def get_json(url):
+    response = await _get(url)
+    return response.json()
+
+
+async def get_json_safe(url, default_value: Dict, timeout=DEFAULT_TIMEOUT) -> Dict:
+    try:
+        with timed(url, "GET", _TIMEOUT_ERRORS):
+            response = await get_client().get(url, timeout=timeout)
+        json_value = response.json()
+    except httpx.HTTPError as e:
+        json_value = default_value
+    return json_value
+
+
+async def post_safe(url, json=None):
+    json = json if json else {}
+    try:
+        response = await _post(url, json)
+        return response.status_code, response.text
+    except httpx.HTTPError as e:
+        logging.info(f'[WASPY.DRIVERS.AIO.HTTP_HELPER] failed to post ({json}) to ({url})')
+        return 400, ""
+
+
+async def post_dictionary(url, data):
+    response = await _post(url, data)
+    return response.status_code, response.text
+
+
+async def wait_for_request_done(url, request, strategy: Union[PollStrategy, None] = None):
+    strategy = strategy if strategy else get_poll_strategy(url, request)
+    start = time.monotonic()
+    polls = 0
+    timed_out = False
+    try:
+        for interval in strategy.intervals():
+            await asyncio.sleep(interval)
+            response = await get_json(url)
+            polls += 1
+            if is_request_done(url, request, response):
+                break
+            check_deadline(url, request, strategy, start)
+    except DriverError:
+        timed_out = is_past_deadline(strategy, start)
+        raise
+    finally:
+        record_wait(url, request_kind(request), polls, time.monotonic() - start, timed_out)
+
+
+async def post_request(url, request, wait=True):
+    await post_dictionary(url, request)
+    if wait:
+        await wait_for_request_done(url, request)
+
+
+async def _get(url):
+    with timed(url, "GET", _TIMEOUT_ERRORS):
+        return await get_client().get(url, timeout=get_timeout(url))
+
+
+async def _post(url, json):
+    with timed(url, request_kind(json), _TIMEOUT_ERRORS):
+        return await get_client().post(url, json=json, timeout=get_timeout(url))
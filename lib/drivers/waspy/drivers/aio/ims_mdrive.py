@@ -0,0 +1,43 @@
+import asyncio
+import time
+from typing import Union
+
+from waspy.drivers.http_helper import generate_request_id, set_timeout
+from waspy.drivers.ims_mdrive import MOVE_POLLING, check_move_deadline
+from waspy.drivers.aio.http_helper import post_request, get_json
+
+
+class ImsMDrive:
+    """A Stepper motor driver, asyncio version of waspy.drivers.ims_mdrive.ImsMDrive"""
+    _url: str
+
+    def __init__(self, url: str, timeout: Union[float, None] = None):
+        self._url = url
+        if timeout is not None:
+            set_timeout(url, timeout)
+
+    async def move(self, target_position, wait=True):
+        if target_position is None:
+            return
+        request = {"request_id": generate_request_id(), "set_motor_target_position": target_position}
+        await post_request(self._url, request)
+        if wait:
+            await self.wait_for_move_done()
+
+    async def load(self, wait=True):
+        request = {"request_id": generate_request_id(), "load": True}
+        await post_request(self._url, request)
+        if wait:
+            await self.wait_for_move_done()
+
+    async def wait_for_move_done(self):
+        start = time.monotonic()
+        for interval in MOVE_POLLING.intervals():
+            await asyncio.sleep(interval)
+            response = await get_json(self._url)
+            if not response["moving_to_target"]:
+                break
+            check_move_deadline(self._url, start)
+
+    async def get_status(self):
+        return await get_json(self._url)
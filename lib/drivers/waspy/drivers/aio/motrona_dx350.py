@@ -0,0 +1,52 @@
+import asyncio
+from typing import Union
+
+from waspy.drivers.motrona_dx350 import POLL_HINTS
+from waspy.drivers.http_helper import generate_request_id, set_timeout, register_poll_hints
+from waspy.drivers.aio.http_helper import post_request, get_json
+
+
+class MotronaDx350:
+    """A pulse/charge counter, asyncio version of waspy.drivers.motrona_dx350.MotronaDx350"""
+    _url: str
+
+    def __init__(self, url: str, timeout: Union[float, None] = None):
+        self._url = url
+        register_poll_hints(url, POLL_HINTS)
+        if timeout is not None:
+            set_timeout(url, timeout)
+
+    async def start_count_from_zero(self):
+        request = {"request_id": generate_request_id(), "clear-start_counting": True}
+        await post_request(self._url, request)
+
+    async def start_count(self):
+        request = {"request_id": generate_request_id(), "start_counting": True}
+        await post_request(self._url, request)
+
+    async def pause(self):
+        request = {"request_id": generate_request_id(), "pause_counting": True}
+        await post_request(self._url, request)
+
+    async def wait_for_counting_done(self):
+        while True:
+            await asyncio.sleep(1)
+            response = await get_json(self._url)
+            if response["status"] == "Done":
+                break
+
+    async def is_counting(self):
+        return (await self.get_status())["status"] != "Done"
+
+    async def get_charge(self):
+        return float((await self.get_status())["charge(nC)"])
+
+    async def get_target_charge(self):
+        return float((await self.get_status())["target_charge(nC)"])
+
+    async def set_target_charge(self, target_charge):
+        request = {"request_id": generate_request_id(), "target_charge": target_charge}
+        await post_request(self._url, request)
+
+    async def get_status(self):
+        return await get_json(self._url)
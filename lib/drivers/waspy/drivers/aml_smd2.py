@@ -1,12 +1,22 @@
-from waspy.drivers.http_helper import generate_request_id, post_request, get_json
+from typing import Union
+
+from waspy.drivers.http_helper import generate_request_id, post_request, get_json, set_timeout, PollStrategy, \
+    register_poll_hints, PendingRequest
+
+MOVE_POLLING = PollStrategy(initial_interval=0.1, max_interval=1)
+POLL_HINTS = {request_key: MOVE_POLLING
+              for request_key in ["set_m1_target_position", "set_m2_target_position", "m1_load", "m2_load"]}
 
 
 class AmlSmd2:
     """A Stepper motor driver"""
     _url: str
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, timeout: Union[float, None] = None):
         self._url = url
+        register_poll_hints(url, POLL_HINTS)
+        if timeout is not None:
+            set_timeout(url, timeout)
 
     def move_first(self, target_position, wait=True):
         if target_position is None:
@@ -31,9 +41,24 @@ class AmlSmd2:
                    "set_m2_target_position": positions[1]}
         post_request(self._url, request, wait)
 
-    def load(self, wait=True):
+    def start_move(self, positions: list) -> Union[PendingRequest, None]:
+        """Sends the targets for both motors in a single request and returns without waiting. A None target is not
+        sent. Returns the pending request, to be checked with is_finished, or None when there was nothing to move"""
+        request = {"request_id": generate_request_id()}
+        if positions[0] is not None:
+            request["set_m1_target_position"] = positions[0]
+        if positions[1] is not None:
+            request["set_m2_target_position"] = positions[1]
+        if len(request) == 1:
+            return None
+        return post_request(self._url, request, False)
+
+    def is_finished(self, pending: PendingRequest) -> bool:
+        return pending.poll()
+
+    def load(self, wait=True) -> PendingRequest:
         request = {"request_id": generate_request_id(), "m1_load": True, "m2_load": True}
-        post_request(self._url, request, wait)
+        return post_request(self._url, request, wait)
 
     def get_status(self):
         return get_json(self._url)
@@ -1,10 +1,35 @@
-import math
-from typing import List
+import json
+from threading import Lock
+from typing import List, Union, Dict, Tuple
+from urllib.parse import quote
 
+import numpy as np
 from pydantic import BaseModel, Field
 
-from waspy.drivers.http_helper import generate_request_id, post_request, get_json, get_text_with_response_code, \
-    DriverError
+from waspy.drivers.http_helper import generate_request_id, post_request, get_json, get_content_with_response_code, \
+    get_content_with_etag, set_timeout, PollStrategy, register_poll_hints, DriverError, PendingRequest
+
+'''
+Histograms can be fetched conditionally. A daemon supporting this tags every histogram response with an ETag. A request
+with that etag in If-None-Match is answered with 304 when nothing changed. A request with since=<etag> is answered with
+the bins changed since that version, as json: {"bins": [...], "values": [...]}, or with the full histogram when the
+daemon can not tell. The HistogramCache keeps the last version of every histogram and merges these answers into it.
+
+Example usage:
+    caen = Caen("http://localhost:20200/api/latest", histogram_cache=HistogramCache())
+    caen.get_raw_histogram_array("33", 0)  # full histogram
+    caen.get_raw_histogram_array("33", 0)  # 304 or only the changed bins
+ '''
+
+COMMAND_POLLING = PollStrategy(initial_interval=0.01, max_interval=0.1, deadline=30)
+POLL_HINTS = {request_key: COMMAND_POLLING for request_key in ["clear", "start", "stop"]}
+
+HISTOGRAM_BINARY_TYPE = "application/octet-stream"
+HISTOGRAM_TEXT_TYPE = "text/plain"
+HISTOGRAM_BINARY_DTYPE = np.dtype("<u4")
+HISTOGRAM_DELTA_TYPE = "application/json"
+HISTOGRAM_ACCEPT_BINARY = f'{HISTOGRAM_BINARY_TYPE}, {HISTOGRAM_TEXT_TYPE};q=0.5'
+HISTOGRAM_CONTENT_TYPES = (HISTOGRAM_BINARY_TYPE, HISTOGRAM_TEXT_TYPE)
 
 
 class DetectorMetadata(BaseModel):
@@ -17,21 +42,65 @@ class DetectorMetadata(BaseModel):
                     "sized bin intervals. values on the maximum side are potentially discarded")
 
 
+class HistogramCache:
+    """The last fetched raw histogram and its etag, per board and channel. The cached arrays are returned as is, they
+    should not be modified"""
+    _entries: Dict[Tuple[str, int], Tuple[str, np.ndarray]]
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = Lock()
+
+    def get_etag(self, board, channel) -> Union[str, None]:
+        with self._lock:
+            return self._entries.get((board, channel), (None, None))[0]
+
+    def update(self, board, channel, http_code: int, content_type: str, etag: Union[str, None],
+               content: bytes) -> np.ndarray:
+        """Applies a histogram response and returns the resulting histogram"""
+        key = (board, channel)
+        with self._lock:
+            cached = self._entries.get(key, (None, None))[1]
+        if http_code == 304 or content_type.startswith(HISTOGRAM_DELTA_TYPE):
+            if cached is None:
+                raise DriverError(f'Received a histogram update for ({board},{channel}) without a cached histogram')
+            histogram = _merge_histogram_delta(cached, content) if http_code != 304 else cached
+        else:
+            histogram = decode_histogram(content_type, content)
+        with self._lock:
+            if etag:
+                self._entries[key] = (etag, histogram)
+            else:
+                self._entries.pop(key, None)
+        return histogram
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
 class Caen:
     """A data acquisition system"""
     _url: str
+    _histogram_cache: Union[HistogramCache, None]
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, timeout: Union[float, None] = None,
+                 histogram_cache: Union[HistogramCache, None] = None):
+        """With a histogram_cache, the raw histograms are fetched conditionally"""
         self._url = url
+        self._histogram_cache = histogram_cache
+        register_poll_hints(url, POLL_HINTS)
+        if timeout is not None:
+            set_timeout(url, timeout)
 
-    def clear(self):
-        post_request(self._url, {'request_id': generate_request_id(), 'clear': True})
+    def clear(self, wait=True) -> PendingRequest:
+        return post_request(self._url, {'request_id': generate_request_id(), 'clear': True}, wait)
 
-    def start(self):
-        post_request(self._url, {'request_id': generate_request_id(), 'start': True})
+    def start(self, wait=True) -> PendingRequest:
+        return post_request(self._url, {'request_id': generate_request_id(), 'start': True}, wait)
 
-    def stop(self):
-        post_request(self._url, {'request_id': generate_request_id(), 'stop': True})
+    def stop(self, wait=True) -> PendingRequest:
+        return post_request(self._url, {'request_id': generate_request_id(), 'stop': True}, wait)
 
     def read_register(self, board_id: str, hex_register_address: str) -> str:
         request = {
@@ -67,34 +136,96 @@ class Caen:
         }
         post_request(self._url, request)
 
-    def get_raw_histogram(self, board, channel):
-        url = self._url + f"/histogram?board={board}&channel={channel}"
-        http_code, data = get_text_with_response_code(url)
-        if http_code == 404:
-            url = self._url + f"/histogram/{board}/{channel}"
-            http_code, data = get_text_with_response_code(url)
-            if http_code == 404:
-                raise DriverError(f'Could not retrieve histogram. Does this detector: '
-                              f'({board},{channel}) exist?')
-        return data
+    def get_raw_histogram(self, board, channel) -> str:
+        content_type, content = self._get_histogram_content(board, channel, HISTOGRAM_TEXT_TYPE)
+        return content.decode()
+
+    def get_raw_histogram_array(self, board, channel) -> np.ndarray:
+        """Asks the daemon for the histogram as little endian uint32 values. Daemons that do not support this, will
+        respond with the text format"""
+        if self._histogram_cache is not None:
+            return self._get_cached_histogram(board, channel)
+        content_type, content = self._get_histogram_content(board, channel, HISTOGRAM_ACCEPT_BINARY)
+        return decode_histogram(content_type, content)
+
+    def _get_cached_histogram(self, board, channel) -> np.ndarray:
+        etag = self._histogram_cache.get_etag(board, channel)
+        for url in histogram_urls(self._url, board, channel, etag):
+            http_code, content_type, new_etag, content = get_content_with_etag(url, HISTOGRAM_ACCEPT_BINARY, etag)
+            if http_code != 404:
+                if http_code != 304:
+                    check_histogram_response(url, http_code, content_type,
+                                             HISTOGRAM_CONTENT_TYPES + (HISTOGRAM_DELTA_TYPE,))
+                return self._histogram_cache.update(board, channel, http_code, content_type, new_etag, content)
+        raise DriverError(f'Could not retrieve histogram. Does this detector: ({board},{channel}) exist?')
+
+    def _get_histogram_content(self, board, channel, accept: str):
+        for url in histogram_urls(self._url, board, channel):
+            http_code, content_type, content = get_content_with_response_code(url, accept)
+            if http_code != 404:
+                check_histogram_response(url, http_code, content_type)
+                return content_type, content
+        raise DriverError(f'Could not retrieve histogram. Does this detector: ({board},{channel}) exist?')
+
+    def get_histogram_array(self, meta_data: DetectorMetadata) -> np.ndarray:
+        data = self.get_raw_histogram_array(meta_data.board, meta_data.channel)
+        return pack_histogram(data, meta_data)
 
     def get_histogram(self, meta_data: DetectorMetadata) -> List[int]:
-        data = self.get_raw_histogram(meta_data.board, meta_data.channel)
-        data = data.split(";")
-        data.pop()
-        data = [int(x.replace("\"", "")) for x in data]
-        packed_data = _pack(data, meta_data.bins_min, meta_data.bins_max, meta_data.bins_width)
-        return packed_data
+        return self.get_histogram_array(meta_data).tolist()
 
     def get_status(self):
         return get_json(self._url)
 
 
-def _pack(data: List[int], index_min, index_max, width) -> List[int]:
-    subset = data[index_min:index_max]
-    samples_to_group_in_bin = math.floor(len(subset) / width)
-    packed_data = []
-    for index in range(0, samples_to_group_in_bin * width, samples_to_group_in_bin):
-        bin_sum = sum(subset[index:index + samples_to_group_in_bin])
-        packed_data.append(bin_sum)
-    return packed_data
+def pack_histogram(data: np.ndarray, meta_data: DetectorMetadata) -> np.ndarray:
+    """Packs a raw histogram as configured in the detector metadata"""
+    return _pack(data, meta_data.bins_min, meta_data.bins_max, meta_data.bins_width)
+
+
+def check_histogram_response(url, http_code: int, content_type: str, content_types=HISTOGRAM_CONTENT_TYPES):
+    """Raises a DriverError for an error response, or a response that is not a histogram, e.g. a proxy error page"""
+    if not 200 <= http_code < 300:
+        raise DriverError(f'{url}: histogram request failed with http status {http_code}')
+    if not content_type.startswith(content_types):
+        raise DriverError(f'{url}: unexpected histogram content type "{content_type}"')
+
+
+def histogram_urls(url, board, channel, since: Union[str, None] = None) -> List[str]:
+    """The urls a histogram can be fetched from, in the order to try them. Daemons support one of the two forms"""
+    if since is None:
+        return [url + f"/histogram?board={board}&channel={channel}", url + f"/histogram/{board}/{channel}"]
+    since = quote(since.strip('"'))
+    return [url + f"/histogram?board={board}&channel={channel}&since={since}",
+            url + f"/histogram/{board}/{channel}?since={since}"]
+
+
+def decode_histogram(content_type: str, content: bytes) -> np.ndarray:
+    """Decodes a full histogram response, in the binary or the text format"""
+    if content_type.startswith(HISTOGRAM_BINARY_TYPE):
+        return np.frombuffer(content, dtype=HISTOGRAM_BINARY_DTYPE).astype(np.int64)
+    return _parse_histogram(content.decode())
+
+
+def _merge_histogram_delta(histogram: np.ndarray, content: bytes) -> np.ndarray:
+    delta = json.loads(content)
+    merged = histogram.copy()
+    merged[np.asarray(delta["bins"], dtype=np.intp)] = delta["values"]
+    return merged
+
+
+def _parse_histogram(data: str) -> np.ndarray:
+    """The histogram is formatted as '"1";"2";"3";'. Everything after the last separator is discarded"""
+    data = data.replace("\"", "")
+    values = data[:max(data.rfind(";"), 0)]
+    return np.array(values.split(";") if values else [], dtype=np.int64)
+
+
+def _pack(data: np.ndarray, index_min, index_max, width) -> np.ndarray:
+    """Sums groups of consecutive samples into width bins. Samples that do not fill a complete group are discarded"""
+    subset = np.asarray(data, dtype=np.int64)[index_min:index_max]
+    samples_to_group_in_bin = len(subset) // width
+    if samples_to_group_in_bin == 0:
+        return np.zeros(0, dtype=np.int64)
+    grouped = subset[:samples_to_group_in_bin * width].reshape(width, samples_to_group_in_bin)
+    return grouped.sum(axis=1)
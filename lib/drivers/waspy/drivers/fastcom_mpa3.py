@@ -1,15 +1,23 @@
 import logging
 import time
+from typing import Union
 
-from waspy.drivers.http_helper import generate_request_id, post_request, get_json, get_text
+from waspy.drivers.http_helper import generate_request_id, post_request, get_json, get_text, set_timeout, \
+    PollStrategy, register_poll_hints
+
+CONVERT_POLLING = PollStrategy(initial_interval=0.2, max_interval=1, deadline=None)
+POLL_HINTS = {"convert": CONVERT_POLLING}
 
 
 class FastcomMpa3:
     """A data acquisition system"""
     _url: str
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, timeout: Union[float, None] = None):
         self._url = url
+        register_poll_hints(url, POLL_HINTS)
+        if timeout is not None:
+            set_timeout(url, timeout)
 
     def wait_acquisition_done(self):
         while True:
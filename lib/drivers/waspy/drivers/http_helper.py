@@ -1,36 +1,198 @@
 import logging
 import time
 from datetime import datetime
-from typing import Dict
+from threading import Lock
+from typing import Dict, Union, Iterator, Optional, Callable, List
+from urllib.parse import urlsplit
 
 import requests
+from pydantic import BaseModel, Field
 from requests import RequestException
+from requests.adapters import HTTPAdapter
 
 from waspy.drivers.driver_error import DriverError
+from waspy.drivers.http_metrics import timed, record_wait, request_kind
+
+'''
+All driver traffic goes through a registry of pooled sessions, one session per base url (scheme + host + port). This
+keeps the tcp connections to the hardware daemons alive in between requests, instead of opening a new connection for
+every status poll.
+
+Completion of a posted request is polled with exponential backoff. The polling strategy is picked from the keys in the
+request, drivers register hints for the request types they know the duration of. The hints are registered per driver
+url, so drivers using the same request keys do not share their hints.
+
+A request can be posted without waiting for it. The returned PendingRequest is waited for later by the caller, several
+pending requests to different daemons can be waited for at once with wait_for_requests. A daemon only reports the status
+of its last request, so a caller posting to a daemon with a pending request waits for that request first.
+
+Every call and every completion wait is recorded in waspy.drivers.http_metrics.
+
+Example usage:
+    configure_sessions(pool_size=4)
+    set_timeout("http://localhost:22100/api/latest", 2)
+    register_poll_hints("http://localhost:22100/api/latest",
+                        {"set_m1_target_position": PollStrategy(initial_interval=0.1, max_interval=0.5)})
+    get_json("http://localhost:22100/api/latest")
+    wait_for_requests([post_request(url_1, request_1, wait=False), post_request(url_2, request_2, wait=False)])
+    close_sessions()
+ '''
+
+DEFAULT_TIMEOUT = 10
+
+
+class PollStrategy(BaseModel):
+    initial_interval: float = Field(0.02, description="Seconds to wait before the first status request")
+    max_interval: float = Field(0.5, description="The interval between status requests is capped to this value")
+    backoff_factor: float = Field(2, description="The interval is multiplied with this factor after each request")
+    deadline: Optional[float] = Field(None, description="Give up after this many seconds. None waits indefinitely")
+
+    def intervals(self) -> Iterator[float]:
+        interval = self.initial_interval
+        while True:
+            yield interval
+            interval = min(interval * self.backoff_factor, self.max_interval)
+
+
+DEFAULT_POLLING = PollStrategy()
+
+
+class StatusCache:
+    """Keeps the last status snapshot of a daemon for ttl seconds. Concurrent readers share a single request"""
+    _fetch: Callable[[], Dict]
+    _ttl: float
+    _snapshot: Union[Dict, None]
+    _snapshot_time: float
+
+    def __init__(self, fetch: Callable[[], Dict], ttl: float):
+        self._fetch = fetch
+        self._ttl = ttl
+        self._snapshot = None
+        self._snapshot_time = 0
+        self._lock = Lock()
+
+    def get(self) -> Dict:
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._snapshot_time >= self._ttl:
+                self._snapshot = self._fetch()
+                self._snapshot_time = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+
+_sessions: Dict[str, requests.Session] = {}
+_timeouts: Dict[str, float] = {}
+_poll_hints: Dict[str, Dict[str, PollStrategy]] = {}
+_pool_size = 10
+_lock = Lock()
+
+
+def configure_sessions(pool_size: int = 10):
+    """Sets the amount of connections kept alive per base url. Only applies to sessions created afterwards"""
+    global _pool_size
+    _pool_size = pool_size
+
+
+def set_timeout(url: str, timeout: Union[float, None]):
+    """Sets the timeout for all requests with an url starting with the given url. None restores the default"""
+    with _lock:
+        if timeout is None:
+            _timeouts.pop(url, None)
+        else:
+            _timeouts[url] = timeout
+
+
+def register_poll_hints(url: str, hints: Dict[str, PollStrategy]):
+    """Requests to an url starting with the given url, containing one of the request keys of hints, will be polled for
+    completion with the strategy of that key. Replaces the hints registered before for the same url"""
+    with _lock:
+        _poll_hints[url] = hints
+
+
+def get_poll_strategy(url: str, request: Dict) -> PollStrategy:
+    with _lock:
+        prefix = _find_longest_prefix(url, _poll_hints)
+        hints = _poll_hints[prefix] if prefix is not None else {}
+    for key in request:
+        if key in hints:
+            return hints[key]
+    return DEFAULT_POLLING
+
+
+def get_pool_size() -> int:
+    return _pool_size
+
+
+def get_timeout(url: str) -> float:
+    with _lock:
+        prefix = _find_longest_prefix(url, _timeouts)
+        return _timeouts[prefix] if prefix is not None else DEFAULT_TIMEOUT
+
+
+def get_session(url: str) -> requests.Session:
+    base_url = _get_base_url(url)
+    with _lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            session = _make_session()
+            _sessions[base_url] = session
+        return session
+
+
+def close_sessions():
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+    logging.info(f'[WASPY.DRIVERS.HTTP_HELPER] closed {len(sessions)} http session(s)')
 
 
 def get_text_with_response_code(url):
-    response = requests.get(url, timeout=10)
+    response = _get(url)
     return response.status_code, response.text
 
 
 def get_json_with_response_code(url):
-    response = requests.get(url, timeout=10)
+    response = _get(url)
     return response.status_code, response.json()
 
 
+def get_content_with_response_code(url, accept: str):
+    """Returns the status code, the content type and the (decompressed) body of the response"""
+    with timed(url, "GET"):
+        response = get_session(url).get(url, headers={"Accept": accept}, timeout=get_timeout(url))
+    return response.status_code, response.headers.get("Content-Type", ""), response.content
+
+
+def get_content_with_etag(url, accept: str, etag: Union[str, None] = None):
+    """A conditional get. Returns the status code, the content type, the etag and the (decompressed) body of the
+    response. When the content still matches the given etag, the status code is 304 and the body is empty"""
+    headers = {"Accept": accept}
+    if etag:
+        headers["If-None-Match"] = etag
+    with timed(url, "GET"):
+        response = get_session(url).get(url, headers=headers, timeout=get_timeout(url))
+    return response.status_code, response.headers.get("Content-Type", ""), response.headers.get("ETag"), \
+        response.content
+
+
 def get_text(url):
-    response = requests.get(url, timeout=10)
+    response = _get(url)
     return response.text
 
 
 def get_json(url):
-    return requests.get(url, timeout=10).json()
+    return _get(url).json()
 
 
-def get_json_safe(url, default_value: Dict, timeout=10) -> Dict:
+def get_json_safe(url, default_value: Dict, timeout=DEFAULT_TIMEOUT) -> Dict:
     try:
-        json_value = requests.get(url, timeout=timeout).json()
+        with timed(url, "GET"):
+            json_value = get_session(url).get(url, timeout=timeout).json()
     except RequestException as e:
         json_value = default_value
     return json_value
@@ -39,7 +201,7 @@ def get_json_safe(url, default_value: Dict, timeout=10) -> Dict:
 def post_safe(url, json=None):
     json = json if json else {}
     try:
-        response = requests.post(url, timeout=10, json=json)
+        response = _post(url, json)
         return response.status_code, response.text
     except RequestException as e:
         logging.info(f'[WASPY.DRIVERS.HTTP_HELPER] failed to post ({json}) to ({url})')
@@ -47,27 +209,137 @@ def post_safe(url, json=None):
 
 
 def post_dictionary(url, data):
-    response = requests.post(url, json=data, timeout=10)
+    response = _post(url, data)
     return response.status_code, response.text
 
 
-def wait_for_request_done(url, request):
-    while True:
-        time.sleep(0.2)
-        response = get_json(url)
-        error_message = response["error"]
-        if error_message == "Success" or error_message == "No error":
-            if response['request_finished'] and response["request_id"] == str(request["request_id"]):
-                break
-        else:
-            raise DriverError(url + ": " + error_message)
+class PendingRequest:
+    """A posted request, the daemon might still be working on it"""
+    url: str
+    request: Dict
+    strategy: PollStrategy
+    finished: bool
+    error: Union[DriverError, None]
+    next_poll: float
+
+    def __init__(self, url, request, strategy: Union[PollStrategy, None] = None):
+        self.url = url
+        self.request = request
+        self.strategy = strategy if strategy else get_poll_strategy(url, request)
+        self.finished = False
+        self.error = None
+        self._start = time.monotonic()
+        self._intervals = self.strategy.intervals()
+        self._polls = 0
+        self.next_poll = self._start + next(self._intervals)
+
+    def poll(self) -> bool:
+        """Requests the status once and returns whether the request has finished. Raises a DriverError when the daemon
+        reports an error or when the deadline has passed"""
+        if self.error:
+            raise self.error
+        if self.finished:
+            return True
+        self._polls += 1
+        try:
+            if is_request_done(self.url, self.request, get_json(self.url)):
+                self._finish(None)
+                return True
+            check_deadline(self.url, self.request, self.strategy, self._start)
+        except DriverError as e:
+            self._finish(e)
+            raise
+        self.next_poll = time.monotonic() + next(self._intervals)
+        return False
+
+    def wait(self):
+        wait_for_requests([self])
+
+    def _finish(self, error: Union[DriverError, None]):
+        self.finished = True
+        self.error = error
+        timed_out = error is not None and is_past_deadline(self.strategy, self._start)
+        record_wait(self.url, request_kind(self.request), self._polls, time.monotonic() - self._start, timed_out)
+
+
+def wait_for_requests(pending_requests: List[PendingRequest]):
+    """Waits until all requests have finished. The status polls of the requests are interleaved, every request keeps
+    its own backoff. Raises a DriverError for all the failed requests together"""
+    errors = [str(pending.error) for pending in pending_requests if pending.error]
+    waiting = [pending for pending in pending_requests if not pending.finished]
+    while waiting:
+        next_poll = min(pending.next_poll for pending in waiting)
+        time.sleep(max(next_poll - time.monotonic(), 0))
+        for pending in [pending for pending in waiting if pending.next_poll <= next_poll]:
+            try:
+                if pending.poll():
+                    waiting.remove(pending)
+            except DriverError as e:
+                errors.append(str(e))
+                waiting.remove(pending)
+    if errors:
+        raise DriverError("; ".join(errors))
+
+
+def wait_for_request_done(url, request, strategy: Union[PollStrategy, None] = None):
+    PendingRequest(url, request, strategy).wait()
 
 
-def post_request(url, request, wait=True):
+def is_past_deadline(strategy: PollStrategy, start: float) -> bool:
+    return strategy.deadline is not None and time.monotonic() - start > strategy.deadline
+
+
+def check_deadline(url, request, strategy: PollStrategy, start: float):
+    if is_past_deadline(strategy, start):
+        raise DriverError(f'{url}: request ({request["request_id"]}) did not finish within {strategy.deadline} seconds')
+
+
+def is_request_done(url, request, response) -> bool:
+    """Checks a status response of a daemon for completion of the request. Raises a DriverError on a daemon error"""
+    error_message = response["error"]
+    if error_message == "Success" or error_message == "No error":
+        return response['request_finished'] and response["request_id"] == str(request["request_id"])
+    raise DriverError(url + ": " + error_message)
+
+
+def post_request(url, request, wait=True) -> PendingRequest:
+    """Without wait, the request is returned as soon as it is posted. It is up to the caller to wait for it"""
     post_dictionary(url, request)
+    pending = PendingRequest(url, request)
     if wait:
-        wait_for_request_done(url, request)
+        pending.wait()
+    return pending
 
 
 def generate_request_id() -> str:
     return datetime.now().strftime("%Y.%m.%d__%H:%M__%S.%f")
+
+
+def _get(url):
+    with timed(url, "GET"):
+        return get_session(url).get(url, timeout=get_timeout(url))
+
+
+def _post(url, json):
+    with timed(url, request_kind(json)):
+        return get_session(url).post(url, json=json, timeout=get_timeout(url))
+
+
+def _get_base_url(url: str) -> str:
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'
+
+
+def _find_longest_prefix(url: str, prefixes) -> Union[str, None]:
+    """A prefix only matches whole path segments, so http://host:2210 does not match http://host:22100"""
+    matches = [prefix for prefix in prefixes if url.startswith(prefix) and
+               (len(url) == len(prefix) or prefix.endswith("/") or url[len(prefix)] in "/?#")]
+    return max(matches, key=len) if matches else None
+
+
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,159 @@
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock, Thread, Event
+from typing import Dict, List, Tuple, Type, Union
+from urllib.parse import urlsplit
+
+import requests
+from pydantic import BaseModel, Field
+
+'''
+Records the http traffic of the drivers, per endpoint (the url without query) and per request kind. The kind of a get
+is "GET", the kind of a post is "POST" followed by the commands in the request, e.g. "POST clear,start".
+
+Calls are recorded with their latency in a fixed set of buckets. Completion polling (wait_for_request_done) is recorded
+separately, with the amount of status requests it took.
+
+Example usage:
+    with timed(url, "GET"):
+        response = session.get(url)
+    record_wait(url, "POST start", polls=3, seconds=0.07, timed_out=False)
+    snapshot = get_metrics_snapshot()
+    start_metrics_log(interval=60)
+ '''
+
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+
+class CallMetrics(BaseModel):
+    url: str
+    kind: str
+    count: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    total_seconds: float = 0
+    max_seconds: float = 0
+    latency_buckets: List[int] = Field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1),
+        description="Amount of calls with a latency up to the matching LATENCY_BUCKETS bound, the last bucket holds "
+                    "the slower calls")
+
+
+class WaitMetrics(BaseModel):
+    url: str
+    kind: str
+    count: int = 0
+    timeouts: int = 0
+    polls: int = Field(0, description="Total amount of status requests")
+    max_polls: int = 0
+    total_seconds: float = 0
+
+
+class MetricsSnapshot(BaseModel):
+    latency_bucket_bounds: List[float] = LATENCY_BUCKETS
+    calls: List[CallMetrics]
+    waits: List[WaitMetrics]
+
+
+_calls: Dict[Tuple[str, str], CallMetrics] = {}
+_waits: Dict[Tuple[str, str], WaitMetrics] = {}
+_lock = Lock()
+_log_stop: Union[Event, None] = None
+
+
+def request_kind(request: Dict) -> str:
+    return "POST " + ",".join(key for key in request if key != "request_id")
+
+
+@contextmanager
+def timed(url: str, kind: str, timeout_errors: Tuple[Type[BaseException], ...] = (requests.Timeout,)):
+    """Records the duration of the enclosed call. Exceptions are counted as errors, or as timeouts when they are one of
+    timeout_errors"""
+    start = time.perf_counter()
+    try:
+        yield
+    except timeout_errors:
+        record_call(url, kind, time.perf_counter() - start, timed_out=True)
+        raise
+    except Exception:
+        record_call(url, kind, time.perf_counter() - start, failed=True)
+        raise
+    record_call(url, kind, time.perf_counter() - start)
+
+
+def record_call(url: str, kind: str, seconds: float, failed=False, timed_out=False):
+    key = (_get_endpoint(url), kind)
+    with _lock:
+        metrics = _calls.get(key)
+        if metrics is None:
+            metrics = _calls[key] = CallMetrics(url=key[0], kind=kind)
+        metrics.count += 1
+        metrics.errors += failed
+        metrics.timeouts += timed_out
+        metrics.total_seconds += seconds
+        metrics.max_seconds = max(metrics.max_seconds, seconds)
+        metrics.latency_buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+
+def record_wait(url: str, kind: str, polls: int, seconds: float, timed_out=False):
+    key = (_get_endpoint(url), kind)
+    with _lock:
+        metrics = _waits.get(key)
+        if metrics is None:
+            metrics = _waits[key] = WaitMetrics(url=key[0], kind=kind)
+        metrics.count += 1
+        metrics.timeouts += timed_out
+        metrics.polls += polls
+        metrics.max_polls = max(metrics.max_polls, polls)
+        metrics.total_seconds += seconds
+
+
+def get_metrics_snapshot() -> MetricsSnapshot:
+    with _lock:
+        return MetricsSnapshot(calls=[metrics.copy(deep=True) for metrics in _calls.values()],
+                               waits=[metrics.copy(deep=True) for metrics in _waits.values()])
+
+
+def reset_metrics():
+    with _lock:
+        _calls.clear()
+        _waits.clear()
+
+
+def log_metrics_summary():
+    snapshot = get_metrics_snapshot()
+    for call in sorted(snapshot.calls, key=lambda metrics: metrics.total_seconds, reverse=True):
+        logging.info(f'[WASPY.DRIVERS.HTTP_METRICS] {call.kind} {call.url}: {call.count} calls, '
+                     f'{call.total_seconds / call.count * 1000:.1f} ms average, {call.max_seconds * 1000:.1f} ms max, '
+                     f'{call.errors} errors, {call.timeouts} timeouts')
+    for wait in sorted(snapshot.waits, key=lambda metrics: metrics.total_seconds, reverse=True):
+        logging.info(f'[WASPY.DRIVERS.HTTP_METRICS] wait for {wait.kind} {wait.url}: {wait.count} waits, '
+                     f'{wait.polls / wait.count:.1f} polls average, {wait.max_polls} polls max, '
+                     f'{wait.total_seconds / wait.count:.3f} s average, {wait.timeouts} timeouts')
+
+
+def start_metrics_log(interval: float):
+    """Logs a summary every interval seconds, until stop_metrics_log is called"""
+    global _log_stop
+    stop_metrics_log()
+    stop = _log_stop = Event()
+
+    def log_periodically():
+        while not stop.wait(interval):
+            log_metrics_summary()
+
+    Thread(target=log_periodically, daemon=True, name="http_metrics_log").start()
+
+
+def stop_metrics_log():
+    global _log_stop
+    if _log_stop is not None:
+        _log_stop.set()
+        _log_stop = None
+
+
+def _get_endpoint(url: str) -> str:
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}{parts.path}'
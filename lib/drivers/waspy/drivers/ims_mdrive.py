@@ -1,14 +1,21 @@
 import time
+from typing import Union
 
-from waspy.drivers.http_helper import generate_request_id, post_request, get_json
+from waspy.drivers.driver_error import DriverError
+from waspy.drivers.http_helper import generate_request_id, post_request, get_json, set_timeout, PollStrategy, \
+    is_past_deadline
+
+MOVE_POLLING = PollStrategy(initial_interval=0.05, max_interval=0.5)
 
 
 class ImsMDrive:
     """A Stepper motor driver"""
     _url: str
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, timeout: Union[float, None] = None):
         self._url = url
+        if timeout is not None:
+            set_timeout(url, timeout)
 
     def move(self, target_position, wait=True):
         if target_position is None:
@@ -25,11 +32,19 @@ class ImsMDrive:
             self.wait_for_move_done()
 
     def wait_for_move_done(self):
-        while True:
-            time.sleep(1)
+        start = time.monotonic()
+        for interval in MOVE_POLLING.intervals():
+            time.sleep(interval)
             response = get_json(self._url)
             if not response["moving_to_target"]:
                 break
+            check_move_deadline(self._url, start)
 
     def get_status(self):
         return get_json(self._url)
+
+
+def check_move_deadline(url, start: float):
+    """The daemon reports no request status for a move, so the deadline of MOVE_POLLING is checked on its own"""
+    if is_past_deadline(MOVE_POLLING, start):
+        raise DriverError(f'{url}: move did not finish within {MOVE_POLLING.deadline} seconds')
@@ -1,25 +1,39 @@
 from time import sleep
-from waspy.drivers.http_helper import generate_request_id, post_request, get_json
+from typing import Union
+
+from waspy.drivers.http_helper import generate_request_id, post_request, get_json, set_timeout, PollStrategy, \
+    register_poll_hints, StatusCache
+
+COMMAND_POLLING = PollStrategy(initial_interval=0.01, max_interval=0.1, deadline=30)
+POLL_HINTS = {request_key: COMMAND_POLLING
+              for request_key in ["clear-start_counting", "start_counting", "pause_counting", "target_charge"]}
 
 
 class MotronaDx350:
     """A pulse/charge counter"""
     _url: str
+    _status: StatusCache
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, timeout: Union[float, None] = None, status_ttl: float = 0.5):
+        """The status is reused for status_ttl seconds by get_status and the derived getters, or until a new request
+        is posted"""
         self._url = url
+        self._status = StatusCache(lambda: get_json(self._url), status_ttl)
+        register_poll_hints(url, POLL_HINTS)
+        if timeout is not None:
+            set_timeout(url, timeout)
 
     def start_count_from_zero(self):
         request = {"request_id": generate_request_id(), "clear-start_counting": True}
-        post_request(self._url, request)
+        self._post_request(request)
 
     def start_count(self):
         request = {"request_id": generate_request_id(), "start_counting": True}
-        post_request(self._url, request)
+        self._post_request(request)
 
     def pause(self):
         request = {"request_id": generate_request_id(), "pause_counting": True}
-        post_request(self._url, request)
+        self._post_request(request)
 
     def wait_for_counting_done(self):
         while True:
@@ -39,7 +53,25 @@ class MotronaDx350:
 
     def set_target_charge(self, target_charge):
         request = {"request_id": generate_request_id(), "target_charge": target_charge}
-        post_request(self._url, request)
+        self._post_request(request)
+
+    def arm(self, target_charge, start=False):
+        """Pauses the counter and sets the target charge in a single request, the two do not depend on each other's
+        order. With start, the counter is cleared and started in a second request, once the target is set"""
+        request = {"request_id": generate_request_id(), "pause_counting": True, "target_charge": target_charge}
+        self._post_request(request)
+        if start:
+            self.start_count_from_zero()
 
     def get_status(self):
-        return get_json(self._url)
+        return self._status.get()
+
+    def invalidate(self):
+        """The next status read goes to the daemon, for callers that need a fresh reading"""
+        self._status.invalidate()
+
+    def _post_request(self, request):
+        try:
+            post_request(self._url, request)
+        finally:
+            self._status.invalidate()
@@ -0,0 +1,29 @@
+import unittest
+
+from waspy.iba.charge_rate import ChargeRateEstimator
+
+
+class TestChargeRateEstimator(unittest.TestCase):
+    def test_time_to_target(self):
+        estimator = ChargeRateEstimator()
+        estimator.add_reading(10, 0)
+        self.assertIsNone(estimator.get_time_to_target(100, 10))
+        estimator.add_reading(12, 20)
+        self.assertEqual(estimator.rate, 10)
+        self.assertEqual(estimator.get_time_to_target(100, 12), 8)
+        self.assertEqual(estimator.get_time_to_target(100, 15), 5)
+        self.assertEqual(estimator.get_time_to_target(100, 30), 0)
+
+    def test_rate_is_smoothed(self):
+        estimator = ChargeRateEstimator(smoothing=0.5)
+        for timestamp, charge in [(0, 0), (1, 10), (2, 40)]:
+            estimator.add_reading(timestamp, charge)
+        self.assertEqual(estimator.rate, 20)
+
+    def test_beam_off_and_reset_counter(self):
+        estimator = ChargeRateEstimator()
+        estimator.add_reading(0, 10)
+        estimator.add_reading(1, 10)
+        self.assertIsNone(estimator.get_time_to_target(100, 1))
+        estimator.add_reading(2, 0)
+        self.assertIsNone(estimator.rate)
@@ -0,0 +1,38 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from waspy.iba.erd_entities import ErdRecipe
+from waspy.iba.erd_recipes import run_erd_recipe
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 100.
+
+    def monotonic(self):
+        return self.time
+
+    def advance(self, seconds):
+        self.time += seconds
+
+    def wait_for_deadline(self, deadline):
+        self.time = max(self.time, deadline)
+
+
+class TestErdRecipe(unittest.TestCase):
+    @patch("waspy.iba.erd_recipes.get_erd_journal")
+    def test_z_steps_follow_deadlines(self, get_erd_journal):
+        clock = FakeClock()
+        erd_setup = MagicMock()
+        erd_setup._cancel = False
+        erd_setup.move.side_effect = lambda position: clock.advance(0.3)
+        erd_setup.wait_for_deadline.side_effect = clock.wait_for_deadline
+        recipe = ErdRecipe(measuring_time_sec=3, sample="sample", name="erd_01", theta=0, z_start=0, z_end=2,
+                           z_increment=1)
+
+        with patch("waspy.iba.erd_recipes.time.monotonic", clock.monotonic):
+            run_erd_recipe(recipe, erd_setup)
+
+        deadlines = [call.args[0] for call in erd_setup.wait_for_deadline.call_args_list]
+        self.assertEqual([round(deadline, 3) for deadline in deadlines], [101.3, 102.3, 103.3])
+        self.assertEqual(get_erd_journal.call_args.args[2], [0.7, 0.7, 0.7])
@@ -0,0 +1,64 @@
+import time
+import unittest
+from threading import Thread
+from unittest.mock import MagicMock
+
+from waspy.drivers.driver_error import DriverError
+from waspy.iba.erd_entities import ErdDriverUrls
+from waspy.iba.erd_setup import ErdSetup
+from waspy.iba.iba_error import IbaError
+
+
+def make_erd_setup() -> ErdSetup:
+    urls = ErdDriverUrls(mdrive_z="z", mdrive_theta="theta", mpa3="mpa3", motrona_z_encoder="z_encoder",
+                         motrona_theta_encoder="theta_encoder")
+    erd_setup = ErdSetup(urls)
+    erd_setup.mdrive_z = MagicMock()
+    erd_setup.mdrive_theta = MagicMock()
+    erd_setup.mpa3 = MagicMock()
+    erd_setup.motrona_z_encoder = MagicMock()
+    erd_setup.motrona_theta_encoder = MagicMock()
+    erd_setup.mpa3.get_status.return_value = {"acquisition_status": {"acquiring": False, "real_time": 12.5}}
+    return erd_setup
+
+
+class TestErdSetupStatus(unittest.TestCase):
+    def test_get_status(self):
+        erd_setup = make_erd_setup()
+        erd_setup.mdrive_z.get_status.return_value = {"motor_position": 1}
+        erd_setup.mpa3.get_histogram.return_value = "1 2\n"
+
+        status = erd_setup.get_status(get_histogram=True)
+
+        self.assertEqual(status.mdrive_z, {"motor_position": 1})
+        self.assertEqual(status.histogram, "1 2\n")
+        self.assertEqual(status.measuring_time_sec, 12.5)
+        self.assertEqual(erd_setup.mpa3.get_status.call_count, 1)
+
+    def test_get_status_reports_failed_daemons(self):
+        erd_setup = make_erd_setup()
+        erd_setup.motrona_theta_encoder.get_status.side_effect = DriverError("connection refused")
+
+        with self.assertRaises(IbaError) as context:
+            erd_setup.get_status()
+        self.assertIn("motrona_theta_encoder", str(context.exception))
+
+
+class TestErdSetupCancel(unittest.TestCase):
+    def test_cancel_interrupts_wait_for(self):
+        erd_setup = make_erd_setup()
+        waiting = Thread(target=erd_setup.wait_for, args=(60,))
+        start = time.monotonic()
+        waiting.start()
+        time.sleep(0.1)
+        erd_setup.cancel()
+        waiting.join()
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_acquisition_done_is_noticed_quickly(self):
+        erd_setup = make_erd_setup()
+        erd_setup.mpa3.acquiring.side_effect = [True, True, False]
+        start = time.monotonic()
+        erd_setup.wait_for_acquisition_done()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(erd_setup.mpa3.acquiring.call_count, 3)
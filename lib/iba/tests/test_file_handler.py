@@ -0,0 +1,117 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from waspy.iba.file_handler import FileHandler
+
+
+class TestFileHandlerWriteBehind(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.local = Path(self._tmp.name) / "local"
+        self.remote = Path(self._tmp.name) / "remote"
+
+    def make_file_handler(self, *args, **kwargs) -> FileHandler:
+        file_handler = FileHandler(*args, **kwargs)
+        self.addCleanup(file_handler.close)
+        return file_handler
+
+    def test_writes_are_done_after_flush(self):
+        file_handler = self.make_file_handler(self.local, self.remote, write_behind=True, max_queued_writes=2)
+        file_handler.set_base_folder("job")
+        for index in range(10):
+            file_handler.write_text_to_disk(f'{index}.txt', str(index))
+        file_handler.write_bytes_to_disk("data.bin", io.BytesIO(b"\x00\x01"))
+
+        self.assertEqual(file_handler.flush(), [])
+        for base in [self.local, self.remote]:
+            self.assertEqual((base / "job" / "9.txt").read_text(), "9")
+            self.assertEqual((base / "job" / "data.bin").read_bytes(), b"\x00\x01")
+
+    def test_queued_writes_keep_their_folder(self):
+        file_handler = self.make_file_handler(self.local, self.remote, write_behind=True)
+        file_handler.set_base_folder("job")
+        file_handler.cd_folder("scan_0")
+        file_handler.write_text_to_disk("yields.txt", "1, 2")
+        file_handler.cd_folder_up()
+        file_handler.write_text_to_disk("job.json", "{}")
+
+        self.assertEqual(file_handler.read_text_from_disk("job.json"), "{}")
+        self.assertTrue((self.local / "job" / "scan_0" / "yields.txt").exists())
+        self.assertTrue((self.remote / "job" / "scan_0" / "yields.txt").exists())
+
+    def test_make_folder_keeps_the_current_folder(self):
+        file_handler = self.make_file_handler(self.local, self.remote, write_behind=True)
+        file_handler.set_base_folder("job")
+        file_handler.make_folder("scan_0")
+        file_handler.write_text_to_disk("scan_0/yields.txt", "1, 2")
+        file_handler.write_text_to_disk("job.json", "{}")
+
+        self.assertEqual(file_handler.flush(), [])
+        for base in [self.local, self.remote]:
+            self.assertEqual((base / "job" / "scan_0" / "yields.txt").read_text(), "1, 2")
+            self.assertEqual((base / "job" / "job.json").read_text(), "{}")
+
+    def test_remote_failures_are_reported(self):
+        file_handler = self.make_file_handler(self.local, self.remote, write_behind=True)
+        file_handler.set_base_folder("job")
+        (self.remote / "job" / "blocked").write_text("not a folder")
+        file_handler.cd_folder("blocked")
+        file_handler.write_text_to_disk("spectrum.txt", "1")
+
+        remote_failures = file_handler.flush()
+
+        self.assertEqual(remote_failures, [str(self.remote / "job" / "blocked" / "spectrum.txt")])
+        self.assertEqual((self.local / "job" / "blocked" / "spectrum.txt").read_text(), "1")
+        self.assertEqual(file_handler.flush(), [])
+
+    def test_local_failures_are_raised(self):
+        file_handler = self.make_file_handler(self.local, write_behind=True)
+        file_handler.write_text_to_disk("missing/spectrum.txt", "1")
+        with self.assertRaises(OSError):
+            file_handler.flush()
+
+    def test_reads_leave_the_errors_to_flush(self):
+        file_handler = self.make_file_handler(self.local, write_behind=True)
+        file_handler.write_text_to_disk("missing/spectrum.txt", "1")
+        file_handler.write_text_to_disk("job.json", "{}")
+
+        self.assertEqual(file_handler.read_text_from_disk("job.json"), "{}")
+        self.assertEqual(file_handler.read_json_from_disk("job.json"), {})
+        with self.assertRaises(OSError):
+            file_handler.flush()
+
+    def test_remote_folder_failure_is_raised_without_write_behind(self):
+        file_handler = self.make_file_handler(self.local, self.remote)
+        file_handler.set_base_folder("job")
+        (self.remote / "job" / "blocked").write_text("not a folder")
+        with self.assertRaises(OSError):
+            file_handler.cd_folder("blocked")
+
+    def test_stream_write(self):
+        for write_behind in [False, True]:
+            file_handler = self.make_file_handler(self.local, self.remote, write_behind=write_behind)
+            file_handler.write_text_stream_to_disk("stream.txt", lambda file: file.writelines(["a\n", "b\n"]))
+            file_handler.flush()
+            self.assertEqual((self.local / "stream.txt").read_text(), "a\nb\n")
+            self.assertEqual((self.remote / "stream.txt").read_text(), "a\nb\n")
+
+    def test_set_base_folder_drops_errors_of_the_previous_job(self):
+        file_handler = self.make_file_handler(self.local, write_behind=True)
+        file_handler.write_text_to_disk("missing/spectrum.txt", "1")
+        file_handler.set_base_folder("next_job")
+        self.assertEqual(file_handler.flush(), [])
+
+    def test_close_stops_the_worker(self):
+        file_handler = FileHandler(self.local, write_behind=True)
+        file_handler.write_text_to_disk("queued.txt", "1")
+        worker = file_handler._worker
+
+        self.assertEqual(file_handler.close(), [])
+
+        self.assertFalse(worker.is_alive())
+        self.assertEqual((self.local / "queued.txt").read_text(), "1")
+        file_handler.write_text_to_disk("after_close.txt", "2")
+        self.assertEqual((self.local / "after_close.txt").read_text(), "2")
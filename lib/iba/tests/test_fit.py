@@ -1,16 +1,30 @@
 from pathlib import Path
 from typing import List
 
+import multiprocessing
+import os
 import numpy as np
+import pickle
+import tempfile
+from unittest.mock import patch
 
 from waspy.iba.file_handler import FileHandler
 from waspy.iba.rbs_entities import AysFitResult
 from waspy.iba.rbs_plot import plot_energy_yields
-from waspy.iba.rbs_yield_angle_fit import fit_and_smooth
+from waspy.iba.rbs_entities import FitAlgorithmType
+from waspy.iba.rbs_yield_angle_fit import fit_and_smooth, find_fit_minimum, lower_order_fit, fit_batch, fit_series
+from waspy.iba import rbs_yield_angle_fit
 
 import unittest
 
 
+def fit_series_crashing_on_empty_yields(angles, yields, *args):
+    """A worker that fits a series without yields exits, like a worker that is killed"""
+    if not yields:
+        os._exit(1)
+    return fit_series(angles, yields, *args)
+
+
 def fit_and_smooth_for_each(angles, yields_set) -> List[float]:
     fit_results = []
     for energy_yields in yields_set:
@@ -67,8 +81,12 @@ class TestStringMethods(unittest.TestCase):
             [3644, 3616, 3422, 3197, 2806, 2345, 2058, 1427, 1331, 1237, 1067, 958, 880, 1001, 1042, 1080, 1316, 1521,
              1594, 1769, 2538]
         ]
-        expected_results = [-0.53, 0.38, 0.73, 0.59, 0.0, -0.15, -0.1, 1.26, 1.1, -0.48, 0.07, 0.11, 0.04, 0.11, 0.1, 0.36]
+        expected_results = [-0.53, 0.38, 0.74, 0.59, 0.0, -0.15, -0.1, 1.26, 1.1, -0.48, 0.11, 0.19, 0.07, 0.17, 0.18,
+                            0.45]
 
+        out = tempfile.TemporaryDirectory()
+        self.addCleanup(out.cleanup)
+        file_handler = FileHandler(Path(out.name), remote_dir=None)
         index = 0
         for expected_result, energy_yields in zip(expected_results, yields):
             fit_func, min_angle = fit_and_smooth(angles, energy_yields)
@@ -78,8 +96,60 @@ class TestStringMethods(unittest.TestCase):
 
             fig = plot_energy_yields("test1", fit_result)
 
-            file_handler = FileHandler(Path("./tests/out"), remote_dir=None)
             file_handler.write_matplotlib_fig_to_disk(f'{index:02d}_plot_{min_angle}.png', fig)
 
             self.assertAlmostEqual(expected_result, min_angle, 2)
             index += 1
+
+    def test_minimum_of_the_fitted_curve(self):
+        angles = list(np.around(np.arange(-2, 2.1, 0.2), 2))
+        energy_yields = [float(lower_order_fit(angle, 1000, 800, 0.4321, 0.3, 5, -2)) for angle in angles]
+
+        fit_func, min_angle = fit_and_smooth(angles, energy_yields)
+
+        expected = find_fit_minimum(lambda x: lower_order_fit(x, 1000, 800, 0.4321, 0.3, 5, -2), -2, 2, 0.0001)
+        self.assertEqual(min_angle, round(expected, 2))
+        self.assertEqual(fit_and_smooth(angles, energy_yields, resolution=0.001)[1], round(expected, 3))
+        self.assertAlmostEqual(pickle.loads(pickle.dumps(fit_func))(0.5), fit_func(0.5))
+
+    def test_find_fit_minimum_on_a_wide_range(self):
+        self.assertEqual(find_fit_minimum(lambda x: (x - 12.3456) ** 2, -90, 90, 0.001), 12.346)
+        self.assertEqual(find_fit_minimum(lambda x: x, -1, 1, 0.01), -1)
+
+    def test_find_fit_minimum_with_a_coarse_grid(self):
+        calls = []
+
+        def fit_func(x):
+            calls.append(np.size(x))
+            return (x - 12.3456) ** 2
+
+        self.assertAlmostEqual(find_fit_minimum(fit_func, -90, 90, 0.001, max_grid_points=100), 12.3456, 2)
+        self.assertEqual(calls[0], 101)
+
+    def test_fit_batch(self):
+        angles = list(np.around(np.arange(-2, 2.1, 0.2), 2))
+        series = [(angles, [round(lower_order_fit(angle, 1000, 800, centre, 0.3, 5, -2)) for angle in angles])
+                  for centre in [-1, -0.5, 0, 0.5, 1]]
+        series.insert(2, (angles, [1, 2, 3]))
+
+        results = fit_batch(series, FitAlgorithmType.LOWER_FIT, max_workers=2)
+
+        self.assertEqual([result.success for result in results], [True, True, False, True, True, True])
+        for result, (angles, energy_yields) in zip(results, series):
+            self.assertEqual(result.minimum, fit_series(angles, energy_yields).minimum)
+            self.assertEqual(result.discrete_yields, energy_yields)
+        self.assertAlmostEqual(results[1].fit_func(angles[7]), series[1][1][7], delta=2)
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "the workers must inherit the patched fit")
+    @patch.object(rbs_yield_angle_fit, "FIT_START_METHOD", "fork")
+    def test_fit_batch_with_a_crashing_worker(self):
+        angles = list(np.around(np.arange(-2, 2.1, 0.2), 2))
+        series = [(angles, [round(lower_order_fit(angle, 1000, 800, centre, 0.3, 5, -2)) for angle in angles])
+                  for centre in np.linspace(-1, 1, 11)]
+        series.insert(4, ([], []))
+
+        with patch.object(rbs_yield_angle_fit, "fit_series", fit_series_crashing_on_empty_yields):
+            results = fit_batch(series, FitAlgorithmType.LOWER_FIT, max_workers=2)
+
+        self.assertEqual([result.success for result in results], [index != 4 for index in range(12)])
+        self.assertEqual([result.discrete_yields for result in results], [yields for _, yields in series])
@@ -0,0 +1,57 @@
+import json
+import pickle
+import unittest
+from datetime import datetime
+
+import numpy as np
+from pydantic import ValidationError
+
+from waspy.iba.histogram import Histogram
+from waspy.iba.rbs_entities import RbsData, get_rbs_journal, ChannelingMapJournal, Window
+from waspy.iba.rbs_recipes import get_sum
+
+
+def make_rbs_data(histograms) -> RbsData:
+    return RbsData(aml_x_y={"motor_1_position": 1, "motor_2_position": 2},
+                   aml_phi_zeta={"motor_1_position": 3, "motor_2_position": 4},
+                   aml_det_theta={"motor_1_position": 5, "motor_2_position": 6}, caen={}, motrona={},
+                   histograms=histograms, measuring_time_sec=1, accumulated_charge=2)
+
+
+class TestHistogram(unittest.TestCase):
+    def test_models_validate_into_histograms(self):
+        rbs_data = make_rbs_data({"d01": [1, 2, 3], "d02": np.array([4, 5], dtype=np.uint32)})
+
+        self.assertIsInstance(rbs_data.histograms["d01"], Histogram)
+        self.assertEqual(rbs_data.histograms["d01"].counts.dtype, np.int32)
+        self.assertEqual(rbs_data.histograms, {"d01": [1, 2, 3], "d02": [4, 5]})
+
+    def test_journal_shares_the_histograms(self):
+        rbs_data = make_rbs_data({"d01": [1, 2, 3]})
+        journal = get_rbs_journal(rbs_data, datetime.now())
+        self.assertIs(journal.histograms["d01"], rbs_data.histograms["d01"])
+        self.assertEqual((journal.x, journal.theta), (1., 6.))
+        self.assertIsInstance(journal.x, float)
+
+    def test_invalid_counts(self):
+        with self.assertRaises(ValidationError):
+            make_rbs_data({"d01": [1.5, 2]})
+        with self.assertRaises(ValidationError):
+            make_rbs_data({"d01": [[1], [2]]})
+
+    def test_serialization(self):
+        rbs_data = make_rbs_data({"d01": [1, 2, 3]})
+        journal = get_rbs_journal(rbs_data, datetime.now())
+        channeling_map_journal = ChannelingMapJournal(start_time=journal.start_time, end_time=journal.end_time,
+                                                      rbs_journals=[journal], cms_yields=[])
+
+        self.assertEqual(json.loads(rbs_data.json())["histograms"], {"d01": [1, 2, 3]})
+        self.assertEqual(json.loads(channeling_map_journal.json())["rbs_journals"][0]["histograms"],
+                         {"d01": [1, 2, 3]})
+        self.assertEqual(pickle.loads(pickle.dumps(rbs_data.histograms["d01"])), [1, 2, 3])
+
+    def test_large_counts_and_sum(self):
+        histogram = Histogram([2 ** 31, 2 ** 31])
+        self.assertEqual(histogram.counts.dtype, np.int64)
+        self.assertEqual(get_sum(histogram, Window(start=0, end=2)), 2 ** 32)
+        self.assertEqual(get_sum([1, 2, 3, 4], Window(start=1, end=3)), 5)
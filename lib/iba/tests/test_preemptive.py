@@ -1,7 +1,7 @@
 import unittest
 import time
 from threading import Thread
-from waspy.iba.preempt import preemptive
+from waspy.iba.preempt import preemptive, Cancellation, wait_until
 
 
 class SlowCall(object):
@@ -28,3 +28,47 @@ class TestAsyncCancel(unittest.TestCase):
         t1.join()
 
 
+class WaitingCall(object):
+    _cancel: Cancellation
+
+    def __init__(self):
+        self._cancel = Cancellation()
+        self.polls = 0
+        self.done = False
+
+    @preemptive
+    def wait(self):
+        yield from wait_until(self._cancel, self._is_done, [10] * 10)
+        self.done = True
+
+    def _is_done(self):
+        self.polls += 1
+        return False
+
+
+class TestCancellation(unittest.TestCase):
+    def test_cancel_wakes_up_wait(self):
+        waiting_call = WaitingCall()
+        t1 = Thread(target=waiting_call.wait)
+        start = time.monotonic()
+        t1.start()
+        time.sleep(0.1)
+        waiting_call._cancel.set()
+        t1.join()
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(waiting_call.polls, 1)
+        self.assertFalse(waiting_call.done)
+
+    def test_wait_until_condition(self):
+        cancel = Cancellation()
+        conditions = iter([False, False, True])
+        self.assertEqual(len(list(wait_until(cancel, lambda: next(conditions), [0.01] * 10))), 2)
+
+    def test_cancellation_is_a_flag(self):
+        cancel = Cancellation()
+        self.assertFalse(cancel)
+        cancel.set()
+        self.assertTrue(cancel)
+        self.assertTrue(cancel.wait(10))
+        cancel.clear()
+        self.assertFalse(cancel.wait(0))
@@ -1,9 +1,20 @@
+import io
+import tempfile
 import unittest
-from unittest.mock import MagicMock
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock, patch
 
+import numpy as np
+from matplotlib import pyplot as plt
+
+from waspy.iba.file_handler import FileHandler
+from waspy.iba.histogram import Histogram
 from waspy.iba.rbs_entities import PositionCoordinates, Window, RbsRandom, RbsData, CoordinateRange, RbsChannelingMap, \
-    RecipeType
-from waspy.iba.rbs_recipes import run_random, run_channeling_map
+    RecipeType, get_rbs_journal, RbsChanneling, FitAlgorithmType, AysJournal
+from waspy.iba.rbs_recipes import run_random, run_channeling_map, format_caen_histogram, write_caen_histogram, \
+    save_rbs_journal_with_file_stem, _serialize_histogram_header, save_ays_journal, run_ays
+from waspy.iba.rbs_yield_angle_fit import fit_series
 from waspy.iba.rbs_setup import RbsSetup
 
 
@@ -61,3 +72,132 @@ class TestDbTables(unittest.TestCase):
         self.assertEqual(self.rbs_setup.acquire_data.call_count, 441)  # 21 rows, 21 columns = 441
         self.assertEqual(len(journal.cms_yields), 441)  # 21 rows, 21 columns = 441
 
+    @patch("waspy.iba.rbs_recipes.save_channeling_map_journal")
+    def test_run_channeling_map_pipelined(self, save_channeling_map_journal):
+        recipe = RbsChannelingMap(
+            type=RecipeType.CHANNELING_MAP, sample="sample_001", name="recipe_001", charge_total=2000,
+            zeta_coordinate_range=CoordinateRange(start=-1, end=1, increment=1, name="zeta"),
+            theta_coordinate_range=CoordinateRange(start=-1, end=1, increment=1, name="theta"),
+            yield_integration_window=Window(start=0, end=2), optimize_detector_identifier="d01",
+        )
+        self.rbs_setup.acquire_data.return_value = self.rbs_setup.get_status.return_value
+
+        journal = run_channeling_map(recipe, self.rbs_setup, MagicMock(), "", pipelined=True)
+
+        self.assertEqual(len(journal.rbs_journals), 9)
+        self.assertEqual([cms_yield.energy_yield for cms_yield in journal.cms_yields], [3] * 9)
+        rbs_indices = [call.args[5] for call in save_channeling_map_journal.call_args_list]
+        self.assertEqual(rbs_indices, [0, 1, 2, 4, 5, 6, 8, 9, 10])
+
+    @patch("waspy.iba.rbs_recipes.save_channeling_map_journal")
+    @patch("waspy.iba.rbs_recipes.SpectrumArchiveWriter")
+    def test_run_channeling_map_archive_without_text_export(self, spectrum_archive_writer, save_channeling_map_journal):
+        recipe = RbsChannelingMap(
+            type=RecipeType.CHANNELING_MAP, sample="sample_001", name="recipe_001", charge_total=2000,
+            zeta_coordinate_range=CoordinateRange(start=-1, end=1, increment=1, name="zeta"),
+            theta_coordinate_range=CoordinateRange(start=0, end=0, increment=0, name="theta"),
+            yield_integration_window=Window(start=0, end=2), optimize_detector_identifier="d01",
+            spectrum_archive=True, text_export=False
+        )
+        self.rbs_setup.acquire_data.return_value = self.rbs_setup.get_status.return_value
+        file_handler = MagicMock()
+
+        run_channeling_map(recipe, self.rbs_setup, file_handler, "", pipelined=True)
+
+        spectrum_archive_writer.assert_called_once_with(file_handler, "recipe_001")
+        archive = spectrum_archive_writer.return_value
+        self.assertEqual([call.args[1] for call in archive.append.call_args_list], [0, 2, 4])
+        archive.close.assert_called_once()
+        save_channeling_map_journal.assert_not_called()
+
+    def test_save_ays_journal_keeps_the_current_folder(self):
+        recipe = RbsChanneling(
+            type=RecipeType.CHANNELING, sample="sample_001", name="recipe_001", yield_charge_total=5000,
+            yield_coordinate_ranges=[CoordinateRange(start=-1, end=1, increment=1, name="zeta")],
+            yield_integration_window=Window(start=0, end=2), yield_optimize_detector_identifier="d01",
+            compare_charge_total=60000,
+            random_coordinate_range=CoordinateRange(start=0, end=2, increment=1, name="phi"),
+            fit_algorithm_type=FitAlgorithmType.MINIMUM_YIELD)
+        rbs_journal = get_rbs_journal(self.rbs_setup.get_status.return_value, datetime.now())
+        ays_journal = AysJournal(start_time=datetime.now(), end_time=datetime.now(), rbs_journals=[rbs_journal] * 3,
+                                 fit=fit_series([-1., 0., 1.], [5, 3, 4], FitAlgorithmType.MINIMUM_YIELD))
+        out = tempfile.TemporaryDirectory()
+        self.addCleanup(out.cleanup)
+        file_handler = FileHandler(Path(out.name), write_behind=True)
+        self.addCleanup(file_handler.close)
+        file_handler.set_base_folder("job")
+        figures = plt.get_fignums()
+
+        save_ays_journal(file_handler, recipe, ays_journal, 0, "", FitAlgorithmType.MINIMUM_YIELD)
+        file_handler.write_text_to_disk("recipe.txt", "")
+        file_handler.flush()
+
+        folder = Path(out.name) / "job" / "recipe_001_0_zeta"
+        self.assertTrue((folder / "00_recipe_001_0_zeta_-1.0_d01.txt").exists())
+        self.assertTrue((folder / "_recipe_001_0_zeta.png").exists())
+        self.assertEqual((folder / "_recipe_001_0_zeta_yields.txt").read_text(), "-1.0, 5\n0.0, 3\n1.0, 4\n")
+        self.assertTrue((Path(out.name) / "job" / "recipe.txt").exists())
+        self.assertEqual(plt.get_fignums(), figures)
+
+    @patch("waspy.iba.rbs_recipes.save_ays_journal")
+    @patch("waspy.iba.rbs_recipes.find_minimum")
+    def test_run_ays_fits_with_the_recipe_grid(self, find_minimum, save_ays_journal):
+        recipe = RbsChanneling(
+            type=RecipeType.CHANNELING, sample="sample_001", name="recipe_001", yield_charge_total=5000,
+            yield_coordinate_ranges=[CoordinateRange(start=-1, end=1, increment=1, name="zeta")],
+            yield_integration_window=Window(start=0, end=2), yield_optimize_detector_identifier="d01",
+            compare_charge_total=60000,
+            random_coordinate_range=CoordinateRange(start=0, end=2, increment=1, name="phi"),
+            fit_algorithm_type=FitAlgorithmType.LOWER_FIT, fit_resolution=0.001, fit_max_grid_points=500)
+        self.rbs_setup.acquire_data.return_value = self.rbs_setup.get_status.return_value
+        find_minimum.return_value = fit_series([-1., 0., 1.], [5, 3, 4], FitAlgorithmType.MINIMUM_YIELD)
+
+        run_ays(recipe, self.rbs_setup, None, MagicMock(), "")
+
+        find_minimum.assert_called_once_with([-1.0, 0.0, 1.0], [3, 3, 3], FitAlgorithmType.LOWER_FIT, 0.001, 500)
+
+
+def legacy_format_caen_histogram(data):
+    data_string = ""
+    for index, energy_level in enumerate(data):
+        data_string += f'{index}, {energy_level}\n'
+    return data_string
+
+
+class TestHistogramText(unittest.TestCase):
+    def test_format_is_unchanged(self):
+        counts = np.random.default_rng(1).integers(0, 2 ** 31, 10000).tolist()
+        for data in [[], [0], [5, 3, 2 ** 40], counts, Histogram(counts)]:
+            self.assertEqual(format_caen_histogram(data), legacy_format_caen_histogram(list(data)))
+
+    def test_write_streams_in_chunks(self):
+        file = MagicMock(spec=io.StringIO)
+        write_caen_histogram(file, list(range(5000)))
+        self.assertEqual(file.write.call_count, 2)
+
+    def test_saved_file_is_unchanged(self):
+        recipe = RbsRandom(type=RecipeType.RANDOM, sample="HS12_02", name="RBS22_082_01A", charge_total=45000,
+                           start_position=PositionCoordinates(x=10, y=22, phi=0),
+                           coordinate_range=CoordinateRange(name="phi", start=0, end=30, increment=2))
+        rbs_data = RbsData(
+            aml_x_y={"motor_1_position": 10, "motor_2_position": 20},
+            aml_phi_zeta={"motor_1_position": 30, "motor_2_position": 40},
+            aml_det_theta={"motor_1_position": 50, "motor_2_position": 60},
+            caen={}, motrona={}, histograms={"d01": [1, 2, 3], "d02": [3, 4, 5]},
+            measuring_time_sec=12000, accumulated_charge=45000)
+        journal = get_rbs_journal(rbs_data, datetime.now())
+        file_handler = MagicMock()
+        files = {}
+        file_handler.write_text_stream_to_disk.side_effect = \
+            lambda filename, write: write(files.setdefault(filename, io.StringIO()))
+
+        with patch("waspy.iba.rbs_recipes.save_rbs_graph_to_disk"), \
+                patch("waspy.iba.rbs_recipes.datetime") as fixed_datetime:
+            fixed_datetime.utcnow.return_value = datetime(2024, 1, 2, 3, 4, 5)
+            save_rbs_journal_with_file_stem(file_handler, "stem", recipe, journal, " * Extra := 1\n")
+            expected = {f'stem_{detector}.txt': _serialize_histogram_header(journal, detector, recipe,
+                                                                          " * Extra := 1\n") + "\n" +
+                        legacy_format_caen_histogram(histogram) for detector, histogram in journal.histograms.items()}
+
+        self.assertEqual({filename: file.getvalue() for filename, file in files.items()}, expected)
+
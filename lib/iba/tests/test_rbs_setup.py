@@ -0,0 +1,242 @@
+import unittest
+from threading import Barrier
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from pydantic import ValidationError
+
+from waspy.drivers.driver_error import DriverError
+from waspy.drivers.http_helper import PollStrategy
+from waspy.iba.histogram import Histogram
+from waspy.iba.iba_error import IbaError
+from waspy.iba.rbs_entities import RbsDriverUrls, PositionCoordinates, Detector
+from waspy.iba.rbs_setup import RbsSetup
+
+
+def make_rbs_setup(parallel_move=False) -> RbsSetup:
+    urls = RbsDriverUrls(aml_x_y="x_y", aml_phi_zeta="phi_zeta", aml_det_theta="det_theta", caen="caen",
+                         motrona_charge="motrona")
+    rbs_setup = RbsSetup(urls, parallel_move)
+    rbs_setup.motor_x_y = MagicMock()
+    rbs_setup.motor_phi_zeta = MagicMock()
+    rbs_setup.motor_det_theta = MagicMock()
+    rbs_setup.charge_counter = MagicMock()
+    rbs_setup.data_acquisition = MagicMock()
+    return rbs_setup
+
+
+@patch("waspy.iba.rbs_setup.time.sleep", MagicMock())
+class TestRbsSetupMove(unittest.TestCase):
+    def test_move_sequential(self):
+        rbs_setup = make_rbs_setup()
+        rbs_setup.move(PositionCoordinates(x=1, y=2, zeta=3))
+        rbs_setup.motor_x_y.move_both.assert_called_once_with([1, 2])
+        rbs_setup.motor_phi_zeta.move_both.assert_called_once_with([None, 3])
+        rbs_setup.motor_det_theta.move_both.assert_called_once_with([None, None])
+
+    def test_move_parallel(self):
+        rbs_setup = make_rbs_setup(parallel_move=True)
+        rbs_setup.motor_det_theta.start_move.return_value = None
+        rbs_setup.motor_x_y.is_finished.side_effect = [False, False, True]
+        rbs_setup.motor_phi_zeta.is_finished.side_effect = [False, True]
+
+        rbs_setup.move(PositionCoordinates(x=1, y=2, zeta=3))
+
+        rbs_setup.motor_x_y.start_move.assert_called_once_with([1, 2])
+        rbs_setup.motor_phi_zeta.start_move.assert_called_once_with([None, 3])
+        rbs_setup.motor_x_y.move_both.assert_not_called()
+        self.assertEqual(rbs_setup.motor_x_y.is_finished.call_count, 3)
+        self.assertEqual(rbs_setup.motor_phi_zeta.is_finished.call_count, 2)
+        rbs_setup.motor_det_theta.is_finished.assert_not_called()
+
+    def test_move_parallel_reports_failed_axes(self):
+        rbs_setup = make_rbs_setup(parallel_move=True)
+        rbs_setup.motor_x_y.is_finished.return_value = True
+        rbs_setup.motor_phi_zeta.is_finished.side_effect = DriverError("phi_zeta: Motor stalled")
+        rbs_setup.motor_det_theta.is_finished.return_value = True
+
+        with self.assertRaises(IbaError) as context:
+            rbs_setup.move(PositionCoordinates(x=1, phi=5))
+        self.assertIn("aml_phi_zeta", str(context.exception))
+        self.assertNotIn("aml_x_y", str(context.exception))
+
+    def test_move_parallel_cancelled(self):
+        rbs_setup = make_rbs_setup(parallel_move=True)
+        rbs_setup.motor_x_y.is_finished.side_effect = lambda request: rbs_setup.cancel()
+
+        rbs_setup.move(PositionCoordinates(x=1))
+        self.assertEqual(rbs_setup.motor_x_y.is_finished.call_count, 1)
+
+    @patch("waspy.iba.rbs_setup.MOVE_POLLING", PollStrategy(initial_interval=0.001, max_interval=0.001, deadline=0.01))
+    def test_move_parallel_deadline(self):
+        rbs_setup = make_rbs_setup(parallel_move=True)
+        rbs_setup.motor_x_y.is_finished.return_value = False
+        rbs_setup.motor_phi_zeta.is_finished.return_value = True
+        rbs_setup.motor_det_theta.is_finished.return_value = True
+
+        with self.assertRaises(IbaError) as context:
+            rbs_setup.move(PositionCoordinates(x=1))
+        self.assertIn("aml_x_y {'x': 1.0, 'y': None}: did not arrive within 0.01 seconds", str(context.exception))
+
+
+class TestRbsSetupAcquisition(unittest.TestCase):
+    def test_acquire_data_arms_counter_once(self):
+        rbs_setup = make_rbs_setup()
+        rbs_setup.get_status = MagicMock()
+        rbs_setup.charge_counter.get_status.return_value = {"status": "Done", "charge(nC)": "10",
+                                                            "target_charge(nC)": "10"}
+        rbs_setup.charge_counter.get_charge.return_value = 10
+        rbs_setup.charge_counter.get_target_charge.return_value = 10
+
+        rbs_setup.acquire_data(10)
+
+        rbs_setup.data_acquisition.start.assert_called_once()
+        rbs_setup.charge_counter.arm.assert_called_once_with(10, start=True)
+        rbs_setup.charge_counter.pause.assert_not_called()
+        rbs_setup.charge_counter.set_target_charge.assert_not_called()
+        rbs_setup.charge_counter.start_count_from_zero.assert_not_called()
+        rbs_setup.data_acquisition.stop.assert_called_once()
+        rbs_setup.get_status.assert_called_once_with(True)
+        self.assertEqual(rbs_setup.get_total_clipped_charge(), 10)
+
+    def test_count_sleeps_until_predicted_completion(self):
+        rbs_setup = make_rbs_setup()
+        readings = iter([(0., 0.), (0.05, 5.), (9.005, 900.5), (9.8, 980.), (10., 1000.)])
+        reading = next(readings)
+        waits = []
+
+        def wait(timeout):
+            nonlocal reading
+            waits.append(timeout)
+            reading = next(readings)
+            return False
+        rbs_setup._cancel.wait = wait
+        rbs_setup.charge_counter.get_status.side_effect = lambda: {
+            "status": "Counting" if reading[1] < 1000 else "Done", "charge(nC)": str(reading[1]),
+            "target_charge(nC)": "1000"}
+        rbs_setup.charge_counter.get_charge.return_value = 1000
+        rbs_setup.charge_counter.get_target_charge.return_value = 1000
+
+        with patch("waspy.iba.rbs_setup.time.monotonic", side_effect=lambda: reading[0]):
+            rbs_setup.count_to_target(1000)
+
+        for actual, expected in zip(waits, [0.05, 8.955, 0.795, 0.05]):
+            self.assertAlmostEqual(actual, expected)
+        self.assertEqual(len(waits), 4)
+        self.assertIsNone(rbs_setup.get_estimated_time_to_completion())
+        self.assertEqual(rbs_setup.charge_counter.invalidate.call_count, rbs_setup.charge_counter.get_status.call_count)
+        self.assertEqual(rbs_setup.charge_counter.get_status.call_count, 5)
+
+
+class TestRbsSetupPipelining(unittest.TestCase):
+    @patch("waspy.iba.rbs_setup.wait_for_requests")
+    def test_load_waits_for_all_motors_at_once(self, wait_for_requests):
+        rbs_setup = make_rbs_setup()
+        rbs_setup.load()
+        for motor in [rbs_setup.motor_x_y, rbs_setup.motor_phi_zeta, rbs_setup.motor_det_theta]:
+            motor.load.assert_called_once_with(False)
+        wait_for_requests.assert_called_once_with([rbs_setup.motor_x_y.load.return_value,
+                                                   rbs_setup.motor_phi_zeta.load.return_value,
+                                                   rbs_setup.motor_det_theta.load.return_value])
+
+    def test_prepare_acquisition_does_not_wait_for_the_clear(self):
+        rbs_setup = make_rbs_setup()
+        rbs_setup.prepare_acquisition()
+        rbs_setup.data_acquisition.stop.assert_called_once_with()
+        rbs_setup.data_acquisition.clear.assert_called_once_with(wait=False)
+        rbs_setup.data_acquisition.clear.return_value.wait.assert_not_called()
+
+    def test_acquire_data_waits_for_the_clear_before_starting(self):
+        rbs_setup = make_rbs_setup()
+        rbs_setup.count_to_target = MagicMock()
+        rbs_setup.get_status = MagicMock()
+        calls = MagicMock()
+        calls.attach_mock(rbs_setup.data_acquisition.clear.return_value.wait, "wait_for_clear")
+        calls.attach_mock(rbs_setup.data_acquisition.start, "start")
+
+        rbs_setup.prepare_acquisition()
+        rbs_setup.acquire_data(10)
+        rbs_setup.acquire_data(10)
+
+        self.assertEqual([call[0] for call in calls.mock_calls], ["wait_for_clear", "start", "start"])
+
+
+class TestRbsSetupHistograms(unittest.TestCase):
+    def test_get_histograms_fetches_each_channel_once(self):
+        rbs_setup = make_rbs_setup()
+        rbs_setup.configure_detectors([
+            Detector(identifier="d01", board="33", channel=0, bins_min=0, bins_max=4, bins_width=2),
+            Detector(identifier="d01_full", board="33", channel=0, bins_min=0, bins_max=4, bins_width=4),
+            Detector(identifier="d02", board="33", channel=1, bins_min=2, bins_max=4, bins_width=2),
+        ])
+        raw_histograms = {("33", 0): np.array([1, 2, 3, 4]), ("33", 1): np.array([5, 6, 7, 8])}
+        rbs_setup.data_acquisition.get_raw_histogram_array.side_effect = \
+            lambda board, channel: raw_histograms[(board, channel)]
+
+        histograms = rbs_setup.get_histograms()
+
+        self.assertEqual(histograms, {"d01": [3, 7], "d01_full": [1, 2, 3, 4], "d02": [7, 8]})
+        self.assertEqual(rbs_setup.data_acquisition.get_raw_histogram_array.call_count, 2)
+
+    def test_get_histograms_reports_failed_channels(self):
+        rbs_setup = make_rbs_setup()
+        rbs_setup.configure_detectors([
+            Detector(identifier="d01", board="33", channel=0, bins_min=0, bins_max=4, bins_width=2),
+            Detector(identifier="d02", board="33", channel=1, bins_min=0, bins_max=4, bins_width=2),
+        ])
+        rbs_setup.data_acquisition.get_raw_histogram_array.side_effect = \
+            lambda board, channel: np.zeros(4) if channel == 0 else _raise(DriverError("no such channel"))
+
+        with self.assertRaises(IbaError) as context:
+            rbs_setup.get_histograms()
+        self.assertIn("('33', 1)", str(context.exception))
+
+
+class TestRbsSetupStatus(unittest.TestCase):
+    def test_get_status_queries_daemons_concurrently(self):
+        rbs_setup = make_rbs_setup()
+        rbs_setup.configure_detectors([
+            Detector(identifier="d01", board="33", channel=0, bins_min=0, bins_max=4, bins_width=2)])
+        barrier = Barrier(5, timeout=5)
+        for index, daemon in enumerate([rbs_setup.motor_x_y, rbs_setup.motor_phi_zeta, rbs_setup.motor_det_theta,
+                                        rbs_setup.charge_counter, rbs_setup.data_acquisition]):
+            daemon.get_status.side_effect = lambda index=index: {"index": index, "waited": barrier.wait() >= 0}
+        rbs_setup.data_acquisition.get_raw_histogram_array.return_value = np.array([1, 2, 3, 4])
+
+        status = rbs_setup.get_status(get_histograms=True)
+
+        self.assertEqual([status.aml_x_y["index"], status.aml_phi_zeta["index"], status.aml_det_theta["index"],
+                          status.motrona["index"], status.caen["index"]], [0, 1, 2, 3, 4])
+        self.assertEqual(status.histograms, {"d01": [3, 7]})
+
+    def test_get_status_validates_the_daemon_statuses(self):
+        rbs_setup = make_rbs_setup()
+        rbs_setup.configure_detectors([
+            Detector(identifier="d01", board="33", channel=0, bins_min=0, bins_max=4, bins_width=2)])
+        for daemon in [rbs_setup.motor_x_y, rbs_setup.motor_phi_zeta, rbs_setup.motor_det_theta,
+                       rbs_setup.charge_counter, rbs_setup.data_acquisition]:
+            daemon.get_status.return_value = {"error": "Success"}
+        rbs_setup.data_acquisition.get_raw_histogram_array.return_value = np.array([1, 2, 3, 4])
+
+        status = rbs_setup.get_status(get_histograms=True)
+        self.assertIsInstance(status.histograms["d01"], Histogram)
+        self.assertEqual(status.histograms, {"d01": [3, 7]})
+
+        rbs_setup.charge_counter.get_status.return_value = "Internal Server Error"
+        with self.assertRaises(ValidationError):
+            rbs_setup.get_status()
+
+    def test_get_status_reports_failed_daemons(self):
+        rbs_setup = make_rbs_setup()
+        rbs_setup.motor_phi_zeta.get_status.side_effect = DriverError("connection refused")
+        rbs_setup.charge_counter.get_status.side_effect = DriverError("connection refused")
+
+        with self.assertRaises(IbaError) as context:
+            rbs_setup.get_status()
+        self.assertIn("aml_phi_zeta", str(context.exception))
+        self.assertIn("motrona", str(context.exception))
+        self.assertNotIn("aml_x_y", str(context.exception))
+
+
+def _raise(error):
+    raise error
@@ -0,0 +1,68 @@
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from waspy.iba.file_handler import FileHandler
+from waspy.iba.iba_error import IbaError
+from waspy.iba.rbs_entities import RbsJournal
+from waspy.iba.spectrum_archive import SpectrumArchiveWriter, read_spectrum_archive
+
+
+def make_journal(step: int) -> RbsJournal:
+    return RbsJournal(x=1, y=2, phi=3, zeta=step * 0.5, det=5, theta=-step, accumulated_charge=2000 + step,
+                      measuring_time_sec=10, start_time=datetime(2023, 1, 1, 12, 0, step),
+                      end_time=datetime(2023, 1, 1, 12, 0, step + 1),
+                      histograms={"d01": [step, 2 ** 40, 3], "d02": [4, 5, 6, step, 8]})
+
+
+class TestSpectrumArchive(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.local = Path(self._tmp.name) / "local"
+        self.remote = Path(self._tmp.name) / "remote"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_round_trip(self):
+        file_handler = FileHandler(self.local, self.remote, write_behind=True)
+        self.addCleanup(file_handler.close)
+        file_handler.set_base_folder("job")
+        archive = SpectrumArchiveWriter(file_handler, "map", chunk_steps=2)
+        for step in range(5):
+            archive.append(make_journal(step), step * 2)
+        archive.close()
+        self.assertEqual(file_handler.flush(), [])
+
+        for base in [self.local, self.remote]:
+            spectra = read_spectrum_archive(base / "job" / "map.spectra.json")
+            self.assertEqual(len(spectra), 5)
+            self.assertEqual(spectra.detectors, ["d01", "d02"])
+            self.assertEqual(spectra.get_spectra("d01").tolist()[4], [4, 2 ** 40, 3])
+            self.assertEqual(spectra.get_spectra("d02")[:, 3].tolist(), [0, 1, 2, 3, 4])
+            self.assertEqual(spectra.steps["index"].tolist(), [0, 2, 4, 6, 8])
+            self.assertEqual(spectra.steps["zeta"].tolist(), [0, 0.5, 1, 1.5, 2])
+            self.assertEqual(spectra.steps["accumulated_charge"][1], 2001)
+            self.assertEqual(spectra.steps["end_time"][0] - spectra.steps["start_time"][0], 1)
+            self.assertIsInstance(spectra.spectra, np.memmap)
+
+    def test_interrupted_archive_is_readable_up_to_the_last_chunk(self):
+        file_handler = FileHandler(self.local)
+        archive = SpectrumArchiveWriter(file_handler, "map", chunk_steps=2)
+        for step in range(3):
+            archive.append(make_journal(step), step)
+
+        spectra = read_spectrum_archive(self.local / "map.spectra.json")
+
+        self.assertEqual(spectra.steps["index"].tolist(), [0, 1])
+
+    def test_detectors_must_not_change(self):
+        archive = SpectrumArchiveWriter(FileHandler(self.local), "map")
+        archive.append(make_journal(0), 0)
+        journal = make_journal(1)
+        journal.histograms.pop("d02")
+
+        self.assertRaises(IbaError, archive.append, journal, 1)
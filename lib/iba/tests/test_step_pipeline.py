@@ -0,0 +1,47 @@
+import threading
+import time
+import unittest
+
+from waspy.iba.step_pipeline import StepPipeline
+
+
+class TestStepPipeline(unittest.TestCase):
+    def test_steps_run_in_order_on_a_worker(self):
+        saved = []
+
+        def save(step):
+            time.sleep(0.01)
+            saved.append((step, threading.current_thread().name))
+            return step * 2
+
+        with StepPipeline() as pipeline:
+            results = [pipeline.submit(save, step) for step in range(5)]
+
+        self.assertEqual([step for step, _ in saved], [0, 1, 2, 3, 4])
+        self.assertTrue(all(name.startswith("step_pipeline") for _, name in saved))
+        self.assertEqual([result.result() for result in results], [0, 2, 4, 6, 8])
+
+    def test_worker_error_is_raised_in_the_recipe(self):
+        def fail():
+            raise IOError("disk full")
+
+        with self.assertRaises(IOError):
+            with StepPipeline() as pipeline:
+                pipeline.submit(fail)
+                for _ in range(3):
+                    pipeline.submit(lambda: None)
+
+    def test_recipe_error_takes_precedence(self):
+        saved = []
+        with self.assertRaises(ValueError):
+            with StepPipeline() as pipeline:
+                pipeline.submit(saved.append, 1)
+                raise ValueError("cancelled")
+        self.assertEqual(saved, [1])
+
+    def test_not_pipelined_runs_immediately(self):
+        saved = []
+        with StepPipeline(pipelined=False) as pipeline:
+            result = pipeline.submit(lambda step: saved.append(step) or step, 1)
+            self.assertEqual(saved, [1])
+        self.assertEqual(result.result(), 1)
@@ -0,0 +1,34 @@
+from typing import Union
+
+
+class ChargeRateEstimator:
+    """Estimates the charge rate (nC/s) from successive charge counter readings, smoothed with an exponential moving
+    average. The rate follows changes of the beam current within a few readings"""
+    def __init__(self, smoothing: float = 0.5):
+        """smoothing: the weight of the newest reading, between 0 (never update) and 1 (no smoothing)"""
+        self.smoothing = smoothing
+        self.rate: Union[float, None] = None
+        self._last_time: Union[float, None] = None
+        self._last_charge = 0.
+
+    def reset(self):
+        self.rate = None
+        self._last_time = None
+        self._last_charge = 0.
+
+    def add_reading(self, timestamp: float, charge: float):
+        """timestamp: monotonic seconds. A reading with a lower charge than the previous one restarts the estimate"""
+        if self._last_time is not None and charge >= self._last_charge and timestamp > self._last_time:
+            rate = (charge - self._last_charge) / (timestamp - self._last_time)
+            self.rate = rate if self.rate is None else self.smoothing * rate + (1 - self.smoothing) * self.rate
+        elif self._last_time is not None and charge < self._last_charge:
+            self.rate = None
+        self._last_time = timestamp
+        self._last_charge = charge
+
+    def get_time_to_target(self, target_charge: float, now: float) -> Union[float, None]:
+        """The predicted seconds until target_charge is reached, or None when no rate is known yet or the beam is off"""
+        if self.rate is None or self.rate <= 0 or self._last_time is None:
+            return None
+        remaining = (target_charge - self._last_charge) / self.rate - (now - self._last_time)
+        return max(remaining, 0.)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, Dict, Literal
+from typing import Optional, Dict, Literal, List
 
 from pydantic import Field
 from pydantic.main import BaseModel
@@ -54,12 +54,13 @@ class ErdJournal(BaseModel):
     z_encoder: float
     theta_encoder: float
     histogram: str
+    z_dwell_sec: List[float] = Field([], description="The achieved dwell time at every z position")
 
 
-def get_erd_journal(erd_data: ErdData, start_time: datetime) -> ErdJournal:
+def get_erd_journal(erd_data: ErdData, start_time: datetime, z_dwell_sec: List[float] = None) -> ErdJournal:
     return ErdJournal(
         start_time=start_time, end_time=datetime.now(), measuring_time_sec=erd_data.measuring_time_sec,
         z=erd_data.mdrive_z["motor_position"], theta=erd_data.mdrive_theta["motor_position"],
         z_encoder=erd_data.motrona_z_encoder["charge(nC)"],
         theta_encoder=erd_data.motrona_theta_encoder["charge(nC)"],
-        histogram=erd_data.histogram)
+        histogram=erd_data.histogram, z_dwell_sec=z_dwell_sec or [])
@@ -1,4 +1,5 @@
 import logging
+import time
 from datetime import datetime
 from typing import List
 
@@ -11,29 +12,36 @@ from waspy.iba.iba_error import RangeError, CancelError
 
 
 def run_erd_recipe(recipe: ErdRecipe, erd_setup: ErdSetup) -> ErdJournal:
+    """The measuring time is divided evenly over the z positions. Every position gets a deadline relative to the start
+    of the acquisition, so the move time is taken from the dwell and does not accumulate"""
     start_time = datetime.now()
     erd_setup.move(PositionCoordinates(z=recipe.z_start, theta=recipe.theta))
     erd_setup.wait_for_arrival()
     erd_setup.configure_acquisition(recipe.measuring_time_sec, recipe.name)
     erd_setup.start_acquisition()
+    acquisition_start = time.monotonic()
     erd_setup.wait_for_acquisition_started()
     z_range = get_z_range(recipe.z_start, recipe.z_end, recipe.z_increment, recipe.z_repeat)
     if len(z_range) == 0:
         raise RangeError("Invalid z range")
-    wait_time = recipe.measuring_time_sec / len(z_range)
-    _log_recipe(recipe, wait_time, z_range)
-    for z in z_range:
+    step_time = recipe.measuring_time_sec / len(z_range)
+    _log_recipe(recipe, step_time, z_range)
+    z_dwell_sec = []
+    for index, z in enumerate(z_range):
         erd_setup.move(z)
-        erd_setup.wait_for(wait_time)
+        arrival = time.monotonic()
+        erd_setup.wait_for_deadline(acquisition_start + (index + 1) * step_time)
         if erd_setup._cancel:
             raise CancelError("ERD Recipe was cancelled")
+        z_dwell_sec.append(round(time.monotonic() - arrival, 3))
+        logging.info(f'[WASPY.IBA.ERD_RECIPES] z: {z.z}, dwell_sec: {z_dwell_sec[-1]} of {step_time:.3f}')
 
     erd_setup.wait_for_acquisition_done()
     erd_setup.convert_data_to_ascii()
 
     erd_setup.get_measuring_time()
 
-    return get_erd_journal(erd_setup.get_status(get_histogram=True), start_time)
+    return get_erd_journal(erd_setup.get_status(get_histogram=True), start_time, z_dwell_sec)
 
 
 def get_z_range(start, end, increment, repeat=1) -> List[PositionCoordinates]:
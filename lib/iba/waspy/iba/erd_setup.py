@@ -1,22 +1,27 @@
-import time
-
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from threading import Lock
 
 from waspy.drivers.fastcom_mpa3 import FastcomMpa3
+from waspy.drivers.http_helper import PollStrategy
 from waspy.drivers.ims_mdrive import ImsMDrive
 from waspy.drivers.motrona_dx350 import MotronaDx350
 from waspy.iba.erd_entities import ErdDriverUrls, PositionCoordinates, ErdData
-from waspy.iba.preempt import preemptive
+from waspy.iba.fan_out import fan_out
+from waspy.iba.preempt import preemptive, Cancellation, wait_until
 
+STATUS_DEADLINE = 10
+ACQUISITION_POLLING = PollStrategy(initial_interval=0.05, max_interval=0.25, deadline=None)
 
 
 class ErdSetup:
     _fake: bool
     _fake_count: int
-    _cancel: bool
+    _cancel: Cancellation
 
-    def __init__(self, erd_driver_urls: ErdDriverUrls):
+    def __init__(self, erd_driver_urls: ErdDriverUrls, max_workers: int = 6):
+        """max_workers bounds the amount of concurrent requests to the hardware daemons"""
         self.mdrive_z = ImsMDrive(erd_driver_urls.mdrive_z)
         self.mdrive_theta = ImsMDrive(erd_driver_urls.mdrive_theta)
         self.mpa3 = FastcomMpa3(erd_driver_urls.mpa3)
@@ -26,18 +31,19 @@ class ErdSetup:
         self._abort = False
         self._fake = False
         self._fake_count = 0
-        self._cancel = False
+        self._cancel = Cancellation()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="erd_setup")
 
     def cancel(self):
-        self._cancel = True
+        self._cancel.set()
 
     def resume(self):
         if not self._fake:
-            self._cancel = False
+            self._cancel.clear()
 
     def fake(self):
         self._fake = True
-        self._cancel = True
+        self._cancel.set()
 
     @preemptive
     def move(self, position: PositionCoordinates):
@@ -53,20 +59,22 @@ class ErdSetup:
         self.mdrive_theta.load()
 
     def get_status(self, get_histogram=False) -> ErdData:
-        status_mdrive_z = self.mdrive_z.get_status()
-        status_mdrive_theta = self.mdrive_theta.get_status()
-        status_mpa3 = self.mpa3.get_status()
-        status_motrona_z_encoder = self.motrona_z_encoder.get_status()
-        status_motrona_theta_encoder = self.motrona_theta_encoder.get_status()
-
-        histogram = ""
+        """The daemons are queried concurrently, together with the histogram when requested. Raises an IbaError
+        listing every daemon that failed or did not respond within STATUS_DEADLINE seconds. The daemon statuses are
+        validated here, where they enter"""
+        calls = {"mdrive_z": self.mdrive_z.get_status, "mdrive_theta": self.mdrive_theta.get_status,
+                 "mpa3": self.mpa3.get_status, "motrona_z_encoder": self.motrona_z_encoder.get_status,
+                 "motrona_theta_encoder": self.motrona_theta_encoder.get_status}
         if get_histogram:
-            histogram = self.get_histogram()
+            calls["histogram"] = self.get_histogram
+        results = fan_out(calls, self._executor, STATUS_DEADLINE)
+
         return ErdData.parse_obj(
-            {"mdrive_z": status_mdrive_z, "mdrive_theta": status_mdrive_theta, "mpa3": status_mpa3,
-             "motrona_z_encoder": status_motrona_z_encoder,
-             "motrona_theta_encoder": status_motrona_theta_encoder,
-             "histogram": histogram, "measuring_time_sec": self.get_measuring_time()})
+            {"mdrive_z": results["mdrive_z"], "mdrive_theta": results["mdrive_theta"], "mpa3": results["mpa3"],
+             "motrona_z_encoder": results["motrona_z_encoder"],
+             "motrona_theta_encoder": results["motrona_theta_encoder"],
+             "histogram": results.get("histogram", ""),
+             "measuring_time_sec": results["mpa3"]["acquisition_status"]["real_time"]})
 
     @preemptive
     def wait_for_arrival(self):
@@ -76,11 +84,16 @@ class ErdSetup:
 
     @preemptive
     def wait_for(self, seconds):
-        sleep_time = 0
-        while sleep_time < seconds:
-            yield
-            time.sleep(1)
-            sleep_time += 1
+        yield
+        self._cancel.wait(seconds)
+        yield
+
+    @preemptive
+    def wait_for_deadline(self, deadline: float):
+        """Waits until time.monotonic() reaches the deadline"""
+        yield
+        self._cancel.wait(max(deadline - time.monotonic(), 0))
+        yield
 
     @preemptive
     def wait_for_acquisition_done(self):
@@ -126,18 +139,10 @@ class ErdSetup:
 
     @preemptive
     def _acquisition_done(self):
-        while True:
-            time.sleep(1)
-            yield
-            if not self.mpa3.acquiring():
-                logging.info("[WASPY.IBA.ERD_SETUP] Acquisition has completed")
-                break
+        yield from wait_until(self._cancel, lambda: not self.mpa3.acquiring(), ACQUISITION_POLLING.intervals())
+        logging.info("[WASPY.IBA.ERD_SETUP] Acquisition has completed")
 
     @preemptive
     def _acquisition_started(self):
-        while True:
-            time.sleep(1)
-            yield
-            if self.mpa3.acquiring():
-                logging.info("[WASPY.IBA.ERD_SETUP] Acquisition has started")
-                break
+        yield from wait_until(self._cancel, self.mpa3.acquiring, ACQUISITION_POLLING.intervals())
+        logging.info("[WASPY.IBA.ERD_SETUP] Acquisition has started")
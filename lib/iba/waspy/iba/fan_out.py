@@ -0,0 +1,28 @@
+from concurrent.futures import Executor, wait
+from typing import Dict, Callable, Hashable, Any, Union
+
+from waspy.iba.iba_error import IbaError
+
+
+def fan_out(calls: Dict[Hashable, Callable[[], Any]], executor: Executor, timeout: Union[float, None] = None) \
+        -> Dict[Hashable, Any]:
+    """Runs all calls concurrently on the executor and returns their results by key. When any call fails or does not
+    return within timeout seconds, an IbaError is raised which lists every failed call"""
+    futures = {key: executor.submit(call) for key, call in calls.items()}
+    done, not_done = wait(futures.values(), timeout=timeout)
+
+    results = {}
+    errors = {}
+    for key, future in futures.items():
+        if future in not_done:
+            future.cancel()
+            errors[key] = f'no response within {timeout} seconds'
+        elif future.exception() is not None:
+            errors[key] = f'{type(future.exception()).__name__}: {future.exception()}'
+        else:
+            results[key] = future.result()
+
+    if errors:
+        failures = [f'{key}: {error}' for key, error in errors.items()]
+        raise IbaError(f'{len(errors)} of {len(calls)} requests failed: ' + "; ".join(failures))
+    return results
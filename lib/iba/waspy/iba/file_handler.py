@@ -1,8 +1,10 @@
 import traceback
 from datetime import datetime
 from pathlib import Path
+from queue import Queue
 from shutil import move, copy2, copytree
-from typing import Dict, Union
+from threading import Thread, Lock
+from typing import Dict, Union, List, Callable, TextIO
 from matplotlib.figure import Figure
 from matplotlib import pyplot as plt
 
@@ -11,6 +13,23 @@ import logging
 import pandas as pd
 import json
 
+'''
+Writes the measurement files to a local directory and mirrors them to a remote directory, typically a network share.
+
+In write-behind mode, the writes are put in a bounded queue and a worker thread performs the local write and the remote
+copy. A writer only blocks when the queue is full. flush() waits until all queued writes are done, it is meant for
+recipe and job boundaries. Failed remote copies are logged and returned by flush, a failed local write is raised by
+flush. Only flush and close report these errors, a read waits for the queued writes but leaves their errors to the next
+flush. Errors that were not flushed when the base folder changes belong to a previous job, they are logged and dropped.
+close() stops the worker.
+
+Example usage:
+    file_handler = FileHandler(Path("data"), Path("/mnt/share/data"), write_behind=True)
+    file_handler.write_text_to_disk("spectrum.txt", text)
+    remote_failures = file_handler.flush()
+    file_handler.close()
+ '''
+
 
 class FileHandler:
     _local: Path
@@ -18,15 +37,53 @@ class FileHandler:
     _base_folder: Path
     _sub_folder: Path
     _remote_enable: bool
+    _queue: Union[Queue, None]
+    _remote_failures: List[str]
+    _local_error: Union[Exception, None]
 
-    def __init__(self, local_dir: Path, remote_dir: Union[Path, None] = None):
+    def __init__(self, local_dir: Path, remote_dir: Union[Path, None] = None, write_behind: bool = False,
+                 max_queued_writes: int = 64):
+        """With write_behind, files are written by a worker thread. At most max_queued_writes files wait for the
+        worker, a write blocks when there are more"""
         self._local = local_dir
         self._remote = remote_dir
         self._sub_folder = Path("")
         self._base_folder = Path("")
         self._make_folders()
+        self._remote_failures = []
+        self._local_error = None
+        self._lock = Lock()
+        self._queue = None
+        self._worker = None
+        if write_behind:
+            self._queue = Queue(maxsize=max_queued_writes)
+            self._worker = Thread(target=self._write_queued, daemon=True, name="file_handler")
+            self._worker.start()
+
+    def flush(self) -> List[str]:
+        """Waits until all queued writes are done. Returns the remote copies that failed since the previous flush and
+        raises the first local write error"""
+        self._wait_for_writes()
+        with self._lock:
+            remote_failures, self._remote_failures = self._remote_failures, []
+            local_error, self._local_error = self._local_error, None
+        if remote_failures:
+            logging.error(f"[WASPY.IBA.FILE_WRITER] {len(remote_failures)} files were not copied to the remote "
+                          f"directory: " + ", ".join(remote_failures))
+        if local_error is not None:
+            raise local_error
+        return remote_failures
+
+    def close(self) -> List[str]:
+        """Waits for the queued writes and stops the worker, later writes are done synchronously. Flushes afterwards"""
+        if self._queue is not None:
+            queue, self._queue = self._queue, None
+            queue.put(None)
+            self._worker.join()
+        return self.flush()
 
     def set_base_folder(self, folder: str):
+        self._drop_errors()
         self._base_folder = Path(folder)
         self._sub_folder = Path("")
         subdir = "old_" + datetime.now().strftime("%Y-%m-%d_%H.%M.%S")
@@ -40,10 +97,13 @@ class FileHandler:
 
     def cd_folder(self, folder: str):
         self._sub_folder = self._sub_folder / Path(folder)
-        Path.mkdir(self._local / self._base_folder / self._sub_folder, exist_ok=True)
+        self._make_folder(self._sub_folder)
 
-        if self._remote:
-            Path.mkdir(self._remote / self._base_folder / self._sub_folder, exist_ok=True)
+    def make_folder(self, folder: str):
+        """Creates a folder in the current folder, without changing the current folder. Files are written in it with
+        their name relative to the current folder, e.g. 'folder/file.txt'. Unlike cd_folder, this can be used by a
+        worker thread while the current folder is in use"""
+        self._make_folder(self._sub_folder / Path(folder))
 
     def cd_folder_up(self):
         self._sub_folder = self._sub_folder.parent
@@ -52,32 +112,43 @@ class FileHandler:
         self._sub_folder = Path("")
 
     def write_matplotlib_fig_to_disk(self, filename: str, fig: Figure):
-        plt.subplots_adjust(hspace=0.5)
+        """Renders the given figure, not the current pyplot figure"""
+        fig.subplots_adjust(hspace=0.5)
         buf = io.BytesIO()
-        plt.savefig(buf, format='png')
+        fig.savefig(buf, format='png')
         self.write_bytes_to_disk(filename, buf)
         plt.close(fig)
-        plt.clf()
 
     def write_bytes_to_disk(self, filename: str, content: io.BytesIO):
         content.seek(0)
-        with open(self._in_local_path(filename), "wb") as f:
-            f.write(content.getbuffer().tobytes())
-        if self._remote:
-            _try_copy(self._in_local_path(filename), self._in_remote_path(filename))
+        data = content.getbuffer().tobytes()
         content.close()
+        self._submit(self._write_and_copy, data, "wb", self._in_local_path(filename), self._in_remote_path(filename))
 
     def write_text_to_disk(self, filename: str, content: str):
-        with open(self._in_local_path(filename), 'w+') as f:
-            f.write(content)
+        self._submit(self._write_and_copy, content, "w+", self._in_local_path(filename),
+                     self._in_remote_path(filename))
+
+    def write_text_stream_to_disk(self, filename: str, write: Callable[[TextIO], None]):
+        """write is called with the opened text file, so large contents do not have to be built as a single string.
+        In write-behind mode, it is called by the worker"""
+        self._submit(self._stream_and_copy, write, self._in_local_path(filename), self._in_remote_path(filename))
+
+    def append_bytes_to_disk(self, filename: str, content: bytes):
+        """Appends to the local file only, the file is copied to the remote directory with copy_to_remote"""
+        self._submit(_append_bytes, content, self._in_local_path(filename))
+
+    def copy_to_remote(self, filename: str):
         if self._remote:
-            _try_copy(self._in_local_path(filename), self._in_remote_path(filename))
+            self._submit(self._copy_to_remote, self._in_local_path(filename), self._in_remote_path(filename))
 
     def read_text_from_disk(self, filename: str):
+        self._wait_for_writes()
         with open(self._in_local_path(filename), 'r') as f:
             return f.read()
 
     def read_json_from_disk(self, filename: str):
+        self._wait_for_writes()
         with open(self._in_local_path(filename), 'r') as f:
             return json.load(f)
 
@@ -96,8 +167,70 @@ class FileHandler:
         return self._local / self._base_folder / self._sub_folder / file_stem
 
     def _in_remote_path(self, file_stem: str):
+        if not self._remote:
+            return None
         return self._remote / self._base_folder / self._sub_folder / file_stem
 
+    def _make_folder(self, sub_folder: Path):
+        Path.mkdir(self._local / self._base_folder / sub_folder, exist_ok=True)
+
+        if self._remote and self._queue is None:
+            Path.mkdir(self._remote / self._base_folder / sub_folder, exist_ok=True)
+        elif self._remote:
+            self._submit(_make_remote_folder, self._remote / self._base_folder / sub_folder)
+
+    def _submit(self, func, *args):
+        """The paths are resolved by the caller, so a later cd_folder does not affect the queued writes"""
+        if self._queue is None:
+            func(*args)
+        else:
+            self._queue.put((func, args))
+
+    def _wait_for_writes(self):
+        """Unlike flush, the errors are left to be reported by the next flush"""
+        if self._queue is not None:
+            self._queue.join()
+
+    def _drop_errors(self):
+        self._wait_for_writes()
+        with self._lock:
+            remote_failures, self._remote_failures = self._remote_failures, []
+            local_error, self._local_error = self._local_error, None
+        if remote_failures or local_error:
+            logging.warning(f"[WASPY.IBA.FILE_WRITER] Dropping the unflushed errors of the previous folder: "
+                            f"{len(remote_failures)} failed remote copies, local error: {local_error}")
+
+    def _write_queued(self):
+        queue = self._queue
+        while True:
+            item = queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            func, args = item
+            try:
+                func(*args)
+            except Exception as e:
+                logging.error(traceback.format_exc())
+                with self._lock:
+                    self._local_error = self._local_error or e
+            finally:
+                queue.task_done()
+
+    def _write_and_copy(self, content: Union[str, bytes], mode: str, local_path: Path, remote_path: Union[Path, None]):
+        self._stream_and_copy(lambda f: f.write(content), local_path, remote_path, mode)
+
+    def _stream_and_copy(self, write: Callable, local_path: Path, remote_path: Union[Path, None], mode: str = 'w+'):
+        with open(local_path, mode) as f:
+            write(f)
+        if remote_path:
+            self._copy_to_remote(local_path, remote_path)
+
+    def _copy_to_remote(self, local_path: Path, remote_path: Path):
+        if not _try_copy(local_path, remote_path):
+            with self._lock:
+                self._remote_failures.append(str(remote_path))
+
     def _make_folders(self):
         Path.mkdir(self._local, parents=True, exist_ok=True)
         if self._remote:
@@ -118,11 +251,26 @@ class FileHandler:
         copytree(source, destination)
 
 
-def _try_copy(source, destination):
+def _try_copy(source, destination) -> bool:
     logging.info(
         "[WASPY.IBA.FILE_WRITER] copying {source} to {destination}".format(source=source, destination=destination))
     try:
         Path.mkdir(destination.parent, exist_ok=True)
         copy2(source, destination)
+        return True
     except:
         logging.error(traceback.format_exc())
+        return False
+
+
+def _append_bytes(content: bytes, local_path: Path):
+    with open(local_path, 'ab') as f:
+        f.write(content)
+
+
+def _make_remote_folder(folder: Path):
+    """Used by the worker. A failure is only logged, the copies to the folder are reported by flush as they fail"""
+    try:
+        Path.mkdir(folder, exist_ok=True)
+    except OSError:
+        logging.error(traceback.format_exc())
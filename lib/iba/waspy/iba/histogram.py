@@ -0,0 +1,97 @@
+from typing import Union, Sequence, Iterator, Dict, Any
+
+import numpy as np
+
+'''
+A histogram of counts, backed by a read-only numpy integer array. It can be used as a pydantic field type: lists and
+arrays are validated once into a Histogram, an existing Histogram is passed through without copying.
+
+The models that hold histograms serialize them as lists of integers, with HISTOGRAM_JSON_ENCODERS in their Config.
+Comparing a Histogram with a list compares the counts.
+
+Example usage:
+    class Spectrum(BaseModel):
+        counts: Histogram
+
+        class Config:
+            json_encoders = HISTOGRAM_JSON_ENCODERS
+
+    spectrum = Spectrum(counts=[1, 2, 3])
+    spectrum.counts.counts[0:2].sum()
+    spectrum.json()
+ '''
+
+
+class Histogram:
+    """Counts are stored as int32, or as int64 when they do not fit"""
+    __slots__ = ("_counts",)
+
+    def __init__(self, counts: Union[Sequence[int], np.ndarray, "Histogram"]):
+        if isinstance(counts, Histogram):
+            counts = counts.counts
+        counts = np.asarray(counts)
+        if counts.size == 0:
+            counts = counts.astype(np.int32)
+        if counts.ndim != 1 or counts.dtype.kind not in "iu":
+            raise TypeError("a histogram is a one dimensional sequence of integers")
+        fits_int32 = counts.size == 0 or (counts.min() >= np.iinfo(np.int32).min and
+                                          counts.max() <= np.iinfo(np.int32).max)
+        counts = counts.astype(np.int32 if fits_int32 else np.int64)
+        counts.flags.writeable = False
+        self._counts = counts
+
+    @property
+    def counts(self) -> np.ndarray:
+        return self._counts
+
+    def tolist(self):
+        return self._counts.tolist()
+
+    def sum(self) -> int:
+        return int(self._counts.sum(dtype=np.int64))
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._counts.tolist())
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return Histogram(self._counts[item])
+        return int(self._counts[item])
+
+    def __array__(self, dtype=None):
+        return self._counts if dtype is None else self._counts.astype(dtype)
+
+    def __eq__(self, other):
+        if isinstance(other, Histogram):
+            return np.array_equal(self._counts, other.counts)
+        if isinstance(other, (list, tuple, np.ndarray)):
+            return np.array_equal(self._counts, np.asarray(other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'Histogram({np.array2string(self._counts, separator=", ", threshold=16)})'
+
+    def __reduce__(self):
+        return Histogram, (self._counts,)
+
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, value) -> "Histogram":
+        if isinstance(value, Histogram):
+            return value
+        return cls(value)
+
+    @classmethod
+    def __modify_schema__(cls, field_schema: Dict[str, Any]):
+        field_schema.update(type="array", items={"type": "integer"})
+
+
+HISTOGRAM_JSON_ENCODERS = {Histogram: Histogram.tolist}
@@ -1,4 +1,6 @@
 import logging
+from threading import Event
+from typing import Union, Callable, Iterable
 
 
 '''
@@ -9,23 +11,61 @@ in your entire code base.
 Using this requires to define cancel and use yield to indicate when it is safe for the function to relinquish control.
 Using yield is not mandatory. Without yield the cancellation check only happens at the start
 
+_cancel can be a plain bool, or a Cancellation. A Cancellation behaves as a bool and can be waited on, so a function
+can sleep between its yields and still wake up as soon as it is cancelled.
+
 
 Example usage:
 class SlowCall(object):
-    cancel: bool
+    _cancel: Cancellation
 
     def __init__(self):
-        self.cancel = False
+        self._cancel = Cancellation()
+
+    def cancel(self):
+        self._cancel.set()
 
-    @cancel_func
+    @preemptive
     def wait(self):
         for _ in range(10):
             print("SlowCall.wait")
-            time.sleep(1)
+            self._cancel.wait(1)
             yield
  '''
 
 
+class Cancellation:
+    """A cancel flag based on threading.Event. It is truthy once set"""
+    def __init__(self):
+        self._event = Event()
+
+    def set(self):
+        self._event.set()
+
+    def clear(self):
+        self._event.clear()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Union[float, None]) -> bool:
+        """Sleeps for timeout seconds, or less when cancelled in the meantime. Returns whether it is cancelled"""
+        return self._event.wait(timeout)
+
+    def __bool__(self):
+        return self._event.is_set()
+
+
+def wait_until(cancel: Cancellation, condition: Callable[[], bool], intervals: Iterable[float]):
+    """To be used with 'yield from' in a preemptive function. Checks the condition after every interval and yields in
+    between. An interval is cut short when cancelled"""
+    for interval in intervals:
+        if condition():
+            return
+        cancel.wait(interval)
+        yield
+
+
 def cancel_function(func, *args, **kw):
     saved_args = locals()
     logging.info("[WASPY.IBA.PREEMPT] Function '" + str(saved_args) + "' cancelled")
@@ -6,6 +6,8 @@ import numpy as np
 from pydantic import BaseModel, Field, validator
 from waspy.drivers.caen import DetectorMetadata
 
+from waspy.iba.histogram import Histogram, HISTOGRAM_JSON_ENCODERS
+
 
 class Detector(DetectorMetadata):
     identifier: str = Field(
@@ -22,7 +24,10 @@ class RbsDriverUrls(BaseModel):
 
 class Plot(BaseModel):
     title: str
-    points: List[int]
+    points: Histogram
+
+    class Config:
+        json_encoders = HISTOGRAM_JSON_ENCODERS
 
 
 class RbsData(BaseModel):
@@ -31,10 +36,13 @@ class RbsData(BaseModel):
     aml_det_theta: Dict
     caen: Dict
     motrona: Dict
-    histograms: Dict[str, List[int]] = Field(description="Maps detector name to resulting dataset")
+    histograms: Dict[str, Histogram] = Field(description="Maps detector name to resulting dataset")
     measuring_time_sec: float
     accumulated_charge: float
 
+    class Config:
+        json_encoders = HISTOGRAM_JSON_ENCODERS
+
 
 class RbsJournal(BaseModel):
     start_time: datetime
@@ -45,18 +53,24 @@ class RbsJournal(BaseModel):
     theta: float
     phi: float
     zeta: float
-    histograms: Dict[str, List[int]] = Field(description="Maps detector name to resulting dataset")
+    histograms: Dict[str, Histogram] = Field(description="Maps detector name to resulting dataset")
     measuring_time_sec: float
     accumulated_charge: float
 
-
-def get_rbs_journal(rbs_data: RbsData, start_time: datetime) -> RbsJournal:
-    return RbsJournal(
-        x=rbs_data.aml_x_y["motor_1_position"], y=rbs_data.aml_x_y["motor_2_position"],
-        phi=rbs_data.aml_phi_zeta["motor_1_position"], zeta=rbs_data.aml_phi_zeta["motor_2_position"],
-        det=rbs_data.aml_det_theta["motor_1_position"], theta=rbs_data.aml_det_theta["motor_2_position"],
-        accumulated_charge=rbs_data.accumulated_charge, measuring_time_sec=rbs_data.measuring_time_sec,
-        histograms=rbs_data.histograms, start_time=start_time, end_time=datetime.now()
+    class Config:
+        json_encoders = HISTOGRAM_JSON_ENCODERS
+
+
+def get_rbs_journal(rbs_data: RbsData, start_time: datetime, end_time: datetime = None) -> RbsJournal:
+    """rbs_data is validated where the daemon statuses enter, in RbsSetup.get_status. The journal is an internal copy of
+    it, so it is constructed without validation. The status dicts are not typed, the positions are converted with
+    float(), which raises on missing or malformed values"""
+    return RbsJournal.construct(
+        x=float(rbs_data.aml_x_y["motor_1_position"]), y=float(rbs_data.aml_x_y["motor_2_position"]),
+        phi=float(rbs_data.aml_phi_zeta["motor_1_position"]), zeta=float(rbs_data.aml_phi_zeta["motor_2_position"]),
+        det=float(rbs_data.aml_det_theta["motor_1_position"]), theta=float(rbs_data.aml_det_theta["motor_2_position"]),
+        accumulated_charge=float(rbs_data.accumulated_charge), measuring_time_sec=float(rbs_data.measuring_time_sec),
+        histograms=dict(rbs_data.histograms), start_time=start_time, end_time=end_time or datetime.now()
     )
 
 
@@ -74,6 +88,9 @@ class AysJournal(BaseModel):
     rbs_journals: List[RbsJournal]
     fit: AysFitResult
 
+    class Config:
+        json_encoders = HISTOGRAM_JSON_ENCODERS
+
 
 class ChannelingMapYield(BaseModel):
     zeta: float
@@ -87,12 +104,18 @@ class ChannelingMapJournal(BaseModel):
     rbs_journals: List[RbsJournal]
     cms_yields: List[ChannelingMapYield]
 
+    class Config:
+        json_encoders = HISTOGRAM_JSON_ENCODERS
+
 
 class ChannelingJournal(BaseModel):
     random: RbsJournal
     fixed: RbsJournal
     ays: List[AysJournal]
 
+    class Config:
+        json_encoders = HISTOGRAM_JSON_ENCODERS
+
 
 class PositionCoordinates(BaseModel):
     x: Optional[float]
@@ -239,6 +262,9 @@ class RbsChanneling(BaseModel):
     compare_charge_total: int
     random_coordinate_range: CoordinateRange
     fit_algorithm_type: FitAlgorithmType
+    fit_resolution: float = Field(0.01, gt=0, description="The resolution (degrees) of the minimum of the fit")
+    fit_max_grid_points: int = Field(
+        2000, gt=0, description="The fit is evaluated on a grid with the fit resolution, of at most this many points")
 
     class Config:
         extra = 'forbid'
@@ -279,6 +305,8 @@ class RbsChannelingMap(BaseModel):
     theta_coordinate_range: CoordinateRange
     yield_integration_window: Window
     optimize_detector_identifier: str
+    spectrum_archive: bool = Field(False, description="Store all spectra of the map in a binary spectrum archive")
+    text_export: bool = Field(True, description="Write a text file per detector for each step of the map")
 
 
 class RbsSingleStep(BaseModel):
@@ -5,17 +5,22 @@ from typing import List
 
 import numpy as np
 from matplotlib.figure import Figure
-from matplotlib import pyplot as plt
 from waspy.iba.rbs_entities import RbsData, GraphGroup, AysFitResult, Graph, ChannelingMapYield, HeatMap, \
     FitAlgorithmType
 import matplotlib
 
 matplotlib.use('Agg')
 
+'''
+The plots are drawn on plain matplotlib Figures, not through pyplot. They do not touch the global pyplot state, so they
+can be drawn off the main thread, e.g. by a StepPipeline worker.
+ '''
+
 
 def plot_graph_group(graph_group: GraphGroup) -> Figure:
     nr_of_graphs = len(graph_group.graphs)
-    fig, axs = plt.subplots(nr_of_graphs)
+    fig = Figure()
+    axs = fig.subplots(nr_of_graphs)
     fig.suptitle(graph_group.title)
 
     if nr_of_graphs == 1:
@@ -48,7 +53,8 @@ def plot_heat_map(heat_map: HeatMap) -> Figure:
         data[y_axis.index(cms_yield.zeta)][x_axis.index(cms_yield.theta)] = cms_yield.energy_yield
 
 
-    fig, ax = plt.subplots()
+    fig = Figure()
+    ax = fig.subplots()
     ax.set_title(f"Channeling Map {heat_map.title}")
     ax.set_xlabel("theta")
     ax.set_ylabel("zeta")
@@ -75,7 +81,8 @@ def _configure_ax(ax, x_label, y_label):
 
 
 def plot_energy_yields(title, fit_result: AysFitResult, fit_algorithm_type=FitAlgorithmType.LOWER_FIT):
-    fig, ax = plt.subplots()
+    fig = Figure()
+    ax = fig.subplots()
     ax.scatter(fit_result.discrete_angles, fit_result.discrete_yields, marker="+", color="red", label="Data Points")
     ax.axhline(np.amin(fit_result.discrete_yields), label="Minimum", linestyle=":")
     if fit_algorithm_type is not FitAlgorithmType.MINIMUM_YIELD:
@@ -84,8 +91,8 @@ def plot_energy_yields(title, fit_result: AysFitResult, fit_algorithm_type=FitAl
         ax.plot(smooth_angles, smooth_yields, color="green", label="fit")
     ax.axvline(fit_result.minimum, label=f"Minimum Angle={fit_result.minimum}", color="blue", linestyle=":")
     ax.legend(loc=0)
-    plt.xlabel("degrees").set_fontsize(15)
-    plt.ylabel("yield").set_fontsize(15)
-    plt.title(title)
-    plt.grid()
+    ax.set_xlabel("degrees", fontsize=15)
+    ax.set_ylabel("yield", fontsize=15)
+    ax.set_title(title)
+    ax.grid()
     return fig
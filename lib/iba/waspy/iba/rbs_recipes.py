@@ -1,13 +1,16 @@
+import io
 import logging
 import os.path
 from datetime import datetime
 from pathlib import Path
 from shutil import copytree
-from typing import List
+from functools import partial
+from typing import List, Union, TextIO, Optional
 
-from scipy.optimize import OptimizeWarning
+import numpy as np
 
 from waspy.iba.file_handler import FileHandler
+from waspy.iba.histogram import Histogram
 from waspy.iba.iba_error import CancelError
 from waspy.iba.rbs_plot import plot_energy_yields, plot_graph_group, plot_heat_map
 from waspy.iba.rbs_entities import get_positions_as_coordinate, CoordinateRange, Graph, Plot, \
@@ -16,7 +19,12 @@ from waspy.iba.rbs_entities import get_positions_as_coordinate, CoordinateRange,
     RbsChannelingMap, \
     ChannelingMapYield, HeatMap, FitAlgorithmType
 from waspy.iba.rbs_setup import RbsSetup
-from waspy.iba.rbs_yield_angle_fit import fit_and_smooth
+from waspy.iba.rbs_yield_angle_fit import fit_series, DEFAULT_RESOLUTION, MAX_GRID_POINTS
+from waspy.iba.spectrum_archive import SpectrumArchiveWriter
+from waspy.iba.step_pipeline import StepPipeline
+
+HISTOGRAM_WRITE_CHUNK = 4096
+_DETECTOR_NAME_PLACEHOLDER = "\0detector_name\0"
 
 
 def run_random(recipe: RbsRandom, rbs: RbsSetup) -> RbsJournal:
@@ -27,7 +35,8 @@ def run_random(recipe: RbsRandom, rbs: RbsSetup) -> RbsJournal:
 
 
 def run_channeling_map(recipe: RbsChannelingMap, rbs: RbsSetup, file_handler: FileHandler,
-                       recipe_meta_data) -> ChannelingMapJournal:
+                       recipe_meta_data, pipelined: bool = False) -> ChannelingMapJournal:
+    """With pipelined, the journal of a step is built and saved while the motors move to the next step"""
     start_time = datetime.now()
     rbs.move(recipe.start_position)
 
@@ -37,24 +46,32 @@ def run_channeling_map(recipe: RbsChannelingMap, rbs: RbsSetup, file_handler: Fi
     cms_yields = []
     rbs_index = 0
 
-    for zeta in zeta_angles:
-        for theta in theta_angles:
-            rbs.move(PositionCoordinates(zeta=zeta, theta=theta))
-            cms_step_start_time = datetime.now()
-            rbs.prepare_acquisition()
-            rbs_data = rbs.acquire_data(recipe.charge_total)
-            if rbs.cancelled():
-                raise CancelError("RBS Recipe was cancelled")
-            rbs.finalize_acquisition()
-            histogram_data = rbs_data.histograms[recipe.optimize_detector_identifier]
-            rbs_journal = get_rbs_journal(rbs_data, cms_step_start_time)
-            rbs_journals.append(rbs_journal)
-            energy_yield = get_sum(histogram_data, recipe.yield_integration_window)
-            cms_yields.append(ChannelingMapYield(zeta=zeta, theta=theta, energy_yield=energy_yield))
-            save_channeling_map_journal(file_handler, recipe, rbs_journal, zeta, theta, rbs_index, recipe_meta_data)
-            rbs_index += 1
-        rbs_index += 1
+    archive = SpectrumArchiveWriter(file_handler, recipe.name) if recipe.spectrum_archive else None
 
+    try:
+        with StepPipeline(pipelined) as pipeline:
+            for zeta in zeta_angles:
+                for theta in theta_angles:
+                    rbs.move(PositionCoordinates(zeta=zeta, theta=theta))
+                    cms_step_start_time = datetime.now()
+                    rbs.prepare_acquisition()
+                    rbs_data = rbs.acquire_data(recipe.charge_total)
+                    if rbs.cancelled():
+                        raise CancelError("RBS Recipe was cancelled")
+                    rbs.finalize_acquisition()
+                    histogram_data = rbs_data.histograms[recipe.optimize_detector_identifier]
+                    energy_yield = get_sum(histogram_data, recipe.yield_integration_window)
+                    cms_yields.append(ChannelingMapYield(zeta=zeta, theta=theta, energy_yield=energy_yield))
+                    rbs_journals.append(pipeline.submit(
+                        _save_channeling_map_step, file_handler, archive, recipe, rbs_data, cms_step_start_time,
+                        datetime.now(), zeta, theta, rbs_index, recipe_meta_data))
+                    rbs_index += 1
+                rbs_index += 1
+    finally:
+        if archive:
+            archive.close()
+
+    rbs_journals = [rbs_journal.result() for rbs_journal in rbs_journals]
     end_time = datetime.now()
 
     return ChannelingMapJournal(start_time=start_time, end_time=end_time, rbs_journals=rbs_journals,
@@ -62,11 +79,11 @@ def run_channeling_map(recipe: RbsChannelingMap, rbs: RbsSetup, file_handler: Fi
 
 
 def run_channeling(recipe: RbsChanneling, rbs: RbsSetup, file_handler: FileHandler, recipe_meta_data,
-                   ays_report_cb: callable(AysJournal) = None) -> ChannelingJournal:
+                   ays_report_cb: callable(AysJournal) = None, pipelined: bool = False) -> ChannelingJournal:
     rbs.move(recipe.start_position)
 
     logging.info("[WASPY.IBA.RBS_RECIPES] Start ays")
-    ays = run_ays(recipe, rbs, ays_report_cb, file_handler, recipe_meta_data)
+    ays = run_ays(recipe, rbs, ays_report_cb, file_handler, recipe_meta_data, pipelined)
 
     logging.info("[WASPY.IBA.RBS_RECIPES] Start Fixed")
     start_time = datetime.now()
@@ -124,7 +141,7 @@ def save_channeling_graphs_to_disk(file_writer, channeling_result: ChannelingJou
     file_writer.write_matplotlib_fig_to_disk(f'{graph_group.title}.png', fig)
 
 
-def save_rbs_graph_to_disk(file_writer, journal: RbsJournal, file_stem):
+def save_rbs_graph_to_disk(file_writer, journal: RbsJournal, file_stem, folder: str = ""):
     graphs = []
     for [detector, histogram] in journal.histograms.items():
         plot = Plot(title=detector, points=histogram)
@@ -132,7 +149,7 @@ def save_rbs_graph_to_disk(file_writer, journal: RbsJournal, file_stem):
 
     graph_group = GraphGroup(graphs=graphs, title=file_stem)
     fig = plot_graph_group(graph_group)
-    file_writer.write_matplotlib_fig_to_disk(f'{graph_group.title}.png', fig)
+    file_writer.write_matplotlib_fig_to_disk(_in_folder(folder, f'{graph_group.title}.png'), fig)
 
 
 def save_rbs_journal(file_handler: FileHandler, recipe: RbsRandom, journal: RbsJournal, extra):
@@ -141,13 +158,26 @@ def save_rbs_journal(file_handler: FileHandler, recipe: RbsRandom, journal: RbsJ
 
 def save_rbs_journal_with_file_stem(file_writer: FileHandler, file_stem,
                                     recipe: RbsChanneling | RbsRandom | RbsChannelingMap,
-                                    journal: RbsJournal, extra):
+                                    journal: RbsJournal, extra, folder: str = ""):
+    """The files are written in folder, relative to the current folder of the file writer"""
+    header_template = _serialize_histogram_header(journal, _DETECTOR_NAME_PLACEHOLDER, recipe, extra)
     for [detector, histogram] in journal.histograms.items():
         title = f'{file_stem}_{detector}.txt'
-        header = _serialize_histogram_header(journal, detector, recipe, extra)
-        data = format_caen_histogram(histogram)
-        file_writer.write_text_to_disk(title, f'{header}\n{data}')
-    save_rbs_graph_to_disk(file_writer, journal, file_stem)
+        header = header_template.replace(_DETECTOR_NAME_PLACEHOLDER, detector)
+        file_writer.write_text_stream_to_disk(_in_folder(folder, title), partial(_write_histogram_file, header,
+                                                                                 histogram))
+    save_rbs_graph_to_disk(file_writer, journal, file_stem, folder)
+
+
+def _save_channeling_map_step(file_handler: FileHandler, archive: Optional[SpectrumArchiveWriter],
+                              recipe: RbsChannelingMap, rbs_data: RbsData, start_time: datetime, end_time: datetime,
+                              zeta, theta, rbs_index, recipe_meta_data) -> RbsJournal:
+    rbs_journal = get_rbs_journal(rbs_data, start_time, end_time)
+    if archive:
+        archive.append(rbs_journal, rbs_index)
+    if recipe.text_export:
+        save_channeling_map_journal(file_handler, recipe, rbs_journal, zeta, theta, rbs_index, recipe_meta_data)
+    return rbs_journal
 
 
 def save_channeling_map_journal(file_handler: FileHandler, recipe: RbsChannelingMap, journal: RbsJournal, zeta, theta,
@@ -163,26 +193,25 @@ def save_channeling_map_journal(file_handler: FileHandler, recipe: RbsChanneling
 
 def save_ays_journal(file_handler: FileHandler, recipe: RbsChanneling, ays_journal: AysJournal, ays_index, extra,
                      fit_algorithm_type=FitAlgorithmType.LOWER_FIT):
+    """The files are written in a sub folder of the current folder. The current folder of the file handler is not
+    changed, so this can run in a StepPipeline"""
     yield_coordinate_range = recipe.yield_coordinate_ranges[ays_index]
     coordinate_ranging = yield_coordinate_range.name
     positions = get_positions_as_float(yield_coordinate_range)
     name = f'{recipe.name}_{ays_index}_{coordinate_ranging}'
-    file_handler.cd_folder(name)
+    file_handler.make_folder(name)
     for rbs_index, rbs_journal in enumerate(ays_journal.rbs_journals):
         save_rbs_journal_with_file_stem(file_handler, f'{rbs_index:02}_{name}_{positions[rbs_index]}', recipe,
-                                        rbs_journal, extra)
+                                        rbs_journal, extra, folder=name)
     text = serialize_energy_yields(ays_journal.fit)
-    file_handler.write_text_to_disk(f'_{name}_yields.txt', text)
+    file_handler.write_text_to_disk(_in_folder(name, f'_{name}_yields.txt'), text)
 
-    file_name = f'_{name}'
+    file_name = _in_folder(name, f'_{name}')
     if ays_journal.fit.success:
         fig = plot_energy_yields(name, ays_journal.fit, fit_algorithm_type)
         file_handler.write_matplotlib_fig_to_disk(f'{file_name}.png', fig)
     else:
         file_handler.write_text_to_disk(f'{file_name}.txt', "Fitting failed")
-        file_handler.cd_folder_up()
-        return
-    file_handler.cd_folder_up()
 
 
 def serialize_energy_yields(fit_data: AysFitResult) -> str:
@@ -193,62 +222,77 @@ def serialize_energy_yields(fit_data: AysFitResult) -> str:
 
 
 def run_ays(recipe: RbsChanneling, rbs: RbsSetup, ays_report_callback: callable(AysJournal), file_handler,
-            recipe_meta_data) -> List[AysJournal]:
-    """ays: angular yield scan"""
+            recipe_meta_data, pipelined: bool = False) -> List[AysJournal]:
+    """ays: angular yield scan. With pipelined, the journal of a scan is saved and plotted while the next scan is
+    measured"""
     start_time = datetime.now()
     result = []
     logging.info(f"[WASPY.IBA.RBS_RECIPES] YIELD COORD RANGES {recipe.yield_coordinate_ranges}")
-    for ays_index, coordinate_range in enumerate(recipe.yield_coordinate_ranges):
-        rbs_journals = []
-        yields = []
-        angles = get_positions_as_float(coordinate_range)
-        for angle in angles:
-            single = CoordinateRange.init_single(coordinate_range.name, angle)
-            ays_step_start_time = datetime.now()
-            rbs_data = run_rbs_recipe(single, recipe.yield_charge_total, rbs)
-            rbs_journal = get_rbs_journal(rbs_data, ays_step_start_time)
-            rbs_journals.append(rbs_journal)
-            yields.append(get_sum(rbs_journal.histograms[recipe.yield_optimize_detector_identifier],
-                                  recipe.yield_integration_window))
-        fit_result = find_minimum(angles, yields, recipe.fit_algorithm_type)
-        if fit_result.success:
-            logging.info(f"[WASPY.IBA.RBS_RECIPES] Minimum found at {coordinate_range.name}={fit_result.minimum}")
-            rbs.move(convert_float_to_coordinate(coordinate_range.name, fit_result.minimum))
-        ays_journal = AysJournal(start_time=start_time, end_time=datetime.now(), rbs_journals=rbs_journals,
-                                 fit=fit_result)
-        result.append(ays_journal)
-        if ays_report_callback:
-            ays_report_callback(result[-1])
-        save_ays_journal(file_handler, recipe, ays_journal, ays_index, recipe_meta_data, recipe.fit_algorithm_type)
+    with StepPipeline(pipelined) as pipeline:
+        for ays_index, coordinate_range in enumerate(recipe.yield_coordinate_ranges):
+            rbs_journals = []
+            yields = []
+            angles = get_positions_as_float(coordinate_range)
+            for angle in angles:
+                single = CoordinateRange.init_single(coordinate_range.name, angle)
+                ays_step_start_time = datetime.now()
+                rbs_data = run_rbs_recipe(single, recipe.yield_charge_total, rbs)
+                rbs_journal = get_rbs_journal(rbs_data, ays_step_start_time)
+                rbs_journals.append(rbs_journal)
+                yields.append(get_sum(rbs_journal.histograms[recipe.yield_optimize_detector_identifier],
+                                      recipe.yield_integration_window))
+            fit_result = find_minimum(angles, yields, recipe.fit_algorithm_type, recipe.fit_resolution,
+                                      recipe.fit_max_grid_points)
+            if fit_result.success:
+                logging.info(f"[WASPY.IBA.RBS_RECIPES] Minimum found at {coordinate_range.name}={fit_result.minimum}")
+                rbs.move(convert_float_to_coordinate(coordinate_range.name, fit_result.minimum))
+            ays_journal = AysJournal(start_time=start_time, end_time=datetime.now(), rbs_journals=rbs_journals,
+                                     fit=fit_result)
+            result.append(ays_journal)
+            if ays_report_callback:
+                ays_report_callback(result[-1])
+            pipeline.submit(save_ays_journal, file_handler, recipe, ays_journal, ays_index, recipe_meta_data,
+                            recipe.fit_algorithm_type)
 
     return result
 
 
-def find_minimum(angles, yields, fit_algorithm_type=FitAlgorithmType.LOWER_FIT) -> AysFitResult:
-    try:
-        fit_func, min_angle = fit_and_smooth(angles, yields, fit_algorithm_type)
-        return AysFitResult(success=True, minimum=min_angle, discrete_angles=angles,
-                            discrete_yields=yields, fit_func=fit_func)
-    except (RuntimeError, OptimizeWarning, ValueError) as e:
-        logging.error(e)
-        return AysFitResult(success=False, discrete_angles=angles, discrete_yields=yields)
+def find_minimum(angles, yields, fit_algorithm_type=FitAlgorithmType.LOWER_FIT, resolution=DEFAULT_RESOLUTION,
+                 max_grid_points=MAX_GRID_POINTS) -> AysFitResult:
+    return fit_series(angles, yields, fit_algorithm_type, resolution, max_grid_points)
 
 
-def get_sum(data: List[int], window: Window) -> int:
-    return sum(data[window.start:window.end])
+def get_sum(data: Union[Histogram, List[int]], window: Window) -> int:
+    return int(np.asarray(data)[window.start:window.end].sum(dtype=np.int64))
 
 
 def convert_float_to_coordinate(coordinate_name: str, position: float) -> PositionCoordinates:
     return PositionCoordinates.parse_obj({coordinate_name: position})
 
 
-def format_caen_histogram(data: List[int]) -> str:
-    index = 0
-    data_string = ""
-    for energy_level in data:
-        data_string += f'{index}, {energy_level}\n'
-        index += 1
-    return data_string
+def format_caen_histogram(data: Union[Histogram, List[int]]) -> str:
+    text = io.StringIO()
+    write_caen_histogram(text, data)
+    return text.getvalue()
+
+
+def write_caen_histogram(file: TextIO, data: Union[Histogram, List[int]]):
+    """Writes the histogram as 'index, count' lines. Every chunk of lines is formatted in a single operation"""
+    counts = np.asarray(data, dtype=np.int64)
+    for start in range(0, len(counts), HISTOGRAM_WRITE_CHUNK):
+        chunk = counts[start:start + HISTOGRAM_WRITE_CHUNK]
+        rows = np.column_stack((np.arange(start, start + len(chunk)), chunk)).ravel().tolist()
+        file.write("%d, %d\n" * len(chunk) % tuple(rows))
+
+
+def _in_folder(folder: str, filename: str) -> str:
+    return str(Path(folder) / filename)
+
+
+def _write_histogram_file(header: str, histogram: Union[Histogram, List[int]], file: TextIO):
+    file.write(header)
+    file.write("\n")
+    write_caen_histogram(file, histogram)
 
 
 def _serialize_histogram_header(journal: RbsJournal, detector_name, recipe: RbsRandom | RbsChanneling, extra):
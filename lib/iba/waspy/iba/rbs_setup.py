@@ -1,15 +1,28 @@
 import copy
 import logging
 import time
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Dict, Tuple, Callable, Union, Iterator
 
 
-from waspy.drivers.aml_smd2 import AmlSmd2
-from waspy.drivers.caen import Caen
+from waspy.drivers.aml_smd2 import AmlSmd2, MOVE_POLLING
+from waspy.drivers.caen import Caen, pack_histogram, HistogramCache
+from waspy.drivers.driver_error import DriverError
+from waspy.drivers.http_helper import wait_for_requests, PollStrategy, is_past_deadline, PendingRequest
 from waspy.drivers.motrona_dx350 import MotronaDx350
+from waspy.iba.charge_rate import ChargeRateEstimator
+from waspy.iba.fan_out import fan_out
+from waspy.iba.histogram import Histogram
 from waspy.iba.iba_error import IbaError
 from waspy.iba.rbs_entities import Detector, RbsData, PositionCoordinates, RbsDriverUrls
-from waspy.iba.preempt import preemptive
+from waspy.iba.preempt import preemptive, Cancellation
+
+
+STATUS_DEADLINE = 10
+COUNT_POLLING = PollStrategy(initial_interval=0.05, max_interval=0.25, deadline=None)
+COUNT_MARGIN = 0.2
+COUNT_MARGIN_FRACTION = 0.1
 
 
 def fake_counter():
@@ -21,17 +34,22 @@ class RbsSetup:
     _acquisition_run_time: float
     _acquisition_accumulated_charge: float
     _counting: bool
-    _cancel: bool
+    _cancel: Cancellation
+    _parallel_move: bool
+    _pending_clear: Union[PendingRequest, None]
     fake: bool
 
-    def __init__(self, rbs_hw: RbsDriverUrls):
+    def __init__(self, rbs_hw: RbsDriverUrls, parallel_move: bool = False, max_workers: int = 8):
+        """With parallel_move, all motors are sent to their targets at once and the move waits for all of them to
+        arrive. Otherwise, the motors are moved one after the other. max_workers bounds the amount of concurrent
+        requests to the hardware daemons"""
         self.hw = rbs_hw
 
         self.motor_x_y = AmlSmd2(self.hw.aml_x_y)
         self.motor_phi_zeta = AmlSmd2(self.hw.aml_phi_zeta)
         self.motor_det_theta = AmlSmd2(self.hw.aml_det_theta)
         self.charge_counter = MotronaDx350(self.hw.motrona_charge)
-        self.data_acquisition = Caen(self.hw.caen)
+        self.data_acquisition = Caen(self.hw.caen, histogram_cache=HistogramCache())
 
         self.detectors = []
         self._start_time = time.time()
@@ -39,54 +57,134 @@ class RbsSetup:
         self._acquisition_accumulated_charge = 0
         self.charge_offset = 0
         self._counting = False
+        self._charge_rate = ChargeRateEstimator()
+        self._target_charge = 0.
         self._fake = False
-        self._cancel = False
+        self._cancel = Cancellation()
+        self._parallel_move = parallel_move
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rbs_setup")
+        self._pending_clear = None
 
     def cancel(self):
-        self._cancel = True
+        self._cancel.set()
 
     def cancelled(self):
-        return self._cancel
+        return self._cancel.is_set()
 
     def resume(self):
         if not self._fake:
-            self._cancel = False
+            self._cancel.clear()
 
     def fake(self):
         self._fake = True
-        self._cancel = True
+        self._cancel.set()
 
     @preemptive
     def move(self, position: PositionCoordinates):
         if position is None:
             return
         logging.info("[WASPY.IBA.RBS_SETUP] Moving rbs system to '" + str(position) + "'")
+        if self._parallel_move:
+            yield from self._move_parallel(position)
+            return
         self.motor_x_y.move_both([position.x, position.y])
+        yield
         self.motor_phi_zeta.move_both([position.phi, position.zeta])
+        yield
         self.motor_det_theta.move_both([position.det, position.theta])
 
+    def _move_parallel(self, position: PositionCoordinates):
+        moves = {
+            "aml_x_y": (self.motor_x_y, {"x": position.x, "y": position.y}),
+            "aml_phi_zeta": (self.motor_phi_zeta, {"phi": position.phi, "zeta": position.zeta}),
+            "aml_det_theta": (self.motor_det_theta, {"det": position.det, "theta": position.theta})
+        }
+        pending = {}
+        errors = {}
+        for name, (motor, targets) in moves.items():
+            try:
+                request = motor.start_move(list(targets.values()))
+                if request:
+                    pending[name] = (motor, request)
+            except DriverError as e:
+                errors[name] = str(e)
+
+        start = time.monotonic()
+        for interval in MOVE_POLLING.intervals():
+            if not pending:
+                break
+            self._cancel.wait(interval)
+            for name, (motor, request) in list(pending.items()):
+                try:
+                    if motor.is_finished(request):
+                        del pending[name]
+                except DriverError as e:
+                    errors[name] = str(e)
+                    del pending[name]
+            if is_past_deadline(MOVE_POLLING, start):
+                for name in pending:
+                    errors[name] = f'did not arrive within {MOVE_POLLING.deadline} seconds'
+                pending = {}
+            yield
+
+        if errors:
+            failures = [f'{name} {moves[name][1]}: {error}' for name, error in errors.items()]
+            raise IbaError("Moving the rbs system failed for: " + "; ".join(failures))
+
     def load(self):
-        self.motor_x_y.load()
-        self.motor_phi_zeta.load()
-        self.motor_det_theta.load()
+        wait_for_requests([self.motor_x_y.load(False), self.motor_phi_zeta.load(False),
+                           self.motor_det_theta.load(False)])
 
     def finish(self):
         self.resume()
         self.charge_offset = 0
+        self._pending_clear = None
 
     @preemptive
     def _wait_for_count_finished(self):
+        """The charge rate is estimated from the successive readings. The wait sleeps until shortly before the predicted
+        completion and polls with the finest interval from then on. Every reading is a fresh status snapshot, the
+        cached status of the charge counter is left to the other readers"""
+        self._charge_rate.reset()
         self._counting = True
-        while self.charge_counter.is_counting():
-            time.sleep(1)
+        intervals = COUNT_POLLING.intervals()
+        status = self._read_charge_counter()
+        self._target_charge = float(status["target_charge(nC)"])
+        while status["status"] != "Done":
+            now = time.monotonic()
+            self._charge_rate.add_reading(now, float(status["charge(nC)"]))
+            time_to_completion = self._charge_rate.get_time_to_target(self._target_charge, now)
+            self._cancel.wait(_get_count_poll_interval(time_to_completion, intervals))
             yield
+            status = self._read_charge_counter()
         self._counting = False
 
+    def _read_charge_counter(self) -> Dict:
+        self.charge_counter.invalidate()
+        return self.charge_counter.get_status()
+
+    def get_estimated_time_to_completion(self) -> Union[float, None]:
+        """Seconds until the charge target of the ongoing count is reached. None when not counting, or when the charge
+        rate is not known yet"""
+        if not self._counting:
+            return None
+        return self._charge_rate.get_time_to_target(self._target_charge, time.monotonic())
+
     @preemptive
     def count(self):
         logging.info("[WASPY.IBA.RBS_SETUP] acquiring till target")
         self.charge_counter.start_count_from_zero()
         self._wait_for_count_finished()
+        self._accumulate_charge()
+
+    @preemptive
+    def count_to_target(self, target):
+        logging.info("[WASPY.IBA.RBS_SETUP] acquiring till target")
+        self.charge_counter.arm(target, start=True)
+        self._wait_for_count_finished()
+        self._accumulate_charge()
+
+    def _accumulate_charge(self):
         self._acquisition_accumulated_charge += self.charge_counter.get_charge()
         self.charge_offset += self.charge_counter.get_target_charge()
 
@@ -111,10 +209,20 @@ class RbsSetup:
     def configure_detectors(self, detectors: List[Detector]):
         self.detectors = detectors
 
-    def get_histograms(self) -> Dict[str, List[int]]:
+    def get_histograms(self) -> Dict[str, Histogram]:
+        """Fetches the raw histograms concurrently. Detectors on the same board and channel share a single fetch"""
+        return self._pack_histograms(fan_out(self._histogram_fetches(), self._executor))
+
+    def _histogram_fetches(self) -> Dict[Tuple[str, int], Callable]:
+        return {(detector.board, detector.channel):
+                partial(self.data_acquisition.get_raw_histogram_array, detector.board, detector.channel)
+                for detector in self.detectors}
+
+    def _pack_histograms(self, raw_histograms: Dict) -> Dict[str, Histogram]:
         histograms = {}
         for detector in self.detectors:
-            histograms[detector.identifier] = self.get_packed_histogram(detector)
+            raw_histogram = raw_histograms[(detector.board, detector.channel)]
+            histograms[detector.identifier] = Histogram(pack_histogram(raw_histogram, detector))
         return histograms
 
     def get_detectors(self) -> List[Detector]:
@@ -128,48 +236,56 @@ class RbsSetup:
             raise IbaError("Detector: '" + str(identifier) + "' Does not exist. Available detectors:" + detector_names)
 
     def get_status(self, get_histograms=False) -> RbsData:
-        status_x_y = self.motor_x_y.get_status()
-        status_phi_zeta = self.motor_phi_zeta.get_status()
-        status_det_theta = self.motor_det_theta.get_status()
-
-        status_charge_counter = self.charge_counter.get_status()
-        status_data_acquisition = self.data_acquisition.get_status()
-
-        histograms = []
+        """The daemons are queried concurrently, together with the histograms when requested. Raises an IbaError
+        listing every daemon that failed or did not respond within STATUS_DEADLINE seconds. The daemon statuses are
+        validated here, where they enter. The Histograms are packed by this setup and are added without validation"""
+        calls = {"aml_x_y": self.motor_x_y.get_status, "aml_phi_zeta": self.motor_phi_zeta.get_status,
+                 "aml_det_theta": self.motor_det_theta.get_status, "motrona": self.charge_counter.get_status,
+                 "caen": self.data_acquisition.get_status}
         if get_histograms:
-            histograms = self.get_histograms()
-        return RbsData.parse_obj(
-            {"aml_x_y": status_x_y, "aml_phi_zeta": status_phi_zeta, "aml_det_theta": status_det_theta,
-             "motrona": status_charge_counter, "caen": status_data_acquisition, "detectors": self.detectors,
-             "histograms": histograms, "measuring_time_sec": self._acquisition_run_time,
+            calls.update(self._histogram_fetches())
+        results = fan_out(calls, self._executor, STATUS_DEADLINE)
+
+        histograms = self._pack_histograms(results) if get_histograms else {}
+        rbs_data = RbsData.parse_obj(
+            {"aml_x_y": results["aml_x_y"], "aml_phi_zeta": results["aml_phi_zeta"],
+             "aml_det_theta": results["aml_det_theta"], "motrona": results["motrona"], "caen": results["caen"],
+             "histograms": {}, "measuring_time_sec": self._acquisition_run_time,
              "accumulated_charge": self._acquisition_accumulated_charge})
+        return rbs_data.copy(update={"histograms": histograms})
 
     def acquire_data(self, total_charge) -> RbsData:
         """Warning: this function can take a while ( >1 hour)"""
-        self.prepare_counting_with_target(total_charge)
+        self._wait_for_pending_clear()
         self.data_acquisition.start()
-        self.count()
+        self.count_to_target(total_charge)
         self.data_acquisition.stop()
         return self.get_status(True)
 
     @preemptive
     def prepare_acquisition(self):
+        """The clear is not waited for, it overlaps with the moves until the acquisition is started. The Caen only
+        reports the status of its last request, so the stop is waited for before the clear is posted"""
         self.data_acquisition.stop()
-        self.data_acquisition.clear()
+        self._pending_clear = self.data_acquisition.clear(wait=False)
         self._start_time = time.time()
         self._acquisition_accumulated_charge = 0
 
+    def _wait_for_pending_clear(self):
+        pending_clear, self._pending_clear = self._pending_clear, None
+        if pending_clear is not None:
+            pending_clear.wait()
+
     @preemptive
     def finalize_acquisition(self):
         self._acquisition_run_time = float(time.time() - self._start_time)
 
     @preemptive
     def prepare_counting_with_target(self, target):
-        self.charge_counter.pause()
-        self.charge_counter.set_target_charge(target)
+        self.charge_counter.arm(target)
 
-    def get_packed_histogram(self, detector: Detector) -> List[int]:
-        return self.data_acquisition.get_histogram(detector)
+    def get_packed_histogram(self, detector: Detector) -> Histogram:
+        return Histogram(self.data_acquisition.get_histogram_array(detector))
 
     def set_registry(self, board_id, registry_file):
         self.data_acquisition.set_registry(board_id, registry_file)
@@ -180,3 +296,10 @@ class RbsSetup:
     def verify_detectors(self, detectors: List[Detector]):
         if not self.data_acquisition.do_detectors_exist(detectors):
             raise IbaError(f'The specified detectors({detectors}) do not (all) exist.')
+
+
+def _get_count_poll_interval(time_to_completion: Union[float, None], intervals: Iterator[float]) -> float:
+    if time_to_completion is None:
+        return next(intervals)
+    margin = max(COUNT_MARGIN, COUNT_MARGIN_FRACTION * time_to_completion)
+    return max(time_to_completion - margin, COUNT_POLLING.initial_interval)
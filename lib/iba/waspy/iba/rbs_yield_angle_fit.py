@@ -1,12 +1,23 @@
 import logging
-from typing import List
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import List, Callable, Sequence, Tuple, Optional, Iterator
 
 import numpy as np
 from scipy.interpolate import interp1d, UnivariateSpline
 from scipy import optimize
-from scipy.optimize import Bounds, fmin, fminbound
+from scipy.optimize import Bounds, fmin, fminbound, minimize_scalar, OptimizeWarning
 
-from waspy.iba.rbs_entities import FitAlgorithmType
+from waspy.iba.rbs_entities import FitAlgorithmType, AysFitResult
+
+DEFAULT_RESOLUTION = 0.01
+MAX_GRID_POINTS = 2000
+# The fit workers are not forked: fit_batch runs in the multi-threaded mill, a forked worker can inherit a lock held by
+# another thread and deadlock
+FIT_START_METHOD = "spawn"
 
 
 def get_angle_for_minimum_yield(smooth_angles, smooth_yields) -> float:
@@ -17,21 +28,126 @@ def get_angle_for_minimum_yield(smooth_angles, smooth_yields) -> float:
     return smooth_angle_for_minimum_yield
 
 
-def fit_and_smooth(angles, yields, algorithm_type=FitAlgorithmType.LOWER_FIT):
-    """Will fit a curve using x and y. When the fit is found, recalculate the y values with a more finely
-    distributed x (smooth) (interpolated)."""
-
-    # Tried to use scipy minimize, fminbound here - but it does not work as expected in all cases
-    # Just eval the entire range and get the minimum - will get very slow with large arrays
+def fit_series(angles, yields, algorithm_type=FitAlgorithmType.LOWER_FIT, resolution=DEFAULT_RESOLUTION,
+               max_grid_points=MAX_GRID_POINTS) -> AysFitResult:
+    """Fits a single angle/yield series. A fit that does not converge gives an unsuccessful result"""
+    try:
+        fit_func, min_angle = fit_and_smooth(angles, yields, algorithm_type, resolution, max_grid_points)
+        return AysFitResult(success=True, minimum=min_angle, discrete_angles=angles,
+                            discrete_yields=yields, fit_func=fit_func)
+    except (RuntimeError, OptimizeWarning, ValueError) as e:
+        logging.error(e)
+        return AysFitResult(success=False, discrete_angles=angles, discrete_yields=yields)
+
+
+def fit_batch(series: Sequence[Tuple[List[float], List[int]]], algorithm_type=FitAlgorithmType.LOWER_FIT,
+              max_workers: Optional[int] = None, resolution=DEFAULT_RESOLUTION,
+              max_grid_points=MAX_GRID_POINTS) -> List[AysFitResult]:
+    """Fits many (angles, yields) series in a process pool, by default on all cores. The results are in the order of
+    the series. A series that fails, also with an unexpected error or a crashed worker, gives an unsuccessful result
+    and does not affect the others. With max_workers=1, the series are fitted in the calling process"""
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(series) <= 1:
+        return [_fit_series_isolated(angles, yields, algorithm_type, resolution, max_grid_points)
+                for angles, yields in series]
+
+    results: List[Optional[AysFitResult]] = [None] * len(series)
+    unfinished = []
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(series)), mp_context=_get_mp_context()) as executor:
+        futures = [executor.submit(_fit_series_isolated, angles, yields, algorithm_type, resolution, max_grid_points)
+                   for angles, yields in series]
+        for index, future in enumerate(futures):
+            try:
+                results[index] = future.result()
+            except BrokenProcessPool:
+                unfinished.append(index)
+            except Exception as e:
+                logging.error(f"[WASPY.IBA.RBS_YIELD_ANGLE_FIT] Fit worker failed: {e!r}")
+                results[index] = _failed_fit(*series[index])
+
+    if unfinished:
+        # A crashed worker breaks the pool for all series that were not finished. They are fitted again one by one,
+        # so only the series that crashes fails
+        logging.error(f"[WASPY.IBA.RBS_YIELD_ANGLE_FIT] A fit worker crashed, fitting {len(unfinished)} series again "
+                      f"one by one")
+        for index, result in _refit_one_by_one(series, unfinished, algorithm_type, resolution, max_grid_points):
+            results[index] = result
+    return results
+
+
+def _refit_one_by_one(series, indices: List[int], algorithm_type, resolution,
+                      max_grid_points) -> Iterator[Tuple[int, AysFitResult]]:
+    """A single worker fits the series in turn. It is only replaced when a series crashes it"""
+    executor = None
+    try:
+        for index in indices:
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=1, mp_context=_get_mp_context())
+            try:
+                yield index, executor.submit(_fit_series_isolated, *series[index], algorithm_type, resolution,
+                                             max_grid_points).result()
+            except Exception as e:
+                logging.error(f"[WASPY.IBA.RBS_YIELD_ANGLE_FIT] Fit worker failed: {e!r}")
+                yield index, _failed_fit(*series[index])
+                if isinstance(e, BrokenProcessPool):
+                    executor.shutdown()
+                    executor = None
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def _get_mp_context():
+    return multiprocessing.get_context(FIT_START_METHOD)
+
+
+def _failed_fit(angles, yields) -> AysFitResult:
+    return AysFitResult(success=False, discrete_angles=angles, discrete_yields=yields)
+
+
+def _fit_series_isolated(angles, yields, algorithm_type, resolution, max_grid_points) -> AysFitResult:
+    try:
+        return fit_series(angles, yields, algorithm_type, resolution, max_grid_points)
+    except Exception as e:
+        logging.error(f"[WASPY.IBA.RBS_YIELD_ANGLE_FIT] Fit failed: {e!r}")
+        return _failed_fit(angles, yields)
+
+
+def fit_and_smooth(angles, yields, algorithm_type=FitAlgorithmType.LOWER_FIT, resolution=DEFAULT_RESOLUTION,
+                   max_grid_points=MAX_GRID_POINTS):
+    """Will fit a curve using x and y. When the fit is found, the minimum of the fitted curve is located with the
+    given resolution (degrees), see find_fit_minimum. The minimum angle is rounded to the resolution."""
     if algorithm_type == FitAlgorithmType.MINIMUM_YIELD:
         return None, get_angle_for_minimum_yield(angles, yields)
     elif algorithm_type == FitAlgorithmType.LOWER_FIT:
-        return attempt_lower_fit(angles, yields)
+        return attempt_lower_fit(angles, yields, resolution, max_grid_points)
     else:
-        return attempt_fit(angles, yields)
+        return attempt_fit(angles, yields, resolution, max_grid_points)
+
+
+def find_fit_minimum(fit_func: Callable, start: float, end: float, resolution=DEFAULT_RESOLUTION,
+                     max_grid_points=MAX_GRID_POINTS) -> float:
+    """The fitted curve is evaluated on a grid with the given resolution, of at most max_grid_points, in one array
+    operation. The minimum of the grid is refined with a bounded scalar minimization between its neighbours"""
+    grid_points = int(min(np.ceil((end - start) / resolution), max_grid_points)) + 1
+    grid_x = np.linspace(start, end, grid_points)
+    index = int(np.argmin(fit_func(grid_x)))
+    lower, upper = grid_x[max(index - 1, 0)], grid_x[min(index + 1, grid_points - 1)]
+    min_x = grid_x[index]
+    if upper > lower:
+        refined = minimize_scalar(fit_func, bounds=(lower, upper), method='bounded',
+                                  options={"xatol": resolution / 10})
+        if refined.success and fit_func(refined.x) <= fit_func(min_x):
+            min_x = refined.x
+    return _round_to_resolution(min_x, resolution)
 
 
-def attempt_fit(angles, yields):
+def _round_to_resolution(x: float, resolution: float) -> float:
+    decimals = max(0, int(np.ceil(-np.log10(resolution))))
+    return round(float(np.round(x / resolution) * resolution), decimals)
+
+
+def attempt_fit(angles, yields, resolution=DEFAULT_RESOLUTION, max_grid_points=MAX_GRID_POINTS):
     p_start = np.amax(yields)
     r_start = angles[np.argmin(yields)]
 
@@ -41,12 +157,8 @@ def attempt_fit(angles, yields):
                                                         p0=[p_start, 100.0, r_start, 0.3, 50, -1.0],
                                                         bounds=arg_bounds, ftol=0.01)
 
-    def fit_func(x):
-        return fit(x, p, q, r, s, t, u)
-    smooth_x = [x for x in np.arange(angles[0], angles[-1], 0.01)]
-    smooth_y = [fit(x, p, q, r, s, t, u) for x in smooth_x]
-    min_x = round(smooth_x[np.argmin(smooth_y)], 2)
-    return fit_func, min_x
+    fit_func = partial(fit, p=p, q=q, r=r, s=s, t=t, u=u)
+    return fit_func, find_fit_minimum(fit_func, angles[0], angles[-1], resolution, max_grid_points)
 
 
 def fit(x, p, q, r, s, t, u):
@@ -55,7 +167,7 @@ def fit(x, p, q, r, s, t, u):
     return value
 
 
-def attempt_lower_fit(angles, yields):
+def attempt_lower_fit(angles, yields, resolution=DEFAULT_RESOLUTION, max_grid_points=MAX_GRID_POINTS):
     constant_term_start = np.amax(yields)
     gauss_mean_start = angles[np.argmin(yields)]
     gauss_amplitude_start = abs(np.max(yields) - np.min(yields))
@@ -78,13 +190,9 @@ def attempt_lower_fit(angles, yields):
         optimize.curve_fit(lower_order_fit, angles, yields, p0=[constant_term_start, gauss_amplitude_start,
                                                                 gauss_mean_start, sigma_start, -1.0, -1.0], ftol=0.01)
 
-    def fit_func(x):
-        return lower_order_fit(x, constant_term, gauss_amplitude, gauss_mean, sigma, linear_term, quadratic_term)
-
-    smooth_x = [x for x in np.arange(angles[0], angles[-1], 0.01)]
-    smooth_y = [fit(x, constant_term, gauss_amplitude, gauss_mean, sigma, linear_term, quadratic_term) for x in smooth_x]
-    min_x = round(smooth_x[np.argmin(smooth_y)], 2)
-    return fit_func, min_x
+    fit_func = partial(lower_order_fit, p=constant_term, q=gauss_amplitude, r=gauss_mean, s=sigma, t=linear_term,
+                       u=quadratic_term)
+    return fit_func, find_fit_minimum(fit_func, angles[0], angles[-1], resolution, max_grid_points)
 
 
 def lower_order_fit(x, p, q, r, s, t, u):
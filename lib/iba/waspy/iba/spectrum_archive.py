@@ -0,0 +1,140 @@
+import io
+import json
+from pathlib import Path
+from typing import List, Dict, Union
+
+import numpy as np
+
+from waspy.iba.file_handler import FileHandler
+from waspy.iba.iba_error import IbaError
+from waspy.iba.rbs_entities import RbsJournal
+
+'''
+A binary archive of all the spectra of a recipe, next to (or instead of) the text files. An archive consists of three
+files with the same stem:
+    <name>.spectra.json: the header, with the detectors, their number of bins and the dtypes
+    <name>.spectra.bin: one row per step, the histograms of all detectors concatenated in header order
+    <name>.steps.bin: one record per step, with the step index, the positions, the charge and the times
+
+The steps are buffered and appended in chunks. The binary files are plain numpy arrays without a header, so they can
+be memory mapped: loading a whole channeling map does not read the spectra until they are used. The number of steps
+follows from the file size, an archive of an interrupted recipe can be read up to its last written chunk.
+
+Example usage:
+    archive = SpectrumArchiveWriter(file_handler, "map_1")
+    archive.append(rbs_journal, step_index)
+    archive.close()
+
+    archive = read_spectrum_archive(Path("data/job/map_1.spectra.json"))
+    archive.steps["zeta"], archive.get_spectra("d01").sum(axis=1)
+ '''
+
+ARCHIVE_FORMAT = "waspy-spectrum-archive"
+ARCHIVE_VERSION = 1
+SPECTRUM_DTYPE = np.dtype("<i8")
+STEP_DTYPE = np.dtype([
+    ("index", "<i4"), ("x", "<f8"), ("y", "<f8"), ("phi", "<f8"), ("zeta", "<f8"), ("det", "<f8"), ("theta", "<f8"),
+    ("accumulated_charge", "<f8"), ("measuring_time_sec", "<f8"), ("start_time", "<f8"), ("end_time", "<f8")])
+
+
+def get_archive_file_names(name: str) -> (str, str, str):
+    return f'{name}.spectra.json', f'{name}.spectra.bin', f'{name}.steps.bin'
+
+
+class SpectrumArchiveWriter:
+    _detectors: Union[List[str], None]
+    _bins: Dict[str, int]
+
+    def __init__(self, file_handler: FileHandler, name: str, chunk_steps: int = 16):
+        """The files are written in the current folder of the file handler. chunk_steps is the number of steps that
+        are buffered before they are appended to the files"""
+        self._file_handler = file_handler
+        self._header_file, self._spectra_file, self._steps_file = get_archive_file_names(name)
+        self._chunk_steps = chunk_steps
+        self._detectors = None
+        self._bins = {}
+        self._spectra: List[np.ndarray] = []
+        self._steps: List[tuple] = []
+
+    def append(self, journal: RbsJournal, index: int):
+        """All steps must have the same detectors and number of bins as the first step"""
+        if self._detectors is None:
+            self._start(journal)
+        bins = {detector: len(histogram) for detector, histogram in journal.histograms.items()}
+        if bins != self._bins:
+            raise IbaError(f"The detectors of step {index} do not match the spectrum archive")
+        self._spectra.append(np.concatenate(
+            [np.asarray(journal.histograms[detector], dtype=SPECTRUM_DTYPE) for detector in self._detectors]))
+        self._steps.append((index, journal.x, journal.y, journal.phi, journal.zeta, journal.det, journal.theta,
+                            journal.accumulated_charge, journal.measuring_time_sec, journal.start_time.timestamp(),
+                            journal.end_time.timestamp()))
+        if len(self._steps) >= self._chunk_steps:
+            self._write_chunk()
+
+    def close(self):
+        """Writes the buffered steps and copies the archive to the remote directory"""
+        if self._detectors is None:
+            return
+        self._write_chunk()
+        self._file_handler.copy_to_remote(self._spectra_file)
+        self._file_handler.copy_to_remote(self._steps_file)
+
+    def _start(self, journal: RbsJournal):
+        self._detectors = list(journal.histograms.keys())
+        self._bins = {detector: len(histogram) for detector, histogram in journal.histograms.items()}
+        header = {"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION, "detectors": self._detectors,
+                  "bins": [self._bins[detector] for detector in self._detectors],
+                  "spectrum_dtype": SPECTRUM_DTYPE.str, "step_dtype": STEP_DTYPE.descr,
+                  "spectra_file": self._spectra_file, "steps_file": self._steps_file}
+        self._file_handler.write_text_to_disk(self._header_file, json.dumps(header, indent=4))
+        self._file_handler.write_bytes_to_disk(self._spectra_file, io.BytesIO())
+        self._file_handler.write_bytes_to_disk(self._steps_file, io.BytesIO())
+
+    def _write_chunk(self):
+        if not self._steps:
+            return
+        self._file_handler.append_bytes_to_disk(self._spectra_file, np.stack(self._spectra).tobytes())
+        self._file_handler.append_bytes_to_disk(self._steps_file, np.array(self._steps, dtype=STEP_DTYPE).tobytes())
+        self._spectra = []
+        self._steps = []
+
+
+class SpectrumArchive:
+    """A read-only, memory mapped spectrum archive"""
+    def __init__(self, header: Dict, spectra: np.ndarray, steps: np.ndarray):
+        self.header = header
+        self.detectors: List[str] = header["detectors"]
+        self.spectra = spectra
+        self.steps = steps
+        self._offsets = dict(zip(self.detectors, np.cumsum([0] + header["bins"][:-1]).tolist()))
+        self._bins = dict(zip(self.detectors, header["bins"]))
+
+    def __len__(self):
+        return len(self.steps)
+
+    def get_spectra(self, detector: str) -> np.ndarray:
+        """The spectra of a detector, one row per step. This is a view on the mapped file"""
+        offset = self._offsets[detector]
+        return self.spectra[:, offset:offset + self._bins[detector]]
+
+
+def read_spectrum_archive(header_path: Path) -> SpectrumArchive:
+    header = json.loads(header_path.read_text())
+    if header.get("format") != ARCHIVE_FORMAT or header.get("version") != ARCHIVE_VERSION:
+        raise IbaError(f"{header_path} is not a supported spectrum archive")
+    spectrum_dtype = np.dtype(header["spectrum_dtype"])
+    step_dtype = np.dtype([tuple(field) for field in header["step_dtype"]])
+    total_bins = sum(header["bins"])
+    steps = _map_rows(header_path.parent / header["steps_file"], step_dtype, ())
+    spectra = _map_rows(header_path.parent / header["spectra_file"], spectrum_dtype, (total_bins,))
+    step_count = min(len(steps), len(spectra))
+    return SpectrumArchive(header, spectra[:step_count], steps[:step_count])
+
+
+def _map_rows(path: Path, dtype: np.dtype, row_shape: tuple) -> np.ndarray:
+    """Maps the complete rows of a file, a partially written last row is ignored"""
+    row_size = dtype.itemsize * int(np.prod(row_shape, dtype=np.int64))
+    rows = path.stat().st_size // row_size if row_size else 0
+    if rows == 0:
+        return np.empty((0,) + row_shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(rows,) + row_shape)
@@ -0,0 +1,64 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Deque
+
+'''
+Runs the post-processing of measurement steps (journal construction, saving, plotting) on a single worker thread, so
+the motors can move to the next step in the meantime. The work is done in submission order. An error in the worker is
+raised in the recipe at the next submit, or when the pipeline is drained.
+
+Without pipelining, submit runs the work immediately, which keeps the recipe code the same for both modes.
+
+Example usage:
+    with StepPipeline(pipelined=True) as pipeline:
+        for position in positions:
+            rbs_data = measure(position)
+            journals.append(pipeline.submit(save_step, rbs_data))
+    journals = [journal.result() for journal in journals]
+ '''
+
+
+class StepPipeline:
+    _pending: Deque[Future]
+
+    def __init__(self, pipelined: bool = True, max_pending: int = 2):
+        """max_pending bounds the amount of steps that wait for the worker. Submit blocks when there are more"""
+        self._pipelined = pipelined
+        self._max_pending = max_pending
+        self._pending = deque()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="step_pipeline") if pipelined else None
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        if not self._pipelined:
+            future = Future()
+            future.set_result(func(*args, **kwargs))
+            return future
+        while self._pending and (self._pending[0].done() or len(self._pending) >= self._max_pending):
+            self._pending.popleft().result()
+        future = self._executor.submit(func, *args, **kwargs)
+        self._pending.append(future)
+        return future
+
+    def drain(self):
+        """Waits for all submitted work and raises the first error"""
+        while self._pending:
+            self._pending.popleft().result()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """The steps that were measured are saved, also when the recipe failed. An error of the recipe takes precedence
+        over an error in the worker"""
+        try:
+            if exc_type is None:
+                self.drain()
+            else:
+                for future in self._pending:
+                    future.exception()
+        finally:
+            self.close()
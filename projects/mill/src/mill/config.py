@@ -25,6 +25,8 @@ class GlobalConfig(BaseSettings):
     ENV_STATE = "dev"
     TREND_STORE = "/root/trends/"
     LOGBOOK_URL = ""
+    HTTP_POOL_SIZE = 10
+    HTTP_METRICS_LOG_INTERVAL: float = 0
 
 
 def make_mill_config(config_file) -> MillConfig:
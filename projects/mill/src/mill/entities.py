@@ -1,6 +1,7 @@
 from enum import Enum
 from typing import Union, Dict, Optional, List
 
+from pydantic import Field
 from pydantic.generics import BaseModel
 from waspy.iba.rbs_entities import Detector
 
@@ -21,6 +22,7 @@ class SimpleConfig(BaseModel):
     title: Optional[str]
     url: str
     proxy: Optional[str]
+    timeout: Optional[float] = Field(description="Timeout in seconds for requests to this driver")
 
     class Config:
         use_enum_values = True
@@ -19,6 +19,7 @@ class ErdConfig(BaseModel):
     drivers: ErdDriverGroup
     local_dir: Path
     remote_dir: Path
+    write_behind: bool = Field(False, description="Write and copy the files to the remote directory in the background")
 
     def get_driver_urls(self) -> ErdDriverUrls:
         return ErdDriverUrls(
@@ -62,6 +62,7 @@ class ErdJob(Job):
         trends = self._db.get_trends(self._time_loaded, datetime.now(), "any")
         self._file_handler.write_csv_panda_to_disk("any_trends.csv", trends)
         self._file_handler.write_json_to_disk("job.json", self.serialize())
+        self._file_handler.flush()
         self._db.job_finish(self._job_model)
         self._erd_setup.resume()
 
@@ -96,6 +97,7 @@ class ErdJob(Job):
         self._running = False
 
     def _finish_recipe(self):
+        self._file_handler.flush()
         finished_recipe_status = make_erd_status(self._active_recipe, 100, self._recipe_start_time)
         self._finished_recipes.append(finished_recipe_status.dict())
         self._active_recipe = empty_erd_recipe
@@ -18,8 +18,9 @@ from waspy.iba.rbs_setup import RbsSetup
 
 class JobFactory:
     def __init__(self, rbs_setup: RbsSetup, rbs_file_handler: FileHandler, erd_setup: ErdSetup,
-                 erd_file_handler: FileHandler, db: LogBookDb, recipe_meta: RecipeMeta):
+                 erd_file_handler: FileHandler, db: LogBookDb, recipe_meta: RecipeMeta, rbs_pipelined: bool = False):
         self._rbs_setup = rbs_setup
+        self._rbs_pipelined = rbs_pipelined
         self._rbs_file_writer = rbs_file_handler
         self._rbs_metadata = {}
         self._erd_setup = erd_setup
@@ -29,7 +30,8 @@ class JobFactory:
         self._recipe_meta = recipe_meta
 
     def make_rbs_job(self, job_model: RbsJobModel):
-        return RbsJob(job_model, self._rbs_setup, self._rbs_file_writer, self._db, self._recipe_meta)
+        return RbsJob(job_model, self._rbs_setup, self._rbs_file_writer, self._db, self._recipe_meta,
+                      self._rbs_pipelined)
 
     def set_rbs_metadata_template(self, keys: Dict):
         self._rbs_metadata = keys
@@ -12,6 +12,9 @@ from mill.recipe_meta import RecipeMeta
 from waspy.iba import rbs_setup as rbs_lib
 from waspy.iba.file_handler import FileHandler
 from waspy.iba.erd_setup import ErdSetup
+from waspy.drivers.http_helper import configure_sessions, close_sessions, set_timeout
+from waspy.drivers.aio.http_helper import close_client
+from waspy.drivers.http_metrics import start_metrics_log, stop_metrics_log
 from mill.job_factory import JobFactory
 from mill.systemd_routes import build_systemd_endpoints
 from mill.logbook_db import LogBookDb
@@ -24,6 +27,10 @@ def create_app():
     env_conf = GlobalConfig()
     logging.info("[WASPY.MILL.MAIN] Loaded config: " + env_conf.json())
     mill_config = make_mill_config(env_conf.CONFIG_FILE)
+    configure_sessions(env_conf.HTTP_POOL_SIZE)
+    configure_driver_timeouts(mill_config)
+    if env_conf.HTTP_METRICS_LOG_INTERVAL > 0:
+        start_metrics_log(env_conf.HTTP_METRICS_LOG_INTERVAL)
 
     if env_conf.ENV_STATE == "dev":
         origins = ['http://localhost:3000']
@@ -33,6 +40,7 @@ def create_app():
     app.mount("/static", StaticFiles(directory="static"), name="static")
 
     mill_routes.build_conf_endpoint(app, mill_config)
+    mill_routes.build_metrics_endpoints(app)
     mill_routes.build_api_endpoints(app, mill_config.any.drivers)
 
     logbook_db = LogBookDb(env_conf.LOGBOOK_URL)
@@ -63,25 +71,50 @@ def create_app():
     def favicon():
         return FileResponse('static/favicon.png')
 
+    @app.on_event("shutdown")
+    async def close_driver_sessions():
+        close_sessions()
+        await close_client()
+        stop_metrics_log()
+
     return app
 
 
+def configure_driver_timeouts(mill_config: MillConfig):
+    daemons = []
+    if mill_config.any:
+        daemons.extend(mill_config.any.drivers.__root__.values())
+    for setup in [mill_config.rbs, mill_config.erd]:
+        if setup:
+            daemons.extend(dict(setup.drivers).values())
+    for daemon in daemons:
+        set_timeout(daemon.url, daemon.timeout)
+
+
 def build_job_and_hw_routes(router, mill_config: MillConfig, logbook_db: LogBookDb):
     if mill_config.rbs and mill_config.erd:
         job_runner = JobRunner()
 
-        rbs_setup = rbs_lib.RbsSetup(mill_config.rbs.get_driver_urls())
-        rbs_file_writer = FileHandler(mill_config.rbs.local_dir, mill_config.rbs.remote_dir)
+        rbs_setup = rbs_lib.RbsSetup(mill_config.rbs.get_driver_urls(), mill_config.rbs.parallel_move)
+        rbs_file_writer = FileHandler(mill_config.rbs.local_dir, mill_config.rbs.remote_dir,
+                                      mill_config.rbs.write_behind)
         rbs_setup.configure_detectors(mill_config.rbs.drivers.caen.detectors)
 
         erd_setup = ErdSetup(mill_config.erd.get_driver_urls())
-        erd_file_writer = FileHandler(mill_config.erd.local_dir, mill_config.erd.remote_dir)
+        erd_file_writer = FileHandler(mill_config.erd.local_dir, mill_config.erd.remote_dir,
+                                      mill_config.erd.write_behind)
 
         recipe_meta = RecipeMeta(logbook_db, Path('./recipe_meta'))
 
-        factory = JobFactory(rbs_setup, rbs_file_writer, erd_setup, erd_file_writer, logbook_db, recipe_meta)
+        factory = JobFactory(rbs_setup, rbs_file_writer, erd_setup, erd_file_writer, logbook_db, recipe_meta,
+                             mill_config.rbs.pipelined)
         build_job_routes(router, job_runner, factory)
 
+        @router.on_event("shutdown")
+        def close_file_writers():
+            rbs_file_writer.close()
+            erd_file_writer.close()
+
         rbs_routes.build_driver_endpoints(router, mill_config.rbs.drivers)
         rbs_routes.build_setup_endpoints(router, rbs_setup)
         rbs_routes.build_meta_endpoints(router, recipe_meta)
@@ -10,10 +10,14 @@ from mill.entities import AnyDriverGroup
 from mill.config import MillConfig
 from starlette.requests import Request
 
-from waspy.drivers.caen import Caen, DetectorMetadata
-from waspy.drivers.http_helper import get_text_with_response_code, post_dictionary, get_json_with_response_code
+from waspy.drivers.caen import DetectorMetadata, HistogramCache
+from waspy.drivers.aio.caen import Caen
+from waspy.drivers.aio.http_helper import get_text_with_response_code, post_dictionary, get_json_with_response_code
+from waspy.drivers.http_metrics import get_metrics_snapshot, MetricsSnapshot, reset_metrics
 from waspy.iba.rbs_entities import Detector
 
+_caens: Dict[str, Caen] = {}
+
 
 def build_api_endpoints(http_router, any_hardware: AnyDriverGroup):
     for key, daemon in any_hardware.__root__.items():
@@ -32,27 +36,44 @@ def build_conf_endpoint(http_router, mill_config: MillConfig):
         return mill_config
 
 
+def build_metrics_endpoints(http_router):
+    @http_router.get("/api/metrics/http", response_model=MetricsSnapshot)
+    async def api_get_http_metrics():
+        return get_metrics_snapshot()
+
+    @http_router.delete("/api/metrics/http")
+    async def api_reset_http_metrics():
+        reset_metrics()
+
+
 def build_histogram_redirect(some_router, from_url, to_url, tags):
     @some_router.get(from_url + "/histogram/{board_id}/{channel}", tags=tags)
     async def histogram(board_id: str, channel: int):
-        caen = Caen(to_url)
-        data = caen.get_raw_histogram(board_id, channel)
+        caen = _get_caen(to_url)
+        data = await caen.get_raw_histogram(board_id, channel)
         return data
 
 
-def histogram(response: Response, to_url, board: str, channel: int, start: int, end: int, width: int):
+async def histogram(response: Response, to_url, board: str, channel: int, start: int, end: int, width: int):
     if width > end - start:
         response.status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
         return {}
-    caen = Caen(to_url)
+    caen = _get_caen(to_url)
     detector = DetectorMetadata(board=board, channel=channel, bins_min=start, bins_max=end, bins_width=width)
-    return caen.get_histogram(detector)
+    return await caen.get_histogram(detector)
+
+
+def _get_caen(url) -> Caen:
+    """One driver per daemon, its histogram cache makes repeated polling of a live spectrum cheap"""
+    if url not in _caens:
+        _caens[url] = Caen(url, histogram_cache=HistogramCache())
+    return _caens[url]
 
 
 def build_packed_histogram(some_router, from_url, to_url, tags):
     @some_router.get(from_url + "/histogram/{board}/{channel}/pack/{start}-{end}-{width}", tags=tags)
     async def get_any_histogram(response: Response, board: str, channel: int, start: int, end: int, width: int):
-        return histogram(response, to_url, board, channel, start, end, width)
+        return await histogram(response, to_url, board, channel, start, end, width)
 
 
 def build_detector_endpoints(some_router, from_url, to_url, detectors: List[Detector], tags):
@@ -65,8 +86,8 @@ def build_detector_endpoints(some_router, from_url, to_url, detectors: List[Dete
             active_detector = next(some_detector for some_detector in detectors
                                    if some_detector.identifier == last_part)
 
-            return histogram(response, to_url, active_detector.board, active_detector.channel,
-                             active_detector.bins_min, active_detector.bins_max, active_detector.bins_width)
+            return await histogram(response, to_url, active_detector.board, active_detector.channel,
+                                   active_detector.bins_min, active_detector.bins_max, active_detector.bins_width)
 
         @some_router.get(from_url + "/detector/" + detector.identifier + "_compressed", tags=tags)
         async def get_histogram(request: Request, response: Response):
@@ -76,8 +97,8 @@ def build_detector_endpoints(some_router, from_url, to_url, detectors: List[Dete
             active_detector = next(some_detector for some_detector in detectors
                                    if some_detector.identifier == last_part)
 
-            return histogram(response, to_url, active_detector.board, active_detector.channel,
-                             active_detector.bins_min, active_detector.bins_max, 1024)
+            return await histogram(response, to_url, active_detector.board, active_detector.channel,
+                                   active_detector.bins_min, active_detector.bins_max, 1024)
 
 
 def _make_driver_schema(class_name, url):
@@ -104,7 +125,7 @@ def build_post_redirect(some_router, from_url, to_url, tags):
 
     @some_router.post(from_url, tags=tags)
     async def api_key_post(response: Response, hardware_command: hw_schema):  # type: ignore
-        code, body = post_dictionary(to_url, hardware_command.__root__)
+        code, body = await post_dictionary(to_url, hardware_command.__root__)
         response.status_code = code
         return body
 
@@ -113,7 +134,7 @@ def build_get_redirect(some_router, from_url, to_url, tags):
     @some_router.get(from_url, tags=tags)
     async def api_key_get(response: Response):  # type: ignore
         try:
-            response.status_code, resp = get_json_with_response_code(to_url)
+            response.status_code, resp = await get_json_with_response_code(to_url)
         except Exception as e:
             response.status_code = status.HTTP_404_NOT_FOUND
             resp = str(e)
@@ -125,5 +146,5 @@ def build_mpa3_histogram_redirect(some_router, from_url, to_url, tags):
     async def histogram(response: Response):
         print(to_url)
         url = to_url + "/histogram"
-        response.status_code, resp = get_text_with_response_code(url)
+        response.status_code, resp = await get_text_with_response_code(url)
         return resp
@@ -1,7 +1,7 @@
 from datetime import timedelta, datetime
 from pathlib import Path
 from enum import Enum
-from typing import List, Union, Annotated
+from typing import List, Union, Annotated, Optional
 
 from pydantic import Field, validator
 from pydantic.generics import BaseModel
@@ -22,6 +22,9 @@ class RbsConfig(BaseModel):
     local_dir: Path
     remote_dir: Path
     drivers: RbsDriverGroup
+    parallel_move: bool = Field(False, description="Move all motors at the same time instead of one by one")
+    pipelined: bool = Field(False, description="Save and plot the result of a step while the next step is measured")
+    write_behind: bool = Field(False, description="Write and copy the files to the remote directory in the background")
 
     def get_driver_urls(self) -> RbsDriverUrls:
         return RbsDriverUrls(
@@ -39,11 +42,14 @@ class RbsStatus(BaseModel):
     name: str
     type: str
     sample: str
+    step_time_to_completion: Optional[float] = Field(
+        None, description="Estimated seconds until the charge target of the current step is reached")
 
 
-def make_rbs_status(recipe: RbsRandom | RbsChanneling, progress, start_time):
+def make_rbs_status(recipe: RbsRandom | RbsChanneling, progress, start_time, step_time_to_completion=None):
     return RbsStatus(progress=progress, run_time=(datetime.now() - start_time).total_seconds(),
-                     name=recipe.name, type=recipe.type, sample=recipe.sample)
+                     name=recipe.name, type=recipe.type, sample=recipe.sample,
+                     step_time_to_completion=step_time_to_completion)
 
 
 class StatusModel(str, Enum):
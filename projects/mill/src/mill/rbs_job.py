@@ -33,7 +33,7 @@ class RbsJob(Job):
     _recipe_meta: RecipeMeta
 
     def __init__(self, job_model: RbsJobModel, rbs_setup: RbsSetup,
-                 file_writer: FileHandler, db: LogBookDb, recipe_meta: RecipeMeta):
+                 file_writer: FileHandler, db: LogBookDb, recipe_meta: RecipeMeta, pipelined: bool = False):
         self._rbs_setup = rbs_setup
         self._job_model = job_model
         self._active_recipe = copy.deepcopy(empty_recipe)
@@ -45,6 +45,7 @@ class RbsJob(Job):
         self._recipe_start_time = datetime.now()
         self._cancelled = False
         self._recipe_meta = recipe_meta
+        self._pipelined = pipelined
 
     def setup(self):
         self._file_writer.set_base_folder(self._job_model.name)
@@ -67,6 +68,7 @@ class RbsJob(Job):
         trends = self._db.get_trends(self._time_loaded, datetime.now(), "any")
         self._file_writer.write_csv_panda_to_disk("any_trends.csv", trends)
         self._file_writer.write_json_to_disk("job.json", self.serialize())
+        self._file_writer.flush()
         self._db.job_finish(self._job_model)
         self._rbs_setup.finish()
 
@@ -74,7 +76,8 @@ class RbsJob(Job):
         self._db.job_terminate(self._job_model.name, message)
 
     def serialize(self):
-        active_recipe_status = make_rbs_status(self._active_recipe, self.get_recipe_progress(), self._recipe_start_time)
+        active_recipe_status = make_rbs_status(self._active_recipe, self.get_recipe_progress(), self._recipe_start_time,
+                                               self._rbs_setup.get_estimated_time_to_completion())
         status = {"job": self._job_model.dict(), "active_recipe": active_recipe_status.dict(),
                   "finished_recipes": self._finished_recipes}
         return status
@@ -96,7 +99,7 @@ class RbsJob(Job):
 
     def _run_channeling_map_recipe(self, recipe: RbsChannelingMap):
         recipe_meta_data = self._recipe_meta.fill_rbs_recipe_meta()
-        journal = run_channeling_map(recipe, self._rbs_setup, self._file_writer, recipe_meta_data)
+        journal = run_channeling_map(recipe, self._rbs_setup, self._file_writer, recipe_meta_data, self._pipelined)
         title = f"{recipe.name}_{recipe.yield_integration_window.start}_{recipe.yield_integration_window.end}_" \
                 f"{recipe.optimize_detector_identifier}"
         save_channeling_map_to_disk(self._file_writer, journal.cms_yields, title)
@@ -106,7 +109,8 @@ class RbsJob(Job):
     def _run_channeling_recipe(self, recipe: RbsChanneling):
         self._ays_index = 0
         recipe_meta_data = self._recipe_meta.fill_rbs_recipe_meta()
-        journal = run_channeling(recipe, self._rbs_setup, self._file_writer, recipe_meta_data, self._ays_report_cb)
+        journal = run_channeling(recipe, self._rbs_setup, self._file_writer, recipe_meta_data, self._ays_report_cb,
+                                 self._pipelined)
         save_channeling_graphs_to_disk(self._file_writer, journal, recipe.name)
         # TODO: log finish in db
 
@@ -124,6 +128,7 @@ class RbsJob(Job):
         self._running = False
 
     def _finish_recipe(self):
+        self._file_writer.flush()
         finished_recipe_status = make_rbs_status(self._active_recipe, 100, self._recipe_start_time)
         self._finished_recipes.append(finished_recipe_status.dict())
         self._active_recipe = copy.deepcopy(empty_recipe)
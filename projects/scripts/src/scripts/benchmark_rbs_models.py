@@ -0,0 +1,68 @@
+import argparse
+import timeit
+from datetime import datetime
+
+import numpy as np
+
+from waspy.iba.histogram import Histogram
+from waspy.iba.rbs_entities import RbsData, RbsJournal, get_rbs_journal
+
+'''
+Measures the cost of building the RbsData and RbsJournal of a single measurement step. Validated checks everything with
+parse_obj. Boundary is what RbsSetup.get_status and get_rbs_journal do: the daemon statuses are validated, the packed
+Histograms and the journal are added without validation.
+
+Example usage:
+    python benchmark_rbs_models.py --detectors 8 --bins 1024
+ '''
+
+
+def make_status(detectors: int, bins: int, histogram_type):
+    random = np.random.default_rng(1)
+    aml = {"request_id": "1", "request_finished": True, "error": "Success", "motor_1_position": 10.5,
+           "motor_2_position": -3.25, "motor_1_load_position": 0, "motor_2_load_position": 0, "motor_1_enabled": True,
+           "motor_2_enabled": True, "motor_1_name": "x", "motor_2_name": "y"}
+    caen = {"request_id": "1", "request_finished": True, "error": "Success", "acquisition_active": False,
+            "boards": {"33": {"channels": [{"id": channel} for channel in range(detectors)]}}}
+    motrona = {"request_id": "1", "request_finished": True, "error": "Success", "status": "Done",
+               "charge(nC)": 2000.5, "target_charge(nC)": 2000}
+    histograms = {f'd{detector:02}': histogram_type(random.poisson(50, bins).astype(np.int32))
+                  for detector in range(detectors)}
+    return {"aml_x_y": aml, "aml_phi_zeta": dict(aml), "aml_det_theta": dict(aml), "motrona": motrona, "caen": caen,
+            "histograms": histograms, "measuring_time_sec": 12.5, "accumulated_charge": 2000.5}
+
+
+def validated_step(status):
+    rbs_data = RbsData.parse_obj(status)
+    return RbsJournal(
+        x=rbs_data.aml_x_y["motor_1_position"], y=rbs_data.aml_x_y["motor_2_position"],
+        phi=rbs_data.aml_phi_zeta["motor_1_position"], zeta=rbs_data.aml_phi_zeta["motor_2_position"],
+        det=rbs_data.aml_det_theta["motor_1_position"], theta=rbs_data.aml_det_theta["motor_2_position"],
+        accumulated_charge=rbs_data.accumulated_charge, measuring_time_sec=rbs_data.measuring_time_sec,
+        histograms=rbs_data.histograms, start_time=datetime.now(), end_time=datetime.now())
+
+
+def boundary_step(status):
+    rbs_data = RbsData.parse_obj(dict(status, histograms={})).copy(update={"histograms": status["histograms"]})
+    return get_rbs_journal(rbs_data, datetime.now())
+
+
+def run_benchmark(detectors: int, bins: int, repeat: int):
+    cases = {
+        "validated, list histograms": (validated_step, make_status(detectors, bins, lambda counts: counts.tolist())),
+        "validated, Histogram": (validated_step, make_status(detectors, bins, Histogram)),
+        "boundary, Histogram": (boundary_step, make_status(detectors, bins, Histogram)),
+    }
+    print(f'{detectors} detectors x {bins} bins, per step:')
+    for name, (step, status) in cases.items():
+        seconds = min(timeit.repeat(lambda: step(status), number=repeat, repeat=5)) / repeat
+        print(f'  {name:<28} {seconds * 1e6:10.1f} us')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the construction of the rbs models of a single step")
+    parser.add_argument('--detectors', type=int, default=8)
+    parser.add_argument('--bins', type=int, default=1024)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    run_benchmark(args.detectors, args.bins, args.repeat)
@@ -0,0 +1,6 @@
+#!/bin/bash
+
+source ../../venv/bin/activate
+
+export CONFIG_FILE="config.toml"
+PYTHONPATH=src python src/sim/main.py
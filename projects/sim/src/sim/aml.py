@@ -0,0 +1,27 @@
+from typing import Dict
+
+from sim.daemon import Daemon, SimClock, SimMotor
+
+
+class Aml(Daemon):
+    """Two stepper motors. A move request is finished once both motors have arrived"""
+    example_request = {"request_id": "1", "set_m1_target_position": 10, "set_m2_target_position": 20}
+
+    def __init__(self, clock: SimClock, speed: float = 10, load_position: float = 0, command_latency: float = 0.05):
+        """speed: in units per second, for both motors"""
+        super().__init__(clock, command_latency)
+        self._motors = [SimMotor(speed), SimMotor(speed)]
+        self.handlers = {
+            "set_m1_target_position": lambda value, start: self._motors[0].move(float(value), start),
+            "set_m2_target_position": lambda value, start: self._motors[1].move(float(value), start),
+            "m1_load": lambda value, start: self._motors[0].move(load_position, start),
+            "m2_load": lambda value, start: self._motors[1].move(load_position, start),
+        }
+
+    def get_state(self, now: float) -> Dict:
+        return {
+            "motor_1_position": self._motors[0].position(now),
+            "motor_1_target_position": self._motors[0].target(),
+            "motor_2_position": self._motors[1].position(now),
+            "motor_2_target_position": self._motors[1].target(),
+        }
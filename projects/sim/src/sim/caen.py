@@ -0,0 +1,150 @@
+import uuid
+from typing import Dict, Tuple, Union
+
+import numpy as np
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+from sim.daemon import Daemon, SimClock, SimError
+
+HISTOGRAM_BINARY_TYPE = "application/octet-stream"
+
+
+class Caen(Daemon):
+    """A data acquisition system. While acquiring, every channel collects counts with a poisson distribution around a
+    synthetic spectrum. Histograms are served as text, or as little endian uint32 when the client accepts it. Every
+    histogram carries an etag, which allows conditional fetches (If-None-Match) and deltas (since=)"""
+    example_request = {"request_id": "1", "start": True}
+
+    def __init__(self, clock: SimClock, boards: Dict[str, int] = None, histogram_size: int = 24576,
+                 count_rate: float = 2000, command_latency: float = 0.01, seed: int = None):
+        """boards: maps the board id to the amount of channels. count_rate: counts per second, per channel"""
+        super().__init__(clock, command_latency)
+        boards = boards if boards is not None else {"33": 8}
+        self.count_rate = count_rate
+        self._boards = {board: {"channels": [{"id": channel} for channel in range(nr_of_channels)],
+                                "register_value": "0x0"} for board, nr_of_channels in boards.items()}
+        self._histograms: Dict[Tuple[str, int], np.ndarray] = {
+            (board, channel): np.zeros(histogram_size, dtype=np.uint32)
+            for board, nr_of_channels in boards.items() for channel in range(nr_of_channels)}
+        self._versions = {key: 0 for key in self._histograms}
+        self._changed_at = {key: np.zeros(histogram_size, dtype=np.int64) for key in self._histograms}
+        self._epoch = uuid.uuid4().hex[:8]
+        self._spectrum = _make_spectrum(histogram_size)
+        self._random = np.random.default_rng(seed)
+        self._acquiring = False
+        self._since = 0.
+        self.handlers = {
+            "clear": self._clear,
+            "start": lambda value, start: self._set_acquiring(True, start),
+            "stop": lambda value, start: self._set_acquiring(False, start),
+            "read_register": self._read_register,
+            "upload_registry": self._upload_registry,
+        }
+
+    def _clear(self, value, start: float) -> float:
+        self._collect(start)
+        for key, histogram in self._histograms.items():
+            self._mark_changed(key, histogram != 0)
+            histogram[:] = 0
+        return start
+
+    def _set_acquiring(self, acquiring: bool, start: float) -> float:
+        self._collect(start)
+        self._acquiring = acquiring
+        return start
+
+    def _read_register(self, value: Dict, start: float) -> float:
+        self._get_board(value["board_id"])["register_value"] = "0x0"
+        return start
+
+    def _upload_registry(self, value: Dict, start: float) -> float:
+        self._get_board(value["board_id"])
+        return start
+
+    def _get_board(self, board_id: str) -> Dict:
+        if board_id not in self._boards:
+            raise SimError(f'Board {board_id} does not exist')
+        return self._boards[board_id]
+
+    def _collect(self, now: float):
+        """Adds the counts collected since the last call"""
+        if self._acquiring and now > self._since:
+            expected = self._spectrum * self.count_rate * (now - self._since)
+            for key, histogram in self._histograms.items():
+                counts = self._random.poisson(expected).astype(np.uint32)
+                histogram += counts
+                self._mark_changed(key, counts != 0)
+        self._since = max(self._since, now)
+
+    def _mark_changed(self, key: Tuple[str, int], changed: np.ndarray):
+        if changed.any():
+            self._versions[key] += 1
+            self._changed_at[key][changed] = self._versions[key]
+
+    def get_histogram(self, board: str, channel: int) -> Tuple[str, np.ndarray]:
+        """Returns the etag and the histogram"""
+        with self._lock:
+            self._collect(self.clock.now())
+            key = (board, channel)
+            return self._get_etag(key), self._histograms[key].copy()
+
+    def get_delta(self, board: str, channel: int, since: str) -> Tuple[str, Union[Dict, None]]:
+        """Returns the etag and the bins changed since the given etag. The delta is None when the etag is unknown, or
+        when the full histogram is smaller"""
+        with self._lock:
+            self._collect(self.clock.now())
+            key = (board, channel)
+            epoch, _, version = since.strip('"').partition("-")
+            if epoch != self._epoch or not version.isdigit() or int(version) > self._versions[key]:
+                return self._get_etag(key), None
+            bins = np.flatnonzero(self._changed_at[key] > int(version))
+            if len(bins) > len(self._histograms[key]) // 4:
+                return self._get_etag(key), None
+            return self._get_etag(key), {"bins": bins.tolist(), "values": self._histograms[key][bins].tolist()}
+
+    def _get_etag(self, key: Tuple[str, int]) -> str:
+        return f'"{self._epoch}-{self._versions[key]}"'
+
+    def get_state(self, now: float) -> Dict:
+        return {"acquiring": self._acquiring, "boards": self._boards}
+
+    def add_routes(self, app: FastAPI, prefix: str):
+        @app.get(prefix + "/histogram")
+        def get_histogram_by_query(request: Request, board: str, channel: int, since: str = None):
+            return self._histogram_response(request, board, channel, since)
+
+        @app.get(prefix + "/histogram/{board}/{channel}")
+        def get_histogram_by_path(request: Request, board: str, channel: int, since: str = None):
+            return self._histogram_response(request, board, channel, since)
+
+    def _histogram_response(self, request: Request, board: str, channel: int, since: Union[str, None]) -> Response:
+        if (board, channel) not in self._histograms:
+            return Response(status_code=404, content="Not found", media_type="text/plain")
+        if since is not None:
+            etag, delta = self.get_delta(board, channel, since)
+            if request.headers.get("If-None-Match") == etag:
+                return Response(status_code=304, headers={"ETag": etag})
+            if delta is not None:
+                return JSONResponse(delta, headers={"ETag": etag})
+        etag, histogram = self.get_histogram(board, channel)
+        if request.headers.get("If-None-Match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        if HISTOGRAM_BINARY_TYPE in request.headers.get("Accept", ""):
+            return Response(content=histogram.astype("<u4").tobytes(), media_type=HISTOGRAM_BINARY_TYPE,
+                            headers={"ETag": etag})
+        return Response(content=format_histogram(histogram), media_type="text/plain", headers={"ETag": etag})
+
+
+def format_histogram(histogram: np.ndarray) -> str:
+    """Formats the histogram as the caen daemon does: '"1";"2";"3";'"""
+    return "".join(f'"{value}";' for value in histogram.tolist())
+
+
+def _make_spectrum(size: int) -> np.ndarray:
+    """A falling background with two surface peaks, normalized to a total of 1"""
+    x = np.arange(size, dtype=np.float64)
+    spectrum = np.exp(-x / (size / 4))
+    spectrum += 2 * np.exp(-((x - 0.6 * size) / (0.02 * size)) ** 2)
+    spectrum += np.exp(-((x - 0.8 * size) / (0.01 * size)) ** 2)
+    return spectrum / spectrum.sum()
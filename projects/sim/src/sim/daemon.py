@@ -0,0 +1,181 @@
+import asyncio
+import math
+import time
+from threading import Lock, Thread
+from typing import Dict, Callable
+
+import uvicorn
+from fastapi import FastAPI
+from starlette.middleware.gzip import GZipMiddleware
+
+'''
+The simulated daemons serve the same http protocol as the hardware daemons:
+    GET  /api/latest       -> the status, containing "request_id", "request_finished" and "error"
+    POST /api/latest       -> a request {"request_id": ..., "<command>": <value>, ...}
+    GET  /api/latest/caps  -> an example request
+
+A posted request is accepted immediately. It starts after the command latency (or when the previous request has
+finished) and is reported as finished once the simulated hardware is done with it. Nothing runs in the background, the
+state of the hardware is derived from the simulated time whenever it is requested.
+
+All durations are in simulated seconds, except for the response latency which is added in real time to every http
+response. The clock runs time_scale simulated seconds for every real second.
+
+Example usage:
+    clock = SimClock(time_scale=10)
+    app = make_app(Aml(clock, speed=5), response_latency=0.002)
+    server = serve_in_background(app, "127.0.0.1", 20000)
+ '''
+
+Handler = Callable[[object, float], float]
+
+
+class SimError(Exception):
+    pass
+
+
+class SimClock:
+    """Simulated time in seconds, time_scale simulated seconds pass for every real second"""
+    time_scale: float
+
+    def __init__(self, time_scale: float = 1):
+        self.time_scale = time_scale
+        self._start = time.monotonic()
+
+    def now(self) -> float:
+        return (time.monotonic() - self._start) * self.time_scale
+
+
+class Daemon:
+    """The request protocol shared by all daemons. Subclasses fill in the handlers and implement get_state. A handler
+    gets the value of its command and the simulated start time, and returns the time at which it is finished"""
+    clock: SimClock
+    command_latency: float
+    handlers: Dict[str, Handler]
+    example_request: Dict = {"request_id": "1"}
+
+    def __init__(self, clock: SimClock, command_latency: float = 0):
+        self.clock = clock
+        self.command_latency = command_latency
+        self.handlers = {}
+        self._request_id = "0"
+        self._error = "Success"
+        self._finish_time = 0.
+        self._lock = Lock()
+
+    def post(self, request: Dict):
+        with self._lock:
+            start = max(self.clock.now(), self._finish_time) + self.command_latency
+            self._request_id = str(request.get("request_id", ""))
+            self._error = "Success"
+            try:
+                self._finish_time = self.execute(request, start)
+            except SimError as e:
+                self._error = str(e)
+                self._finish_time = start
+
+    def execute(self, request: Dict, start: float) -> float:
+        """The commands are executed in the order of the request"""
+        finish = start
+        for key, value in request.items():
+            if key == "request_id":
+                continue
+            if key not in self.handlers:
+                raise SimError(f'Unknown request: {key}')
+            finish = max(finish, self.handlers[key](value, start))
+        return finish
+
+    def get_status(self) -> Dict:
+        with self._lock:
+            now = self.clock.now()
+            status = {"request_id": self._request_id, "request_finished": now >= self._finish_time,
+                      "error": self._error}
+            status.update(self.get_state(now))
+            return status
+
+    def get_state(self, now: float) -> Dict:
+        return {}
+
+    def caps(self) -> Dict:
+        return {"example": self.example_request}
+
+    def add_routes(self, app: FastAPI, prefix: str):
+        """Hook for daemons serving more than the status and the requests"""
+        pass
+
+
+class SimMotor:
+    """A motor moving at a constant speed, the position is interpolated from the last move"""
+    speed: float
+
+    def __init__(self, speed: float, position: float = 0):
+        self.speed = speed
+        self._origin = position
+        self._target = position
+        self._start = 0.
+
+    def move(self, target: float, start: float) -> float:
+        """Returns the time of arrival"""
+        origin = self.position(start)
+        self._origin, self._target, self._start = origin, target, start
+        return start + abs(target - origin) / self.speed
+
+    def position(self, now: float) -> float:
+        if now <= self._start:
+            return self._origin
+        distance = self._target - self._origin
+        travelled = min(abs(distance), (now - self._start) * self.speed)
+        return self._origin + math.copysign(travelled, distance)
+
+    def target(self) -> float:
+        return self._target
+
+    def is_moving(self, now: float) -> bool:
+        return self.position(now) != self._target
+
+
+def make_app(daemon: Daemon, response_latency: float = 0, compress: bool = False) -> FastAPI:
+    app = FastAPI(title=type(daemon).__name__)
+    prefix = "/api/latest"
+
+    if compress:
+        app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+    @app.middleware("http")
+    async def delay_response(request, call_next):
+        if response_latency:
+            await asyncio.sleep(response_latency)
+        return await call_next(request)
+
+    @app.get(prefix)
+    def get_status():
+        return daemon.get_status()
+
+    @app.post(prefix)
+    def post_request(request: Dict):
+        daemon.post(request)
+        return ""
+
+    @app.get(prefix + "/caps")
+    def get_caps():
+        return daemon.caps()
+
+    daemon.add_routes(app, prefix)
+    return app
+
+
+def serve_in_background(app: FastAPI, host: str, port: int) -> uvicorn.Server:
+    """Starts serving the app in a daemon thread and returns once the server accepts connections"""
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f'Could not serve {app.title} on {host}:{port}')
+        time.sleep(0.01)
+    return server
+
+
+def get_server_url(server: uvicorn.Server) -> str:
+    host, port = server.servers[0].sockets[0].getsockname()[:2]
+    return f'http://{host}:{port}/api/latest'
@@ -0,0 +1,60 @@
+import logging
+import time
+from typing import Dict, List
+
+import tomli
+import uvicorn
+from pydantic import BaseSettings
+
+from sim.aml import Aml
+from sim.caen import Caen
+from sim.daemon import SimClock, Daemon, make_app, serve_in_background, get_server_url
+from sim.mdrive import MDrive
+from sim.motrona import Motrona
+from sim.mpa3 import Mpa3
+
+logging.basicConfig(
+    format='[%(asctime)s.%(msecs)03d] [%(levelname)s] %(message)s',
+    level=logging.INFO,
+    datefmt='%Y.%m.%d__%H:%M__%S')
+
+DAEMON_TYPES = {"aml": Aml, "caen": Caen, "motrona_dx350": Motrona, "mdrive": MDrive, "mpa3": Mpa3}
+
+
+class GlobalConfig(BaseSettings):
+    CONFIG_FILE = "config.toml"
+
+
+def make_daemon(clock: SimClock, daemon_config: Dict) -> Daemon:
+    """The keys other than type, port, response_latency and compress are passed on to the simulated daemon"""
+    parameters = {key: value for key, value in daemon_config.items()
+                  if key not in ["type", "port", "response_latency", "compress"]}
+    return DAEMON_TYPES[daemon_config["type"]](clock, **parameters)
+
+
+def start_daemons(config: Dict) -> List[uvicorn.Server]:
+    clock = SimClock(config.get("time_scale", 1))
+    host = config.get("host", "127.0.0.1")
+    servers = []
+    for name, daemon_config in config["daemons"].items():
+        app = make_app(make_daemon(clock, daemon_config), daemon_config.get("response_latency", 0),
+                       daemon_config.get("compress", False))
+        server = serve_in_background(app, host, daemon_config["port"])
+        servers.append(server)
+        logging.info(f'[WASPY.SIM] {name} ({daemon_config["type"]}) on {get_server_url(server)}')
+    return servers
+
+
+if __name__ == "__main__":
+    env_conf = GlobalConfig()
+    with open(env_conf.CONFIG_FILE, "rb") as f:
+        sim_config = tomli.load(f)
+
+    logging.info("[WASPY.SIM] Loaded config: " + str(env_conf))
+    servers = start_daemons(sim_config)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.should_exit = True
@@ -0,0 +1,31 @@
+from typing import Dict
+
+from sim.daemon import Daemon, SimClock, SimMotor
+
+
+class MDrive(Daemon):
+    """A stepper motor. A move request is finished when the move has started, arrival is reported with
+    moving_to_target"""
+    example_request = {"request_id": "1", "set_motor_target_position": 10}
+
+    def __init__(self, clock: SimClock, speed: float = 10, load_position: float = 0, command_latency: float = 0.05):
+        """speed: in units per second"""
+        super().__init__(clock, command_latency)
+        self._motor = SimMotor(speed)
+        self.handlers = {
+            "set_motor_target_position": self._move_to(None),
+            "load": self._move_to(load_position),
+        }
+
+    def _move_to(self, fixed_position):
+        def move(value, start: float) -> float:
+            self._motor.move(float(value) if fixed_position is None else fixed_position, start)
+            return start
+        return move
+
+    def get_state(self, now: float) -> Dict:
+        return {
+            "motor_position": self._motor.position(now),
+            "motor_target_position": self._motor.target(),
+            "moving_to_target": self._motor.is_moving(now),
+        }
@@ -0,0 +1,57 @@
+from typing import Dict
+
+from sim.daemon import Daemon, SimClock
+
+
+class Motrona(Daemon):
+    """A charge counter integrating a constant beam current. Counting stops when the target charge is reached, a
+    target of 0 counts indefinitely"""
+    example_request = {"request_id": "1", "target_charge": 1000, "clear-start_counting": True}
+
+    def __init__(self, clock: SimClock, beam_current: float = 5, command_latency: float = 0.01):
+        """beam_current: in nA, which accumulates beam_current nC every second"""
+        super().__init__(clock, command_latency)
+        self.beam_current = beam_current
+        self._charge = 0.
+        self._since = 0.
+        self._target = 0.
+        self._counting = False
+        self.handlers = {
+            "clear-start_counting": self._clear_start,
+            "start_counting": lambda value, start: self._set_counting(True, start),
+            "pause_counting": lambda value, start: self._set_counting(False, start),
+            "target_charge": self._set_target,
+        }
+
+    def _clear_start(self, value, start: float) -> float:
+        self._charge = 0.
+        self._since = start
+        self._counting = True
+        return start
+
+    def _set_counting(self, counting: bool, start: float) -> float:
+        self._charge = self._charge_at(start)
+        self._since = start
+        self._counting = counting
+        return start
+
+    def _set_target(self, value, start: float) -> float:
+        self._set_counting(self._counting, start)
+        self._target = float(value)
+        return start
+
+    def _charge_at(self, now: float) -> float:
+        if not self._counting or now <= self._since:
+            return self._charge
+        charge = self._charge + self.beam_current * (now - self._since)
+        return min(charge, self._target) if self._target > 0 else charge
+
+    def get_state(self, now: float) -> Dict:
+        charge = self._charge_at(now)
+        counting = self._counting and (self._target <= 0 or charge < self._target)
+        return {
+            "status": "Counting" if counting else "Done",
+            "charge(nC)": charge,
+            "target_charge(nC)": self._target,
+            "current(nA)": self.beam_current,
+        }
@@ -0,0 +1,85 @@
+from typing import Dict, Union
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+from sim.daemon import Daemon, SimClock
+
+
+class Mpa3(Daemon):
+    """A list mode data acquisition system. It acquires events for the configured run time. The histogram is served as
+    text, one 'time_of_flight energy' event per line"""
+    example_request = {"request_id": "1", "run_time_enable": True, "set_run_time_setpoint": 60, "start": True}
+
+    def __init__(self, clock: SimClock, event_rate: float = 100, convert_duration: float = 2,
+                 reupload_duration: float = 1, command_latency: float = 0.05, seed: int = None):
+        """event_rate: events per second. convert_duration and reupload_duration: seconds"""
+        super().__init__(clock, command_latency)
+        self.event_rate = event_rate
+        self._run_time_enabled = False
+        self._run_time_setpoint = 0.
+        self._filename = ""
+        self._started: Union[float, None] = None
+        self._stopped: Union[float, None] = None
+        self._seed = seed
+        self.handlers = {
+            "halt": self._halt,
+            "erase": self._erase,
+            "run_time_enable": self._set("_run_time_enabled", bool),
+            "set_run_time_setpoint": self._set("_run_time_setpoint", float),
+            "set_filename": self._set("_filename", str),
+            "start": self._start,
+            "reupload_mpa3_cnf": lambda value, start: start + reupload_duration,
+            "convert": lambda value, start: start + convert_duration,
+        }
+
+    def _set(self, attribute, convert):
+        def set_value(value, start: float) -> float:
+            setattr(self, attribute, convert(value))
+            return start
+        return set_value
+
+    def _halt(self, value, start: float) -> float:
+        if self._started is not None and self._stopped is None:
+            self._stopped = start
+        return start
+
+    def _erase(self, value, start: float) -> float:
+        self._started = None
+        self._stopped = None
+        return start
+
+    def _start(self, value, start: float) -> float:
+        self._started = start
+        self._stopped = None
+        return start
+
+    def _real_time(self, now: float) -> float:
+        if self._started is None or now < self._started:
+            return 0.
+        end = now if self._stopped is None else min(now, self._stopped)
+        real_time = max(end - self._started, 0.)
+        if self._run_time_enabled:
+            real_time = min(real_time, self._run_time_setpoint)
+        return real_time
+
+    def _acquiring(self, now: float) -> bool:
+        if self._started is None or now < self._started or self._stopped is not None:
+            return False
+        return not self._run_time_enabled or now - self._started < self._run_time_setpoint
+
+    def get_state(self, now: float) -> Dict:
+        return {"acquisition_status": {"acquiring": self._acquiring(now), "real_time": self._real_time(now)},
+                "filename": self._filename}
+
+    def get_histogram(self) -> str:
+        with self._lock:
+            nr_of_events = int(self.event_rate * self._real_time(self.clock.now()))
+        events = np.random.default_rng(self._seed).integers(0, 8192, size=(nr_of_events, 2))
+        return "".join(f'{time_of_flight} {energy}\n' for time_of_flight, energy in events.tolist())
+
+    def add_routes(self, app: FastAPI, prefix: str):
+        @app.get(prefix + "/histogram", response_class=PlainTextResponse)
+        def get_histogram():
+            return self.get_histogram()
@@ -0,0 +1,141 @@
+import unittest
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from sim.aml import Aml
+from sim.caen import Caen
+from sim.daemon import make_app, serve_in_background, get_server_url
+from sim.main import start_daemons
+from sim.mdrive import MDrive
+from sim.motrona import Motrona
+from sim.mpa3 import Mpa3
+from waspy.drivers.aml_smd2 import AmlSmd2
+from waspy.drivers.caen import Caen as CaenDriver, DetectorMetadata, HistogramCache
+from waspy.drivers.motrona_dx350 import MotronaDx350
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.
+
+    def now(self):
+        return self.time
+
+
+class TestSimProtocol(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def _post(self, client, request):
+        self.assertEqual(client.post("/api/latest", json=request).status_code, 200)
+
+    def test_request_finishes_when_motors_arrive(self):
+        client = TestClient(make_app(Aml(self.clock, speed=10, command_latency=0.5)))
+        self._post(client, {"request_id": "1", "set_m1_target_position": 10, "set_m2_target_position": -5})
+
+        self.clock.time = 1
+        status = client.get("/api/latest").json()
+        self.assertEqual(status["request_id"], "1")
+        self.assertFalse(status["request_finished"])
+        self.assertEqual(status["motor_1_position"], 5)
+        self.assertEqual(status["motor_2_position"], -5)
+
+        self.clock.time = 1.5
+        status = client.get("/api/latest").json()
+        self.assertTrue(status["request_finished"])
+        self.assertEqual(status["motor_1_position"], 10)
+
+    def test_unknown_request_is_an_error(self):
+        client = TestClient(make_app(MDrive(self.clock)))
+        self._post(client, {"request_id": "1", "fly": True})
+        status = client.get("/api/latest").json()
+        self.assertEqual(status["error"], "Unknown request: fly")
+        self._post(client, {"request_id": "2", "set_motor_target_position": 10})
+        self.assertEqual(client.get("/api/latest").json()["error"], "Success")
+
+    def test_charge_counts_to_target(self):
+        client = TestClient(make_app(Motrona(self.clock, beam_current=2, command_latency=0)))
+        self._post(client, {"request_id": "1", "pause_counting": True, "target_charge": 10,
+                            "clear-start_counting": True})
+        self.clock.time = 3
+        status = client.get("/api/latest").json()
+        self.assertEqual((status["status"], status["charge(nC)"]), ("Counting", 6))
+        self.clock.time = 6
+        status = client.get("/api/latest").json()
+        self.assertEqual((status["status"], status["charge(nC)"]), ("Done", 10))
+
+    def test_histogram_formats(self):
+        client = TestClient(make_app(Caen(self.clock, boards={"33": 2}, histogram_size=16, seed=1)))
+        self._post(client, {"request_id": "1", "start": True})
+        self.clock.time = 10
+
+        binary = client.get("/api/latest/histogram?board=33&channel=1",
+                            headers={"Accept": "application/octet-stream"})
+        text = client.get("/api/latest/histogram/33/1")
+        self.assertEqual(binary.headers["Content-Type"], "application/octet-stream")
+        histogram = np.frombuffer(binary.content, dtype="<u4")
+        self.assertGreater(histogram.sum(), 0)
+        self.assertEqual(text.text, "".join(f'"{value}";' for value in histogram))
+        self.assertEqual(client.get("/api/latest/histogram/34/0").status_code, 404)
+
+    def test_histogram_delta(self):
+        client = TestClient(make_app(Caen(self.clock, boards={"33": 1}, histogram_size=64, count_rate=1, seed=1)))
+        full = client.get("/api/latest/histogram/33/0")
+        etag = full.headers["ETag"]
+        self.assertEqual(client.get("/api/latest/histogram/33/0", headers={"If-None-Match": etag}).status_code, 304)
+
+        self._post(client, {"request_id": "1", "start": True})
+        self.clock.time = 3
+        since = etag.strip('"')
+        delta = client.get(f'/api/latest/histogram?board=33&channel=0&since={since}', headers={"If-None-Match": etag})
+        self.assertEqual(delta.headers["Content-Type"], "application/json")
+        histogram = np.zeros(64, dtype=np.int64)
+        histogram[delta.json()["bins"]] = delta.json()["values"]
+        self.assertEqual(client.get("/api/latest/histogram/33/0").text, "".join(f'"{value}";' for value in histogram))
+
+    def test_acquisition_stops_after_run_time(self):
+        client = TestClient(make_app(Mpa3(self.clock, event_rate=10, command_latency=0)))
+        self._post(client, {"request_id": "1", "run_time_enable": True, "set_run_time_setpoint": 5, "start": True})
+        self.clock.time = 2
+        self.assertTrue(client.get("/api/latest").json()["acquisition_status"]["acquiring"])
+        self.clock.time = 8
+        self.assertEqual(client.get("/api/latest").json()["acquisition_status"],
+                         {"acquiring": False, "real_time": 5})
+        self.assertEqual(len(client.get("/api/latest/histogram").text.splitlines()), 50)
+
+    def test_caps(self):
+        client = TestClient(make_app(Aml(self.clock)))
+        self.assertIn("set_m1_target_position", client.get("/api/latest/caps").json()["example"])
+
+
+class TestSimWithDrivers(unittest.TestCase):
+    def test_drivers(self):
+        servers = start_daemons({"time_scale": 100, "daemons": {
+            "aml": {"type": "aml", "port": 0, "speed": 10},
+            "motrona": {"type": "motrona_dx350", "port": 0, "beam_current": 100},
+            "caen": {"type": "caen", "port": 0, "boards": {"33": 1}, "histogram_size": 64},
+        }})
+        aml, motrona, caen = [get_server_url(server) for server in servers]
+        try:
+            aml_driver = AmlSmd2(aml)
+            aml_driver.move_both_simultaneously([10, 20])
+            self.assertEqual(aml_driver.get_status()["motor_2_position"], 20)
+
+            caen_driver = CaenDriver(caen)
+            caen_driver.start()
+            motrona_driver = MotronaDx350(motrona, status_ttl=0)
+            motrona_driver.arm(50, start=True)
+            motrona_driver.wait_for_counting_done()
+            caen_driver.stop()
+            self.assertEqual(motrona_driver.get_charge(), 50)
+
+            detector = DetectorMetadata(board="33", channel=0, bins_min=0, bins_max=64, bins_width=8)
+            self.assertGreater(sum(caen_driver.get_histogram(detector)), 0)
+
+            cached_caen_driver = CaenDriver(caen, histogram_cache=HistogramCache())
+            np.testing.assert_array_equal(cached_caen_driver.get_raw_histogram_array("33", 0),
+                                          cached_caen_driver.get_raw_histogram_array("33", 0))
+        finally:
+            for server in servers:
+                server.should_exit = True